@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestRegressor
+
+from backend.ai_model import train_model
+from backend.ai_model.features import FEATURE_COLUMNS
+from backend.ai_model.registry import artifact_version
+from backend.ai_model.tuning import load_arrays
+from backend.metrics import dump as dump_metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# One JSON file per model version
+BACKTEST_DIR = os.getenv("BACKTEST_DIR", "backend/ai_model/backtests")
+
+# Walk-forward schedule, in rows (price ticks): retrain every RETRAIN_EVERY
+# rows once MIN_TRAIN rows are available, on the last WINDOW rows (0 = all history)
+RETRAIN_EVERY = int(os.getenv("BACKTEST_RETRAIN_EVERY", 168))
+MIN_TRAIN = int(os.getenv("BACKTEST_MIN_TRAIN", 500))
+WINDOW = int(os.getenv("BACKTEST_WINDOW", 0))
+# Ticks ahead each prediction targets; 1 is what the served model predicts
+HORIZON = int(os.getenv("BACKTEST_HORIZON", 1))
+# Trailing window (in predictions) of the rolling error series
+ROLLING = int(os.getenv("BACKTEST_ROLLING", 168))
+N_JOBS = int(os.getenv("BACKTEST_N_JOBS", -1))
+
+# Forest settings of a full train_model run
+DEFAULT_PARAMS = {"n_estimators": 100}
+
+
+def walk_forward_folds(rows, min_train=MIN_TRAIN, retrain_every=RETRAIN_EVERY, window=WINDOW, horizon=HORIZON):
+    """
+    Splits `rows` time-ordered rows into retrain points.
+
+    Each fold trains on rows whose target was already known at the retrain
+    point (the last horizon - 1 rows before it are still in the future) and
+    predicts every row up to the next retrain.
+
+    Returns:
+        list: (train_start, train_end, test_start, test_end) row slices.
+    """
+    folds = []
+    for start in range(min_train, rows, retrain_every):
+        train_end = start - horizon + 1
+        train_start = max(0, train_end - window) if window else 0
+        folds.append((train_start, train_end, start, min(start + retrain_every, rows)))
+    return folds
+
+
+def _run_fold(X, y, params, train_start, train_end, test_start, test_end):
+    """
+    Fits one model on a fold's training slice and predicts its test slice.
+
+    X holds only the model's columns and folds are contiguous row ranges, so
+    both sets are views of the shared read-only arrays.
+    """
+    model = RandomForestRegressor(random_state=42, n_jobs=1, **params)
+    model.fit(X[train_start:train_end], y[train_start:train_end])
+    return model.predict(X[test_start:test_end])
+
+
+def rolling_mean(values, window):
+    """
+    Trailing mean over `window` values (fewer at the start).
+    """
+    totals = np.cumsum(np.insert(np.asarray(values, dtype=np.float64), 0, 0.0))
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return (totals[1:] - totals[np.arange(1, len(values) + 1) - counts]) / counts
+
+
+def error_metrics(current, actual, predicted):
+    """
+    MAE, RMSE and directional accuracy (share of predictions on the right
+    side of the current price), plus the MAE of predicting no change.
+    """
+    errors = predicted - actual
+    return {
+        "mae": float(np.mean(np.abs(errors))),
+        "rmse": float(np.sqrt(np.mean(errors ** 2))),
+        "directional_accuracy": float(np.mean(np.sign(predicted - current) == np.sign(actual - current))),
+        "naive_mae": float(np.mean(np.abs(actual - current))),
+        "predictions": int(len(actual)),
+    }
+
+
+def backtest(X, y, features=None, params=None, min_train=MIN_TRAIN, retrain_every=RETRAIN_EVERY, window=WINDOW,
+             horizon=HORIZON, rolling=ROLLING, n_jobs=N_JOBS):
+    """
+    Replays the history as if the model had been retrained on a schedule.
+
+    The feature matrix is built once; every fold is a separate task in a
+    process pool and reads the same memory-mapped arrays (see tuning.tune),
+    so no fold touches SQLite.
+
+    Args:
+        X (ndarray): Feature matrix in FEATURE_COLUMNS order, sorted by time.
+        y (ndarray): Next-tick prices (build_training_set targets).
+        features (list): Columns the model uses (default: FEATURE_COLUMNS).
+        params (dict): RandomForestRegressor parameters (default: DEFAULT_PARAMS).
+        min_train (int): Rows before the first retrain.
+        retrain_every (int): Rows between retrains.
+        window (int): Rows of history per fit (0 = expanding window).
+        horizon (int): Ticks ahead to predict; >1 fits direct multi-step models.
+        rolling (int): Window of the rolling error series.
+        n_jobs (int): Worker processes (-1 = all cores).
+
+    Returns:
+        dict: Configuration, overall and per-fold metrics, and rolling MAE and
+              directional accuracy sampled every `rolling` predictions.
+    """
+    features = list(features or FEATURE_COLUMNS)
+    params = dict(params or DEFAULT_PARAMS)
+    # y[i] is the price one tick after row i, so the price h ticks ahead is y[i + h - 1]
+    X, y = X[:len(X) - horizon + 1], y[horizon - 1:]
+    folds = walk_forward_folds(len(X), min_train, retrain_every, window, horizon)
+    if not folds:
+        raise ValueError(f"Need more than {min_train} rows for a backtest, got {len(X)}")
+    # Selected once here instead of per fold (fancy indexing copies)
+    X_model = np.ascontiguousarray(X[:, [FEATURE_COLUMNS.index(c) for c in features]])
+    logging.info(f"🔍 Backtesting {len(folds)} retrains over {len(X) - min_train} predictions with n_jobs={n_jobs}...")
+
+    start = time.perf_counter()
+    predictions = Parallel(n_jobs=n_jobs, max_nbytes="1M", mmap_mode="r")(
+        delayed(_run_fold)(X_model, y, params, *fold) for fold in folds
+    )
+    seconds = time.perf_counter() - start
+    logging.info(f"✅ Backtest finished in {seconds:.1f}s.")
+
+    tested = slice(folds[0][2], folds[-1][3])
+    predicted = np.concatenate(predictions)
+    actual = y[tested]
+    current = X[tested, FEATURE_COLUMNS.index("price")]
+    timestamps = X[tested, FEATURE_COLUMNS.index("timestamp")].astype(np.int64)
+
+    fold_results = []
+    for (train_start, train_end, test_start, test_end), fold_predictions in zip(folds, predictions):
+        rows = slice(test_start - tested.start, test_end - tested.start)
+        fold_results.append({
+            "start": int(timestamps[rows.start]),
+            "end": int(timestamps[rows.stop - 1]),
+            "train_rows": train_end - train_start,
+            **error_metrics(current[rows], actual[rows], fold_predictions),
+        })
+
+    sampled = np.arange(min(rolling, len(actual)) - 1, len(actual), rolling)
+    hits = np.sign(predicted - current) == np.sign(actual - current)
+    return {
+        "config": {
+            "features": features,
+            "params": params,
+            "min_train": min_train,
+            "retrain_every": retrain_every,
+            "window": window,
+            "horizon": horizon,
+        },
+        "summary": {**error_metrics(current, actual, predicted), "folds": len(folds), "seconds": seconds},
+        "folds": fold_results,
+        "rolling": {
+            "window": rolling,
+            "timestamps": timestamps[sampled].tolist(),
+            "mae": rolling_mean(np.abs(predicted - actual), rolling)[sampled].tolist(),
+            "directional_accuracy": rolling_mean(hits, rolling)[sampled].tolist(),
+        },
+    }
+
+
+def save_backtest(result, version, directory=None):
+    """
+    Writes a backtest result to <directory>/<version>.json, replacing any
+    earlier run for the same model version.
+
+    Returns:
+        str: Path written.
+    """
+    directory = directory or BACKTEST_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{version}.json")
+    with open(path, "w") as file:
+        json.dump(dict(result, version=version, run_at=datetime.now().isoformat()), file, indent=2)
+    logging.info(f"✅ Backtest saved to {path}")
+    return path
+
+
+def load_backtests(directory=None):
+    """
+    Loads every stored backtest, best (lowest MAE) first.
+    """
+    directory = directory or BACKTEST_DIR
+    if not os.path.isdir(directory):
+        return []
+    results = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name)) as file:
+                results.append(json.load(file))
+    return sorted(results, key=lambda result: result["summary"]["mae"])
+
+
+def log_comparison(results):
+    for result in results:
+        summary, config = result["summary"], result["config"]
+        logging.info(
+            f"📊 {result['version']}: MAE {summary['mae']:.4f} (naive {summary['naive_mae']:.4f}), "
+            f"RMSE {summary['rmse']:.4f}, direction {summary['directional_accuracy']:.1%} "
+            f"over {summary['predictions']} predictions / {summary['folds']} retrains "
+            f"(every {config['retrain_every']} rows, horizon {config['horizon']})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the current model configuration.")
+    parser.add_argument("--retrain-every", type=int, default=RETRAIN_EVERY, help="Rows between retrains")
+    parser.add_argument("--min-train", type=int, default=MIN_TRAIN, help="Rows before the first retrain")
+    parser.add_argument("--window", type=int, default=WINDOW, help="Rows of history per fit (0 = all)")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="Ticks ahead to predict")
+    parser.add_argument("--rolling", type=int, default=ROLLING, help="Window of the rolling error series")
+    parser.add_argument("--n-jobs", type=int, default=N_JOBS)
+    parser.add_argument("--feature-store", action="store_true", help="Load data from the feature store")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the feature store before loading")
+    parser.add_argument("--version", help="Store results under this name (default: the saved model's artifact version)")
+    parser.add_argument("--compare", action="store_true", help="Only list the stored backtests")
+    args = parser.parse_args()
+
+    if args.compare:
+        log_comparison(load_backtests())
+        raise SystemExit(0)
+
+    # Replays the saved model's features and parameters (tuned models record both)
+    metadata = train_model.load_metadata() or {}
+    # Metadata saved before versions were recorded falls back to the artifact itself
+    version = args.version or metadata.get("version") or artifact_version(train_model.MODEL_PATH) or "untrained"
+
+    logging.info(f"🚀 Starting backtest for model version {version}...")
+    X, y = load_arrays(args.feature_store, args.rebuild)
+    if X is None:
+        logging.error("❌ No data available for backtesting.")
+        raise SystemExit(1)
+
+    result = backtest(
+        X, y,
+        features=metadata.get("features"),
+        params=metadata.get("params"),
+        min_train=args.min_train,
+        retrain_every=args.retrain_every,
+        window=args.window,
+        horizon=args.horizon,
+        rolling=args.rolling,
+        n_jobs=args.n_jobs,
+    )
+    save_backtest(result, version)
+    log_comparison(load_backtests())
+    dump_metrics()
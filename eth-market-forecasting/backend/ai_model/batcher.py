@@ -0,0 +1,147 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+from backend.ai_model.model_utils import predict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Micro-batching: rows from concurrent requests collected for at most
+# INFERENCE_MAX_WAIT seconds (or until INFERENCE_MAX_BATCH rows) share one predict call
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", 256))
+INFERENCE_MAX_WAIT = float(os.getenv("INFERENCE_MAX_WAIT", 0.005))
+# Pending requests beyond this are rejected instead of queued
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", 128))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 1))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", 5.0))
+
+
+class Overloaded(Exception):
+    """
+    Raised when the inference queue is full or a request waited too long.
+    """
+
+
+class InferenceBatcher:
+    """
+    Runs model.predict on a bounded pool of worker threads, merging the rows
+    of concurrent requests into one call.
+
+    Each request submits a 2-D feature array (FEATURE_COLUMNS order) and gets
+    a Future for its slice of the predictions. Workers start lazily in the
+    process that first submits, so the batcher can be created before a
+    pre-forking server (gunicorn --preload) forks its workers.
+    """
+
+    def __init__(self, get_model, max_batch=INFERENCE_MAX_BATCH, max_wait=INFERENCE_MAX_WAIT,
+                 queue_size=INFERENCE_QUEUE_SIZE, workers=INFERENCE_WORKERS):
+        self.get_model = get_model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.workers = workers
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                for i in range(self.workers):
+                    threading.Thread(target=self._run, name=f"inference-{i}", daemon=True).start()
+                self._pid = os.getpid()
+
+    def submit(self, features):
+        """
+        Queues feature rows for prediction.
+
+        Args:
+            features (ndarray): 2-D array of feature rows.
+
+        Returns:
+            Future: Resolves to a 1-D array of predictions for these rows.
+
+        Raises:
+            Overloaded: If the queue is full.
+        """
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((np.asarray(features, dtype=np.float64), future))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded("Inference queue is full")
+        return future
+
+    def predict(self, features, timeout=INFERENCE_TIMEOUT):
+        """
+        Blocking helper around submit().
+
+        Raises:
+            Overloaded: If the queue is full or no result arrives within `timeout`.
+        """
+        future = self.submit(features)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise Overloaded(f"Inference did not finish within {timeout}s")
+
+    def _collect(self):
+        """
+        Blocks for one request, then gathers more until the batch is full or max_wait passes.
+        """
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                model = self.get_model()
+                predictions = predict(model, np.vstack([rows for rows, _ in batch]), "batcher")
+            except Exception as e:
+                logging.error(f"❌ Batched prediction failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for rows, future in batch:
+                future.set_result(predictions[offset:offset + len(rows)])
+                offset += len(rows)
+            with self._lock:
+                self.batches += 1
+                self.rows += offset
+
+    def stats(self):
+        """
+        Returns batch/row/rejection counters and the current queue depth.
+        """
+        with self._lock:
+            return {"batches": self.batches, "rows": self.rows, "rejected": self.rejected, "queued": self._queue.qsize()}
@@ -0,0 +1,282 @@
+import io
+import os
+import logging
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Export options: zlib-compressed arrays, and leaf values stored as uint16 steps
+# between their min and max (about 1.5e-5 of the value range per step)
+MODEL_COMPACT_COMPRESS = os.getenv("MODEL_COMPACT_COMPRESS", "False").lower() in ("true", "1", "yes")
+MODEL_COMPACT_QUANTIZE = os.getenv("MODEL_COMPACT_QUANTIZE", "False").lower() in ("true", "1", "yes")
+
+FORMAT_VERSION = 1
+# Rows evaluated at once; bounds the (rows x trees) node index vectors
+PREDICT_CHUNK = 4096
+# Levels between dropping finished (row, tree) pairs during evaluation
+COMPACT_EVERY = 4
+
+
+def compact_path(model_path):
+    """
+    Path of the compact export that belongs to a pickled model artifact.
+    """
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+def float32_floor(values):
+    """
+    Rounds float64 values down to float32.
+
+    sklearn compares float32 inputs against float64 thresholds; for any
+    float32 x, x <= t holds exactly when x <= float32_floor(t), so the
+    exported forest takes the same branches.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+class CompactForest:
+    """
+    A fitted random forest flattened into contiguous arrays, one entry per node
+    across all trees.
+
+    Leaves point to themselves as both children, so paths can be advanced
+    without checking for leaves; all rows and trees move down one level
+    together in a handful of NumPy operations. Only single-output averaging
+    forests (RandomForestRegressor, ExtraTreesRegressor) are supported.
+
+    Attributes:
+        feature: Split feature per node (smallest unsigned dtype that fits).
+        threshold: float32 split threshold per node, rounded down (see float32_floor).
+        left, right: int32 child node indices.
+        value: float32 prediction per node (only read at leaves).
+        roots: int32 index of each tree's root node.
+        depth: Depth of the deepest tree.
+        n_features_in_: Number of input columns.
+        feature_names_in_: Input column names, if the forest was fitted on a DataFrame.
+        source_version: artifact_version of the pickle this was exported with.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, n_features,
+                 feature_names=None, source_version=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.n_features_in_ = int(n_features)
+        if feature_names is not None:
+            # align_features reads this to select and order the input columns
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.source_version = source_version
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def predict(self, X):
+        """
+        Averages the leaf values reached by every tree for each row.
+
+        Args:
+            X: 2-D array or DataFrame with n_features_in_ columns.
+
+        Returns:
+            ndarray: float64 predictions, one per row.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+        predictions = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), PREDICT_CHUNK):
+            block = X[start:start + PREDICT_CHUNK]
+            leaves = self._walk(block.ravel(), len(block))
+            values = self.value[leaves].reshape(len(block), -1)
+            predictions[start:start + len(block)] = values.mean(axis=1, dtype=np.float64)
+        return predictions
+
+    def _walk(self, flat, rows):
+        """
+        Returns the leaf reached by every (row, tree) pair, row-major.
+
+        Paths are walked one level at a time as flat vectors. Every
+        COMPACT_EVERY levels the pairs that already sit on a leaf are dropped,
+        so shallow branches do not pay for the deepest tree.
+        """
+        n_trees = len(self.roots)
+        node = np.tile(self.roots, rows)
+        offset = np.repeat(np.arange(0, rows * self.n_features_in_, self.n_features_in_, dtype=np.int64), n_trees)
+        pair = np.arange(rows * n_trees)
+        leaves = np.empty(rows * n_trees, dtype=np.int32)
+        for level in range(1, self.depth + 1):
+            go_left = flat[offset + self.feature[node]] <= self.threshold[node]
+            step = np.where(go_left, self.left[node], self.right[node])
+            if level % COMPACT_EVERY:
+                node = step
+                continue
+            moving = step != node
+            leaves[pair[~moving]] = step[~moving]
+            node, offset, pair = step[moving], offset[moving], pair[moving]
+            if not len(pair):
+                break
+        leaves[pair] = node
+        return leaves
+
+
+def export_forest(model, source_version=None):
+    """
+    Flattens a fitted averaging forest into a CompactForest.
+
+    Args:
+        model: Fitted RandomForestRegressor or ExtraTreesRegressor.
+        source_version (str, optional): Version of the pickled artifact it mirrors.
+
+    Returns:
+        CompactForest
+
+    Raises:
+        TypeError: If the model is not a single-output forest of regression trees.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if (
+        not isinstance(estimators, list)
+        or not estimators
+        or not all(hasattr(tree, "tree_") for tree in estimators)
+        or getattr(model, "n_outputs_", 1) != 1
+    ):
+        raise TypeError(f"Cannot export {type(model).__name__}: expected a fitted single-output forest")
+
+    parts = {name: [] for name in ("feature", "threshold", "left", "right", "value")}
+    roots = []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        nodes = np.arange(offset, offset + tree.node_count)
+        leaf = tree.children_left < 0
+        parts["feature"].append(np.where(leaf, 0, tree.feature))
+        parts["threshold"].append(np.where(leaf, np.inf, tree.threshold))
+        parts["left"].append(np.where(leaf, nodes, tree.children_left + offset))
+        parts["right"].append(np.where(leaf, nodes, tree.children_right + offset))
+        parts["value"].append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += tree.node_count
+
+    n_features = model.n_features_in_
+    return CompactForest(
+        feature=np.concatenate(parts["feature"]).astype(np.min_scalar_type(max(n_features - 1, 0))),
+        threshold=float32_floor(np.concatenate(parts["threshold"])),
+        left=np.concatenate(parts["left"]).astype(np.int32),
+        right=np.concatenate(parts["right"]).astype(np.int32),
+        value=np.concatenate(parts["value"]).astype(np.float32),
+        roots=np.asarray(roots, dtype=np.int32),
+        depth=max(estimator.tree_.max_depth for estimator in estimators),
+        n_features=n_features,
+        feature_names=getattr(model, "feature_names_in_", None),
+        source_version=source_version,
+    )
+
+
+def save_compact(forest, path, compress=MODEL_COMPACT_COMPRESS, quantize=MODEL_COMPACT_QUANTIZE):
+    """
+    Writes a CompactForest as an .npz archive, atomically.
+
+    Args:
+        forest (CompactForest): Exported forest.
+        path (str): Destination path.
+        compress (bool): zlib-compress the arrays (smaller file, slower load).
+        quantize (bool): Store leaf values as uint16 plus offset and scale.
+    """
+    arrays = {
+        "format_version": np.asarray(FORMAT_VERSION),
+        "feature": forest.feature,
+        "threshold": forest.threshold,
+        "left": forest.left,
+        "right": forest.right,
+        "roots": forest.roots,
+        "depth": np.asarray(forest.depth),
+        "n_features": np.asarray(forest.n_features_in_),
+    }
+    if quantize:
+        low, high = float(forest.value.min()), float(forest.value.max())
+        scale = (high - low) / 65535 or 1.0
+        arrays["value_quantized"] = np.round((forest.value - low) / scale).astype(np.uint16)
+        arrays["value_offset"] = np.asarray(low)
+        arrays["value_scale"] = np.asarray(scale)
+    else:
+        arrays["value"] = forest.value
+    if hasattr(forest, "feature_names_in_"):
+        arrays["feature_names"] = np.asarray(forest.feature_names_in_, dtype=str)
+    if forest.source_version is not None:
+        arrays["source_version"] = np.asarray(forest.source_version)
+
+    buffer = io.BytesIO()
+    (np.savez_compressed if compress else np.savez)(buffer, **arrays)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(buffer.getbuffer())
+    os.replace(tmp_path, path)
+
+
+def load_compact(path):
+    """
+    Reads a CompactForest written by save_compact.
+
+    Returns:
+        CompactForest
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        if int(archive["format_version"]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format {int(archive['format_version'])}")
+        if "value" in archive:
+            value = archive["value"]
+        else:
+            value = (archive["value_quantized"] * archive["value_scale"] + archive["value_offset"]).astype(np.float32)
+        return CompactForest(
+            feature=archive["feature"],
+            threshold=archive["threshold"],
+            left=archive["left"],
+            right=archive["right"],
+            value=value,
+            roots=archive["roots"],
+            depth=archive["depth"],
+            n_features=archive["n_features"],
+            feature_names=archive["feature_names"].tolist() if "feature_names" in archive else None,
+            source_version=str(archive["source_version"]) if "source_version" in archive else None,
+        )
+
+
+def export_model(model, path, source_version=None, compress=MODEL_COMPACT_COMPRESS, quantize=MODEL_COMPACT_QUANTIZE):
+    """
+    Writes the compact export of a model next to its pickle.
+
+    Models that cannot be exported (e.g. a linear model) only keep their
+    pickle; an export left over from a previous forest is removed.
+
+    Returns:
+        CompactForest, or None if the model cannot be exported.
+    """
+    try:
+        forest = export_forest(model, source_version)
+    except TypeError as e:
+        logging.info(f"ℹ Skipping compact export: {e}")
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    save_compact(forest, path, compress=compress, quantize=quantize)
+    logging.info(
+        f"✅ Compact model ({forest.n_estimators} trees, {forest.node_count} nodes, "
+        f"{os.path.getsize(path) / 1e6:.1f} MB) saved to {path}"
+    )
+    return forest
@@ -0,0 +1,199 @@
+import os
+import json
+import logging
+import numpy as np
+
+from backend.data_pipeline.asof import load_asof_frame
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "backend/ai_model/feature_data")
+
+# Column name -> on-disk dtype; each column is one flat little-endian binary file
+COLUMNS = {
+    "timestamp": "<i8",
+    "price": "<f8",
+    "volume_usd": "<f8",
+    "gas_price": "<f8",
+    "tvl": "<f8",
+}
+
+# Fingerprint of the rows at or before the watermark in each SQLite table the
+# store is derived from. If one changes after a sync (e.g. a backfill), stored
+# rows are out of date and the next sync rebuilds the store. Market share is
+# read from market_share_snapshot: raw rows replaced by a newer report leave
+# it unchanged, but a snapshot stored behind the watermark adds to its count
+# or volume total.
+SOURCE_FINGERPRINTS = {
+    "eth_price": "SELECT COUNT(*) FROM eth_price WHERE ts <= ?",
+    "gas_price": "SELECT COUNT(*) FROM gas_price WHERE ts <= ?",
+    "tvl": "SELECT COUNT(*) FROM tvl WHERE ts <= ?",
+    "market_share_snapshot": "SELECT COUNT(*), TOTAL(volume_usd) FROM market_share_snapshot WHERE ts <= ?",
+}
+
+
+class FeatureStore:
+    """
+    Append-only columnar store of the as-of joined training data.
+
+    Every column lives in its own raw binary file that is opened with
+    numpy.memmap, so loading a column is zero-copy and training only pays
+    for the pages it touches. meta.json records the committed row count and
+    the last timestamp (the watermark); bytes past the committed row count
+    left behind by an interrupted append are ignored and overwritten. It also
+    records the SOURCE_FINGERPRINTS of the last sync, to detect history
+    written behind the watermark.
+    """
+
+    def __init__(self, root=FEATURE_STORE_DIR, columns=None):
+        self.root = root
+        self.columns = dict(columns or COLUMNS)
+        os.makedirs(self.root, exist_ok=True)
+        self.meta = self._read_meta()
+        if self.meta["columns"] != self.columns:
+            logging.warning("⚠ Feature store columns changed; the next sync rebuilds it.")
+            self.clear()
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.root, "meta.json")
+
+    def _column_path(self, name):
+        return os.path.join(self.root, f"{name}.bin")
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"rows": 0, "watermark": None, "columns": self.columns}
+
+    def _write_meta(self):
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.meta, file)
+        os.replace(tmp_path, self._meta_path)
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def watermark(self):
+        """
+        Epoch timestamp of the last stored row, or None if the store is empty.
+        """
+        return self.meta["watermark"]
+
+    def append(self, frame):
+        """
+        Appends rows newer than the watermark.
+
+        Args:
+            frame (DataFrame): Rows sorted by timestamp with every store column.
+
+        Returns:
+            int: Number of rows appended.
+        """
+        if self.watermark is not None:
+            frame = frame[frame["timestamp"] > self.watermark]
+        if frame.empty:
+            return 0
+
+        rows = self.meta["rows"]
+        for name, dtype in self.columns.items():
+            values = np.ascontiguousarray(frame[name].to_numpy(), dtype=dtype)
+            mode = "r+b" if os.path.exists(self._column_path(name)) else "wb"
+            with open(self._column_path(name), mode) as file:
+                file.seek(rows * np.dtype(dtype).itemsize)
+                file.write(values.tobytes())
+                file.truncate()
+
+        self.meta["rows"] = rows + len(frame)
+        self.meta["watermark"] = int(frame["timestamp"].iloc[-1])
+        self._write_meta()
+        return len(frame)
+
+    def sync(self, conn, rebuild=False):
+        """
+        Pulls price ticks newer than the watermark from SQLite and appends them.
+
+        If rows were written at or before the watermark since the last sync,
+        the stored features are out of date and the store is rebuilt from
+        scratch instead.
+
+        Args:
+            conn: Open SQLite connection.
+            rebuild (bool): Rebuild the store even if no such change is found.
+
+        Returns:
+            int: Number of rows appended.
+        """
+        # One read transaction, so the fingerprints match the rows loaded
+        started = not conn.in_transaction
+        if started:
+            conn.execute("BEGIN")
+        try:
+            changed = self._changed_source(conn)
+            if changed:
+                logging.warning(f"⚠ {changed} changed behind the feature store watermark; rebuilding it.")
+            if rebuild or changed:
+                self.clear()
+            appended = self.append(load_asof_frame(conn, since=self.watermark))
+            self.meta["sources"] = self._fingerprints(conn)
+            self._write_meta()
+        finally:
+            if started:
+                conn.rollback()
+        logging.info(f"✅ Feature store synced: {appended} new rows, {len(self)} total.")
+        return appended
+
+    def _fingerprints(self, conn):
+        if self.watermark is None:
+            return {}
+        return {table: list(conn.execute(query, (self.watermark,)).fetchone())
+                for table, query in SOURCE_FINGERPRINTS.items()}
+
+    def _changed_source(self, conn):
+        """
+        Returns the first source table whose rows at or before the watermark
+        changed since the last sync, or None.
+        """
+        sources = self.meta.get("sources")
+        if not sources:
+            return None
+        current = self._fingerprints(conn)
+        return next((table for table in SOURCE_FINGERPRINTS if sources.get(table) != current.get(table)), None)
+
+    def column(self, name):
+        """
+        Returns a read-only memory-mapped view of one column.
+        """
+        dtype = self.columns[name]
+        if not len(self):
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(len(self),))
+
+    def load(self, columns=None):
+        """
+        Returns {name: memmap} for the requested columns (default: all).
+        """
+        return {name: self.column(name) for name in (columns or self.columns)}
+
+    def matrix(self, columns):
+        """
+        Stacks the requested columns into a single float64 feature matrix.
+
+        This is the only copy made when loading from the store.
+        """
+        out = np.empty((len(self), len(columns)), dtype=np.float64)
+        for i, name in enumerate(columns):
+            out[:, i] = self.column(name)
+        return out
+
+    def clear(self):
+        """
+        Drops all stored rows so the next sync rebuilds the store from scratch.
+        """
+        self.meta = {"rows": 0, "watermark": None, "columns": self.columns}
+        self._write_meta()
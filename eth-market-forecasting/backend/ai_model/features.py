@@ -0,0 +1,205 @@
+import numpy as np
+
+from backend import metrics
+from backend.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+FEATURE_SECONDS = metrics.histogram("feature_build_seconds", "Feature computation time (kind=batch|online)")
+
+# Raw as-of joined columns the features are derived from (see load_asof_frame)
+BASE_COLUMNS = ["timestamp", "price", "volume_usd", "gas_price", "tvl"]
+
+# Window sizes are in price ticks (rows), not seconds
+PRICE_LAGS = (1, 2, 3, 6, 12, 24)
+RETURN_HORIZONS = (1, 6, 24)
+ROLLING_WINDOWS = (6, 24)
+GAS_WINDOW = 24
+GAS_PERCENTILES = (10, 50, 90)
+TVL_DELTAS = (1, 24)
+
+FEATURE_COLUMNS = (
+    BASE_COLUMNS
+    + [f"price_lag_{lag}" for lag in PRICE_LAGS]
+    + [f"log_return_{h}" for h in RETURN_HORIZONS]
+    + [f"price_mean_{w}" for w in ROLLING_WINDOWS]
+    + [f"volatility_{w}" for w in ROLLING_WINDOWS]
+    + [f"gas_p{q}" for q in GAS_PERCENTILES]
+    + [f"tvl_delta_{k}" for k in TVL_DELTAS]
+)
+
+# Rows of history needed before the first complete feature row
+# (volatility over w returns needs w + 1 prices)
+HISTORY = max(
+    max(PRICE_LAGS) + 1,
+    max(RETURN_HORIZONS) + 1,
+    max(ROLLING_WINDOWS) + 1,
+    GAS_WINDOW,
+    max(TVL_DELTAS) + 1,
+)
+
+
+@FEATURE_SECONDS.time(kind="batch")
+def compute_features(frame):
+    """
+    Computes every feature column for all rows of an as-of joined frame.
+
+    Each row only uses its own and earlier rows. The first HISTORY - 1 rows
+    are incomplete (NaN) because their windows are not full yet.
+
+    Args:
+        frame (DataFrame): BASE_COLUMNS sorted by timestamp.
+
+    Returns:
+        DataFrame: FEATURE_COLUMNS, aligned with `frame`'s index.
+    """
+    price = frame["price"].astype(np.float64)
+    log_price = np.log(price)
+    returns = log_price.diff()
+    gas = frame["gas_price"].astype(np.float64)
+    tvl = frame["tvl"].astype(np.float64)
+
+    features = {name: frame[name] for name in BASE_COLUMNS}
+    for lag in PRICE_LAGS:
+        features[f"price_lag_{lag}"] = price.shift(lag)
+    for h in RETURN_HORIZONS:
+        features[f"log_return_{h}"] = log_price - log_price.shift(h)
+    for w in ROLLING_WINDOWS:
+        features[f"price_mean_{w}"] = price.rolling(w).mean()
+    for w in ROLLING_WINDOWS:
+        features[f"volatility_{w}"] = returns.rolling(w).std()
+    gas_window = gas.rolling(GAS_WINDOW)
+    for q in GAS_PERCENTILES:
+        features[f"gas_p{q}"] = gas_window.quantile(q / 100)
+    for k in TVL_DELTAS:
+        features[f"tvl_delta_{k}"] = tvl.diff(k)
+    return pd.DataFrame(features)[FEATURE_COLUMNS]
+
+
+def build_training_set(frame):
+    """
+    Pairs the features of every tick with the price of the following tick.
+
+    Rows without a full window history, and the last row (whose next price is
+    not known yet), are dropped.
+
+    Args:
+        frame (DataFrame): BASE_COLUMNS sorted by timestamp.
+
+    Returns:
+        tuple: (X, y) with X in FEATURE_COLUMNS order and y the next price.
+    """
+    X = compute_features(frame)
+    y = frame["price"].astype(np.float64).shift(-1)
+    complete = X.notna().all(axis=1) & y.notna()
+    return X[complete].reset_index(drop=True), y[complete].reset_index(drop=True).rename("target")
+
+
+class RingBuffer:
+    """
+    Fixed-size circular buffer holding the most recent values of one series.
+    """
+
+    def __init__(self, size, dtype=np.float64):
+        self._data = np.zeros(size, dtype=dtype)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._data[self._head] = value
+        self._head = (self._head + 1) % len(self._data)
+        self._count = min(self._count + 1, len(self._data))
+
+    def last(self, n):
+        """
+        Returns the last `n` values, oldest first.
+        """
+        return self._data[(self._head - n + np.arange(n)) % len(self._data)]
+
+
+class OnlineFeatures:
+    """
+    Maintains the latest feature row from ring buffers for serving.
+
+    Only the last HISTORY base rows are kept, so each update costs the same
+    regardless of how long the history is. The formulas mirror
+    compute_features so served rows match the training matrix.
+    """
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self.buffers = {name: RingBuffer(history) for name in BASE_COLUMNS}
+        self.timestamp = None
+        self._latest = None
+
+    def __len__(self):
+        return len(self.buffers["timestamp"])
+
+    def update(self, row):
+        """
+        Pushes one base row; rows not newer than the last one are ignored.
+
+        Args:
+            row (dict): Values for every BASE_COLUMNS name.
+
+        Returns:
+            bool: Whether the row was applied.
+        """
+        timestamp = int(row["timestamp"])
+        if self.timestamp is not None and timestamp <= self.timestamp:
+            return False
+        for name, buffer in self.buffers.items():
+            buffer.append(row[name])
+        self.timestamp = timestamp
+        self._latest = None
+        return True
+
+    def extend(self, frame):
+        """
+        Pushes the rows of a frame sorted by timestamp.
+
+        Returns:
+            int: Number of rows applied.
+        """
+        rows = frame[BASE_COLUMNS].tail(self.history).itertuples(index=False, name=None)
+        return sum(self.update(dict(zip(BASE_COLUMNS, values))) for values in rows)
+
+    def latest(self):
+        """
+        Returns the feature row of the newest tick.
+
+        Returns:
+            ndarray: Shape (1, len(FEATURE_COLUMNS)), or None until HISTORY rows were seen.
+        """
+        if len(self) < self.history:
+            return None
+        if self._latest is None:
+            self._latest = self._compute()
+        return self._latest.copy()
+
+    @FEATURE_SECONDS.time(kind="online")
+    def _compute(self):
+        price = self.buffers["price"].last(self.history)
+        log_price = np.log(price)
+        returns = np.diff(log_price)
+        gas = self.buffers["gas_price"].last(GAS_WINDOW)
+        tvl = self.buffers["tvl"].last(self.history)
+
+        features = {name: self.buffers[name].last(1)[0] for name in BASE_COLUMNS}
+        features["timestamp"] = self.timestamp
+        for lag in PRICE_LAGS:
+            features[f"price_lag_{lag}"] = price[-1 - lag]
+        for h in RETURN_HORIZONS:
+            features[f"log_return_{h}"] = log_price[-1] - log_price[-1 - h]
+        for w in ROLLING_WINDOWS:
+            features[f"price_mean_{w}"] = price[-w:].mean()
+        for w in ROLLING_WINDOWS:
+            features[f"volatility_{w}"] = returns[-w:].std(ddof=1)
+        for q in GAS_PERCENTILES:
+            features[f"gas_p{q}"] = np.percentile(gas, q)
+        for k in TVL_DELTAS:
+            features[f"tvl_delta_{k}"] = tvl[-1] - tvl[-1 - k]
+        return np.array([[features[name] for name in FEATURE_COLUMNS]], dtype=np.float64)
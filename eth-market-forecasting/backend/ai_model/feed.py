@@ -0,0 +1,161 @@
+import os
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+from backend.ai_model.features import HISTORY, compute_features
+from backend.ai_model.model_utils import DB_PATH, fetch_data_version, predict
+from backend.ai_model.registry import get_registry
+from backend.data_pipeline.asof import load_asof_frame
+from backend.data_pipeline.connection import get_connection
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Seconds between checks for new data, and number of points kept in memory
+FEED_INTERVAL = float(os.getenv("FEED_INTERVAL", 10))
+FEED_HISTORY = int(os.getenv("FEED_HISTORY", 500))
+
+
+class PredictionFeed:
+    """
+    Bounded in-memory series of actual vs. predicted prices, maintained by one
+    background thread per process.
+
+    Each point is computed once, when its tick is ingested, and numbered with
+    an increasing `seq`; clients keep the last `seq` they received and ask for
+    newer points only. A point's `predicted` value is the forecast made at the
+    previous tick for this one, so the two series are directly comparable.
+    When a new model is loaded the history is recomputed and `generation`
+    changes, telling clients to replace rather than extend their series.
+    """
+
+    def __init__(self, db_path=DB_PATH, interval=FEED_INTERVAL, maxlen=FEED_HISTORY, registry=None):
+        self.db_path = db_path
+        self.interval = interval
+        self.points = deque(maxlen=maxlen)
+        self.forecast = None
+        self.registry = registry or get_registry()
+        self.generation = 0
+        self._seq = 0
+        self._version = None
+        self._model_version = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._pid = None
+
+    def start(self):
+        """
+        Starts the refresh thread in this process if it is not running yet.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._stopped.clear()
+                threading.Thread(target=self._run, name="prediction-feed", daemon=True).start()
+                self._pid = os.getpid()
+
+    def stop(self):
+        self._stopped.set()
+        self._pid = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"❌ Prediction feed refresh failed: {e}")
+            self._stopped.wait(self.interval)
+
+    def refresh(self):
+        """
+        Appends points for ticks ingested since the last refresh.
+
+        The whole history is recomputed (one batched predict) only on the
+        first refresh or after the model is swapped.
+
+        Returns:
+            int: Number of points appended.
+        """
+        model, model_version = self.registry.current()
+        if model is None:
+            return 0
+        version = fetch_data_version(self.db_path)
+        if version == self._version and model_version == self._model_version:
+            return 0
+
+        reseed = model_version != self._model_version
+        with self._lock:
+            last = None if reseed or not self.points else self.points[-1]["timestamp"]
+
+        conn = get_connection(self.db_path)
+        if last is None:
+            frame = load_asof_frame(conn, lookback=self.points.maxlen + HISTORY)
+        else:
+            frame = load_asof_frame(conn, since=last, lookback=HISTORY)
+        X = compute_features(frame)
+        new = X.notna().all(axis=1)
+        if last is not None:
+            new &= X["timestamp"] > last
+        new = new.to_numpy()
+        predictions = predict(model, X[new].to_numpy(dtype=np.float64), "feed") if new.any() else []
+
+        with self._lock:
+            if reseed:
+                self.points.clear()
+                self.forecast = None
+                self.generation += 1
+            for (timestamp, price), predicted in zip(X.loc[new, ["timestamp", "price"]].itertuples(index=False), predictions):
+                self._seq += 1
+                self.points.append({
+                    "seq": self._seq,
+                    "timestamp": int(timestamp),
+                    "actual": float(price),
+                    "predicted": self.forecast,
+                })
+                self.forecast = float(predicted)
+            self._version = version
+            self._model_version = model_version
+        return int(new.sum())
+
+    def delta(self, seq=0, generation=None):
+        """
+        Returns what a client holding points up to `seq` is missing.
+
+        Args:
+            seq (int): Last sequence number the client has.
+            generation (int, optional): Generation the client's points belong to.
+
+        Returns:
+            dict: generation, reset (client must drop its points), the new
+                  points oldest first, cursor (newest seq) and the current forecast.
+        """
+        with self._lock:
+            reset = generation != self.generation
+            points = [point for point in self.points if reset or point["seq"] > seq]
+            return {
+                "generation": self.generation,
+                "reset": reset,
+                "points": points,
+                "cursor": self.points[-1]["seq"] if self.points else 0,
+                "forecast": self.forecast,
+            }
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_feed():
+    """
+    Returns the process-wide feed, starting its refresh thread on first use.
+    """
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = PredictionFeed()
+        _feed.start()
+        return _feed
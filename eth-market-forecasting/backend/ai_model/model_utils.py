@@ -1,26 +1,61 @@
 import os
-import joblib
 import numpy as np
 import sqlite3
 import logging
-import pandas as pd
+import threading
 from dotenv import load_dotenv
+from backend import metrics
+from backend.lazy import lazy_import
+from backend.data_pipeline.asof import load_asof_frame
+from backend.data_pipeline.schema import data_version
+from backend.data_pipeline.connection import get_connection
+from backend.ai_model.compact import load_compact
+from backend.ai_model.features import BASE_COLUMNS, FEATURE_COLUMNS, HISTORY, OnlineFeatures, compute_features
 
 # Load environment variables
 load_dotenv()
 
+# Only needed once a model is loaded or features are built
+pd = lazy_import("pandas")
+joblib = lazy_import("joblib")
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 MODEL_PATH = "backend/ai_model/eth_forecast_model.pkl"
 DB_PATH = "backend/data_pipeline/market_data.db"
 
-def load_model(model_path=MODEL_PATH):
+# fetch_features_at loads requested timestamps further apart than this many
+# seconds separately, each with its own HISTORY lookback, instead of every
+# tick in between
+FEATURES_AT_GAP = int(os.getenv("FEATURES_AT_GAP", 3600))
+
+# Serving feature state per database, advanced with only the rows added since the last request
+_online_features = {}
+_online_lock = threading.Lock()
+
+MODEL_LOAD_SECONDS = metrics.histogram("model_load_seconds", "Model artifact load time by format")
+SQL_SECONDS = metrics.histogram("sql_query_seconds", "SQLite query time by query")
+PREDICT_SECONDS = metrics.histogram("predict_seconds", "model.predict time by caller")
+PREDICT_ROWS = metrics.counter("predicted_rows_total", "Rows passed to model.predict by caller")
+
+def load_model(model_path=MODEL_PATH, mmap_mode=None):
     """
     Loads the trained machine learning model for ETH price forecasting.
+
+    `.npz` paths are compact forest exports (see compact.py); anything else
+    is a joblib pickle.
+
+    :param mmap_mode: Passed to joblib.load; "r" maps the artifact's NumPy
+                      arrays read-only from the page cache instead of copying them.
     """
     try:
-        model = joblib.load(model_path)
+        if model_path.endswith(".npz"):
+            with MODEL_LOAD_SECONDS.time(format="compact"):
+                model = load_compact(model_path)
+        else:
+            with MODEL_LOAD_SECONDS.time(format="pickle"):
+                model = joblib.load(model_path, mmap_mode=mmap_mode)
         logging.info("✅ Model loaded successfully.")
         return model
     except FileNotFoundError:
@@ -31,39 +66,140 @@ def load_model(model_path=MODEL_PATH):
 
 def fetch_latest_data(db_path=DB_PATH):
     """
-    Fetches the latest available market data from SQLite database.
-    Uses the closest timestamp match if an exact one isn't available.
+    Fetches the feature row for the latest price tick from SQLite database.
+
+    The first call loads the last HISTORY ticks; later calls only load ticks
+    newer than the last one seen and push them into the ring buffers.
+
+    :return: 2-D array in FEATURE_COLUMNS order, or None if there is not enough history.
     """
     try:
-        with sqlite3.connect(db_path) as conn:
-            query = """
-                SELECT e.timestamp, 
-                       COALESCE(m.volume_usd, 0) AS volume_usd, 
-                       COALESCE(g.average, 0) AS gas_price
-                FROM eth_price e
-                LEFT JOIN market_share m ON m.timestamp = (
-                    SELECT timestamp FROM market_share 
-                    WHERE timestamp <= e.timestamp 
-                    ORDER BY timestamp DESC LIMIT 1
-                )
-                LEFT JOIN gas_price g ON g.timestamp = (
-                    SELECT timestamp FROM gas_price 
-                    WHERE timestamp <= e.timestamp 
-                    ORDER BY timestamp DESC LIMIT 1
-                )
-                ORDER BY e.timestamp DESC LIMIT 1;
-            """
-            df = pd.read_sql(query, conn)
-
-        if df.empty:
-            logging.warning("⚠ Missing data for prediction.")
+        with _online_lock:
+            online = _online_features.setdefault(db_path, OnlineFeatures())
+            conn = get_connection(db_path)
+            if online.timestamp is None:
+                df = load_asof_frame(conn, lookback=HISTORY)
+            else:
+                df = load_asof_frame(conn, since=online.timestamp)
+            online.extend(df)
+            features = online.latest()
+
+        if features is None:
+            logging.warning(f"⚠ Missing data for prediction ({len(online)}/{HISTORY} ticks of history).")
             return None
 
-        # Convert timestamp to Unix format
-        df["timestamp"] = pd.to_datetime(df["timestamp"]).astype("int64") // 10**9
-        logging.info(f"✅ Latest feature data retrieved successfully: {df}")
-        return df.values
+        logging.info("✅ Latest feature data retrieved successfully.")
+        return features
 
     except sqlite3.Error as e:
         logging.error(f"❌ Database error: {e}")
     return None
+
+def fetch_features_at(timestamps, db_path=DB_PATH, gap=FEATURES_AT_GAP):
+    """
+    Builds the feature matrix for the latest price tick at or before each timestamp.
+
+    Requested timestamps are grouped into clusters with no gap wider than
+    `gap` seconds. Each cluster's history (plus HISTORY ticks of lookback) is
+    loaded with one query and featurized with compute_features, the same code
+    used for training, so a few timestamps years apart do not load every
+    tick between them.
+
+    :param timestamps: Sequence of epoch seconds, in any order.
+    :param gap: Widest gap in seconds between timestamps loaded together.
+    :return: Tuple (ticks, features, valid): the matched tick of every request,
+             a 2-D array in FEATURE_COLUMNS order and a boolean mask of rows
+             that had a tick with enough history.
+    """
+    requested = np.asarray(timestamps, dtype=np.int64)
+    order = np.argsort(requested, kind="stable")
+    breaks = np.flatnonzero(np.diff(requested[order]) > gap) + 1
+    conn = get_connection(db_path)
+
+    rows = np.full((len(requested), len(FEATURE_COLUMNS)), np.nan)
+    for cluster in np.split(order, breaks):
+        times = requested[cluster]
+        frame = load_asof_frame(conn, since=int(times.min()), lookback=HISTORY, until=int(times.max()))
+        features = compute_features(frame).to_numpy(dtype=np.float64)
+        positions = np.searchsorted(frame["timestamp"].to_numpy(), times, side="right") - 1
+        found = positions >= 0
+        rows[cluster[found]] = features[positions[found]]
+
+    valid = ~np.isnan(rows).any(axis=1)
+    ticks = np.where(valid, rows[:, FEATURE_COLUMNS.index("timestamp")], np.nan)
+    return ticks, rows, valid
+
+def forecast_horizon(model, steps, db_path=DB_PATH):
+    """
+    Rolls the one-step model forward `steps` ticks from the latest data.
+
+    Each predicted price is pushed into a private OnlineFeatures copy as the
+    next tick (exogenous series held at their last value, ticks spaced by the
+    median recent interval), so the next step sees it in its lags and windows.
+
+    :return: Tuple (timestamps, predictions) as arrays, or None if there is
+             not enough history.
+    """
+    frame = load_asof_frame(get_connection(db_path), lookback=HISTORY)
+    online = OnlineFeatures()
+    online.extend(frame)
+    if online.latest() is None:
+        return None
+
+    interval = int(np.median(np.diff(frame["timestamp"].to_numpy())))
+    row = dict(zip(BASE_COLUMNS, frame[BASE_COLUMNS].iloc[-1].tolist()))
+    timestamps = np.empty(steps, dtype=np.int64)
+    predictions = np.empty(steps, dtype=np.float64)
+    for step in range(steps):
+        predictions[step] = predict(model, online.latest(), "horizon")[0]
+        row.update(timestamp=int(row["timestamp"]) + interval, price=predictions[step])
+        online.update(row)
+        timestamps[step] = row["timestamp"]
+    return timestamps, predictions
+
+def fetch_data_version(db_path=DB_PATH):
+    """
+    Returns the current data version of the database, used as a cache key.
+
+    :return: int, or None if the database cannot be read.
+    """
+    try:
+        with SQL_SECONDS.time(query="data_version"):
+            return data_version(get_connection(db_path))
+    except sqlite3.Error as e:
+        logging.error(f"❌ Database error while reading data version: {e}")
+    return None
+
+def align_features(model, features):
+    """
+    Selects the columns a model was fitted on from FEATURE_COLUMNS-ordered rows.
+
+    Models fitted on a DataFrame (e.g. a tuned model using a feature subset)
+    record their inputs in `feature_names_in_`; models fitted on plain arrays
+    are assumed to use every column.
+
+    :param model: Fitted estimator.
+    :param features: 2-D array in FEATURE_COLUMNS order.
+    :return: DataFrame with the model's feature columns.
+    """
+    columns = list(getattr(model, "feature_names_in_", FEATURE_COLUMNS))
+    frame = pd.DataFrame(np.asarray(features), columns=FEATURE_COLUMNS)
+    return frame[columns]
+
+def predict(model, features, caller):
+    """
+    Runs model.predict on FEATURE_COLUMNS-ordered rows.
+
+    Only the predict call itself is timed (predict_seconds), so tree traversal
+    can be told apart from feature building and data loading.
+
+    :param model: Fitted estimator.
+    :param features: 2-D array in FEATURE_COLUMNS order.
+    :param caller: Label for the metrics, e.g. "batcher" or "feed".
+    :return: 1-D array of predictions.
+    """
+    X = align_features(model, features)
+    with PREDICT_SECONDS.time(caller=caller):
+        predictions = model.predict(X)
+    PREDICT_ROWS.inc(len(X), caller=caller)
+    return predictions
@@ -1,11 +1,13 @@
-
-from backend.ai_model.model_utils import load_model, fetch_latest_data
-
-MODEL = load_model()
+import logging
+import argparse
+from backend import metrics
+from backend.ai_model.model_utils import fetch_latest_data, forecast_horizon, predict
+from backend.ai_model.registry import get_registry
 
 
 def predict_eth_price():
-    if MODEL is None:
+    model = get_registry().get()
+    if model is None:
         return None
 
     latest_features = fetch_latest_data()
@@ -13,17 +15,43 @@ def predict_eth_price():
         return None
 
     try:
-        feature_names = ["timestamp", "volume_usd", "gas_price"]
-        prediction = MODEL.predict(pd.DataFrame(latest_features, columns=feature_names))
+        prediction = predict(model, latest_features, "cli")
         return float(prediction[0])
     except Exception as e:
         logging.error(f"❌ Error during prediction: {e}")
     return None
 
+def predict_horizon(steps):
+    """
+    Forecasts the next `steps` ticks; returns (timestamps, predictions) or None.
+    """
+    model = get_registry().get()
+    if model is None:
+        return None
+
+    try:
+        return forecast_horizon(model, steps)
+    except Exception as e:
+        logging.error(f"❌ Error during forecast: {e}")
+    return None
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict the next ETH price.")
+    parser.add_argument("--horizon", type=int, default=1, help="Number of future ticks to forecast")
+    args = parser.parse_args()
+
     logging.info("🚀 Running ETH Price Prediction...")
-    predicted_price = predict_eth_price()
-    if predicted_price is not None:
-        print(f"📈 Predicted ETH Price: ${predicted_price:.2f}")
+    if args.horizon > 1:
+        forecast = predict_horizon(args.horizon)
+        if forecast is not None:
+            for timestamp, price in zip(*forecast):
+                print(f"📈 {timestamp}: ${price:.2f}")
+        else:
+            print("❌ Failed to generate forecast.")
     else:
-        print("❌ Failed to generate prediction.")
+        predicted_price = predict_eth_price()
+        if predicted_price is not None:
+            print(f"📈 Predicted ETH Price: ${predicted_price:.2f}")
+        else:
+            print("❌ Failed to generate prediction.")
+    metrics.dump()
@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Seconds a cached value stays valid even if the data version does not change
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", 30))
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 64))
+
+
+class _Flight:
+    """
+    One in-progress computation that concurrent callers wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PredictionCache:
+    """
+    Thread-safe TTL cache with request coalescing.
+
+    Keys are expected to contain the data version (see schema.data_version),
+    so new ingested rows produce a new key and stale entries are simply never
+    read again; the TTL bounds staleness for inputs the version does not
+    cover. When several threads miss on the same key at once, only the first
+    one computes and the others wait for its result.
+    """
+
+    def __init__(self, ttl=PREDICTION_CACHE_TTL, max_entries=PREDICTION_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for `key`, computing it on a miss.
+
+        None results and exceptions are passed to every waiting caller but
+        are not cached, so the next request tries again.
+
+        Args:
+            key: Hashable cache key.
+            compute (callable): Zero-argument function producing the value.
+
+        Returns:
+            The cached or freshly computed value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            flight = self._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and flight.value is not None:
+                    self._entries[key] = (flight.value, time.monotonic() + self.ttl)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss/coalesced counters and the number of cached entries.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "entries": len(self._entries)}
@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import threading
+
+from backend.ai_model.compact import compact_path
+from backend.ai_model.model_utils import MODEL_PATH, load_model
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# joblib mmap_mode for model artifacts ("" disables memory mapping)
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "r") or None
+# Seconds between checks for a newer artifact on disk
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", 5))
+# "compact" serves the .npz export saved next to the pickle when it matches it; "pickle" always unpickles
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "compact")
+
+
+def artifact_version(path):
+    """
+    Identifies one written artifact. save_model replaces the file atomically,
+    so every save gets a new inode and modification time.
+
+    Args:
+        path (str): Artifact path.
+
+    Returns:
+        str: Version id, or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_ino}"
+
+
+class ModelRegistry:
+    """
+    Holds one lazily loaded model per process and hot-swaps it when a new
+    artifact is saved.
+
+    The model and its version are replaced together as a single tuple, so
+    readers always see a consistent pair and never wait for a reload: the
+    thread that notices a new artifact loads it while others keep serving the
+    previous model.
+
+    The pickle's version decides when to reload. With the compact format the
+    .npz export is served instead, as long as it was exported from that
+    exact pickle; otherwise the pickle itself is loaded.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, mmap_mode=MODEL_MMAP_MODE, check_interval=MODEL_RELOAD_INTERVAL,
+                 model_format=MODEL_FORMAT):
+        self.model_path = model_path
+        self.mmap_mode = mmap_mode
+        self.check_interval = check_interval
+        self.model_format = model_format
+        self._current = (None, None)
+        self._next_check = 0.0
+        self._load_lock = threading.Lock()
+
+    def current(self):
+        """
+        Returns (model, version), loading or reloading the artifact if it changed.
+
+        Returns:
+            tuple: (model, version); (None, None) if no artifact could be loaded.
+        """
+        if time.monotonic() >= self._next_check:
+            self._refresh()
+        return self._current
+
+    def get(self):
+        """
+        Returns the current model, or None.
+        """
+        return self.current()[0]
+
+    @property
+    def version(self):
+        return self.current()[1]
+
+    def _refresh(self):
+        # Only one thread checks/loads; the others keep using the current model
+        if not self._load_lock.acquire(blocking=self._current[0] is None):
+            return
+        try:
+            if time.monotonic() < self._next_check:
+                return
+            version = artifact_version(self.model_path)
+            if version is not None and version != self._current[1]:
+                model = self._load(version)
+                if model is not None:
+                    previous = self._current[1]
+                    self._current = (model, version)
+                    if previous is not None:
+                        logging.info(f"🔁 Hot-swapped model {previous} -> {version}.")
+            self._next_check = time.monotonic() + self.check_interval
+        finally:
+            self._load_lock.release()
+
+    def _load(self, version):
+        if self.model_format == "compact" and not self.model_path.endswith(".npz"):
+            path = compact_path(self.model_path)
+            if os.path.exists(path):
+                model = load_model(path)
+                if model is not None and model.source_version == version:
+                    return model
+                logging.warning(f"⚠ {path} does not match {self.model_path}; loading the pickle instead.")
+        return load_model(self.model_path, mmap_mode=self.mmap_mode)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Returns the process-wide registry shared by the API, predict script and dashboard.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
@@ -3,12 +3,25 @@ import pandas as pd
 import numpy as np
 import logging
 import os
+import json
+import math
 import joblib
+import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error
+# Imported by name: `metrics` is used throughout for evaluation results
+from backend.metrics import dump as dump_metrics, histogram
+from backend.data_pipeline.asof import load_asof_frame
+from backend.data_pipeline.schema import connect
+from backend.ai_model.feature_store import FeatureStore
+from backend.ai_model.features import BASE_COLUMNS, FEATURE_COLUMNS, HISTORY, build_training_set
+from backend.ai_model.model_utils import load_model
+from backend.ai_model.compact import compact_path, export_model
+from backend.ai_model.registry import artifact_version
+from backend.profiling import add_profile_argument, profile
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +32,18 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 # Database and model paths
 DB_PATH = "backend/data_pipeline/market_data.db"
 MODEL_PATH = "backend/ai_model/eth_forecast_model.pkl"
+MODEL_META_PATH = "backend/ai_model/eth_forecast_model.json"
+
+# Incremental retraining: trees added per run and the forest size that forces a full retrain
+INCREMENTAL_TREES = int(os.getenv("INCREMENTAL_TREES", 10))
+MAX_TREES = int(os.getenv("MAX_TREES", 500))
+
+TEST_SIZE = 0.2
+
+# Worker processes used by the forest (-1 = all cores)
+N_JOBS = int(os.getenv("TRAIN_N_JOBS", -1))
+
+FIT_SECONDS = histogram("model_fit_seconds", "RandomForest fit time by training mode")
 
 def load_data():
     """
@@ -28,25 +53,8 @@ def load_data():
         DataFrame: Pandas DataFrame with relevant features.
     """
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            query = """
-    SELECT e.timestamp, e.price, 
-           COALESCE(m.volume_usd, 0) AS volume_usd, 
-           COALESCE(g.average, 0) AS gas_price
-    FROM eth_price e
-    LEFT JOIN market_share m ON m.timestamp = (
-        SELECT timestamp FROM market_share 
-        WHERE timestamp <= e.timestamp 
-        ORDER BY timestamp DESC LIMIT 1
-    )
-    LEFT JOIN gas_price g ON g.timestamp = (
-        SELECT timestamp FROM gas_price 
-        WHERE timestamp <= e.timestamp 
-        ORDER BY timestamp DESC LIMIT 1
-    )
-    ORDER BY e.timestamp ASC;
-"""
-            df = pd.read_sql(query, conn)
+        with connect(DB_PATH) as conn:
+            df = load_asof_frame(conn)
 
         if df.empty:
             logging.error("❌ Loaded dataset is empty.")
@@ -67,6 +75,7 @@ def preprocess_data(df):
     Prepares data for training:
     - Handles missing values with forward fill.
     - Converts timestamp to Unix format.
+    - Builds the engineered features and next-tick price target.
     - Splits the data into training and testing sets.
 
     Args:
@@ -83,81 +92,291 @@ def preprocess_data(df):
     df.ffill(inplace=True)
     df = df.infer_objects(copy=False)
 
-    # Convert timestamp to Unix timestamp (seconds)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df["timestamp"] = df["timestamp"].astype("int64") // 10**9
+    # Convert timestamp to Unix timestamp (seconds) unless it is already epoch seconds
+    if not pd.api.types.is_integer_dtype(df["timestamp"]):
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        df["timestamp"] = df["timestamp"].astype("int64") // 10**9
 
     # Ensure "price" column exists
     if "price" not in df.columns:
         logging.error("❌ 'price' column is missing from the dataset.")
         return None, None, None, None
 
-    # Define features and target variable
-    X = df[["timestamp", "volume_usd", "gas_price"]]  # Train on all three features
-    y = df["price"]
+    # Define features and target variable (price of the next tick)
+    X, y = build_training_set(df)
+    if X.empty:
+        logging.error(f"❌ Not enough rows to build features (need more than {HISTORY}).")
+        return None, None, None, None
 
     # Split data preserving time order (no shuffling)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, shuffle=False)
     logging.info(f"✅ Data split into {len(X_train)} training and {len(X_test)} test samples.")
 
     return X_train, X_test, y_train, y_test
 
-def train_and_evaluate(X_train, X_test, y_train, y_test):
+def load_feature_store(store=None, rebuild=False):
     """
-    Trains a machine learning model and evaluates it.
+    Brings the columnar feature store up to date with SQLite and returns it.
+
+    Only price ticks newer than the store's watermark are queried, unless
+    history behind it changed (see FeatureStore.sync).
 
     Args:
-        X_train, X_test, y_train, y_test: Training and testing datasets.
+        store (FeatureStore, optional): Store to sync; defaults to FEATURE_STORE_DIR.
+        rebuild (bool): Rebuild the store from scratch.
 
     Returns:
-        model: Trained model.
+        FeatureStore: Synced store, or None on database error.
     """
-    if any(v is None for v in [X_train, X_test, y_train, y_test]):
-        logging.error("❌ Training aborted due to missing data.")
+    store = store or FeatureStore()
+    try:
+        with connect(DB_PATH) as conn:
+            store.sync(conn, rebuild=rebuild)
+    except sqlite3.Error as e:
+        logging.error(f"❌ Database error while syncing feature store: {e}")
         return None
+    return store
 
-    # Initialize and train the model
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+def preprocess_store(store):
+    """
+    Builds the time-ordered train/test split directly from the feature store.
 
-    # Make predictions
-    y_pred = model.predict(X_test)
+    The base columns are read from their memory-mapped files and the features
+    are computed with the same code as preprocess_data; the split itself is
+    slicing, so no further copies are made.
 
-    # Evaluate model performance
+    Args:
+        store (FeatureStore): Synced feature store.
+
+    Returns:
+        tuple: (X_train, X_test, y_train, y_test) as NumPy arrays.
+    """
+    if store is None or not len(store):
+        logging.error("❌ Feature store is empty or None.")
+        return None, None, None, None
+
+    X, y = build_training_set(pd.DataFrame(store.load(BASE_COLUMNS)))
+    if X.empty:
+        logging.error(f"❌ Not enough rows to build features (need more than {HISTORY}).")
+        return None, None, None, None
+    X = X.to_numpy(dtype=np.float64)
+    y = y.to_numpy()
+
+    # Same split sizes as train_test_split(test_size=TEST_SIZE, shuffle=False)
+    n_train = len(X) - math.ceil(len(X) * TEST_SIZE)
+    logging.info(f"✅ Data split into {n_train} training and {len(X) - n_train} test samples.")
+    return X[:n_train], X[n_train:], y[:n_train], y[n_train:]
+
+def evaluate_model(model, X_test, y_test):
+    """
+    Computes error metrics for a model on a held-out set.
+
+    Args:
+        model: Fitted regressor.
+        X_test, y_test: Evaluation features and targets.
+
+    Returns:
+        dict: MAE, MSE and RMSE.
+    """
+    y_pred = model.predict(X_test)
     mae = mean_absolute_error(y_test, y_pred)
     mse = mean_squared_error(y_test, y_pred)
     rmse = np.sqrt(mse)
 
-    logging.info(f"✅ Model trained and saved at {MODEL_PATH}")
     logging.info(f"📊 Model Evaluation Metrics:")
     logging.info(f"🔹 MAE: {mae:.4f}")
     logging.info(f"🔹 MSE: {mse:.4f}")
     logging.info(f"🔹 RMSE: {rmse:.4f}")
+    return {"mae": float(mae), "mse": float(mse), "rmse": float(rmse)}
+
+def train_and_evaluate(X_train, X_test, y_train, y_test, return_metrics=False):
+    """
+    Trains a machine learning model and evaluates it.
+
+    Args:
+        X_train, X_test, y_train, y_test: Training and testing datasets.
+        return_metrics (bool): Also return the evaluation metrics.
+
+    Returns:
+        model: Trained model, or (model, metrics) if return_metrics is set.
+    """
+    if any(v is None for v in [X_train, X_test, y_train, y_test]):
+        logging.error("❌ Training aborted due to missing data.")
+        return (None, None) if return_metrics else None
+
+    # Initialize and train the model
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=N_JOBS)
+    with FIT_SECONDS.time(mode="full"):
+        model.fit(X_train, y_train)
+    logging.info("✅ Model trained.")
+
+    # Evaluate model performance
+    metrics = evaluate_model(model, X_test, y_test)
+
+    return (model, metrics) if return_metrics else model
+
+def load_metadata(meta_path=None):
+    """
+    Loads the training metadata stored next to the model artifact.
+
+    Args:
+        meta_path (str, optional): Defaults to MODEL_META_PATH.
+
+    Returns:
+        dict: Metadata, or None if no metadata has been written yet.
+    """
+    try:
+        with open(meta_path or MODEL_META_PATH) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def build_metadata(model, X_train, metrics, mode="full", previous=None, features=None):
+    """
+    Builds the metadata saved alongside a model.
+
+    The watermark is the timestamp of the last row the forest was trained on;
+    the next incremental run trains on everything after it, including the
+    rows that were held out for evaluation this time.
+
+    Args:
+        model: Trained model.
+        X_train: Features the model was (last) fitted on.
+        metrics (dict): Evaluation metrics.
+        mode (str): "full", "incremental" or "tuned".
+        previous (dict, optional): Metadata of the model being updated.
+        features (list, optional): Columns the model uses, if a subset of FEATURE_COLUMNS.
 
-    return model
+    Returns:
+        dict: Metadata.
+    """
+    X_train = np.asarray(X_train)
+    rows_trained = len(X_train) + ((previous or {}).get("rows_trained", 0) if mode == "incremental" else 0)
+    return {
+        "watermark": int(X_train[-1, FEATURE_COLUMNS.index("timestamp")]),
+        "rows_trained": rows_trained,
+        "n_estimators": model.n_estimators,
+        "features": list(features or FEATURE_COLUMNS),
+        "metrics": metrics,
+        "mode": mode,
+        "trained_at": datetime.now().isoformat(),
+    }
 
-def save_model(model):
+def train_incremental(new_trees=INCREMENTAL_TREES, max_trees=MAX_TREES):
+    """
+    Grows the saved forest with trees fitted only on rows past its watermark.
+
+    The current model is first scored on the new rows (data it has never
+    seen), then warm_start adds `new_trees` trees trained on them. The
+    HISTORY ticks before the watermark are loaded as well so the first new
+    rows get complete feature windows.
+
+    Args:
+        new_trees (int): Trees to add per incremental run.
+        max_trees (int): Forest size at which a full retrain is required instead.
+
+    Returns:
+        tuple: (model, metadata); metadata is None if no rows are past the
+            watermark (nothing to save), and both are None if a full retrain
+            is needed.
+    """
+    metadata = load_metadata()
+    model = load_model(MODEL_PATH)
+    if model is None or metadata is None or metadata.get("features") != FEATURE_COLUMNS:
+        logging.warning("⚠ No compatible model/metadata found; a full retrain is required.")
+        return None, None
+    if model.n_estimators + new_trees > max_trees:
+        logging.warning(f"⚠ Forest would exceed {max_trees} trees; a full retrain is required.")
+        return None, None
+
+    try:
+        with connect(DB_PATH) as conn:
+            df = load_asof_frame(conn, since=metadata["watermark"], lookback=HISTORY)
+    except sqlite3.Error as e:
+        logging.error(f"❌ Database error while loading new data: {e}")
+        return None, None
+
+    X, y = build_training_set(df)
+    new = (X["timestamp"] > metadata["watermark"]).to_numpy()
+    if not new.any():
+        logging.info("✅ No rows past the watermark; model is up to date.")
+        return model, None
+
+    X_new = X[new]
+    y_new = y[new]
+    logging.info(f"📊 Scoring current model on {len(X_new)} new rows before updating:")
+    metrics = evaluate_model(model, X_new, y_new)
+
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + new_trees)
+    with FIT_SECONDS.time(mode="incremental"):
+        model.fit(X_new, y_new)
+    logging.info(f"✅ Added {new_trees} trees trained on {len(X_new)} new rows ({model.n_estimators} total).")
+
+    return model, build_metadata(model, X_new, metrics, mode="incremental", previous=metadata)
+
+def save_model(model, metadata=None):
     """
     Saves the trained model to a file.
 
+    The artifact is written to a temporary file and atomically renamed, so
+    serving processes (see registry.ModelRegistry) either keep the previous
+    model or hot-swap to the complete new one, never a partial file.
+
+    Forests are also exported to the compact .npz format before the rename,
+    tagged with the version the pickle will have, so servers never pair a
+    new pickle with an old export.
+
     Args:
         model: Trained machine learning model.
+        metadata (dict, optional): Training metadata (watermark, metrics) saved alongside it.
     """
     if model:
-        joblib.dump(model, MODEL_PATH)
+        tmp_path = MODEL_PATH + ".tmp"
+        joblib.dump(model, tmp_path)
+        # os.replace keeps the inode and mtime, i.e. the artifact version
+        export_model(model, compact_path(MODEL_PATH), source_version=artifact_version(tmp_path))
+        os.replace(tmp_path, MODEL_PATH)
         logging.info(f"✅ Model successfully saved to {MODEL_PATH}")
+        if metadata is not None:
+            metadata = dict(metadata, version=artifact_version(MODEL_PATH))
+            with open(MODEL_META_PATH, "w") as file:
+                json.dump(metadata, file, indent=2)
+            logging.info(f"✅ Model metadata saved to {MODEL_META_PATH}")
     else:
         logging.error("❌ No model to save.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the ETH price forecasting model.")
+    parser.add_argument("--feature-store", action="store_true",
+                        help="Train from the memory-mapped feature store instead of a full SQL load")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the feature store before training")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Grow the saved forest with rows newer than its watermark")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
     logging.info("🚀 Starting ETH Market Forecast Model Training...")
+    with profile("train_model", args.profile):
+        if args.incremental:
+            model, metadata = train_incremental()
+            if model is not None:
+                # Rewriting an unchanged model would make every server reload it
+                if metadata is not None:
+                    save_model(model, metadata)
+                dump_metrics()
+                raise SystemExit(0)
+            logging.info("🔁 Falling back to a full retrain...")
 
-    # Load and preprocess data
-    data = load_data()
-    X_train, X_test, y_train, y_test = preprocess_data(data)
+        # Load and preprocess data
+        if args.feature_store:
+            X_train, X_test, y_train, y_test = preprocess_store(load_feature_store(rebuild=args.rebuild))
+        else:
+            data = load_data()
+            X_train, X_test, y_train, y_test = preprocess_data(data)
 
-    # Train and evaluate the model
-    model = train_and_evaluate(X_train, X_test, y_train, y_test)
+        # Train and evaluate the model
+        model, metrics = train_and_evaluate(X_train, X_test, y_train, y_test, return_metrics=True)
 
-    # Save the model if training was successful
-    save_model(model)
+        # Save the model if training was successful
+        save_model(model, build_metadata(model, X_train, metrics) if model else None)
+    dump_metrics()
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.model_selection import ParameterGrid, TimeSeriesSplit
+
+from backend.ai_model import train_model
+from backend.metrics import dump as dump_metrics
+from backend.ai_model.features import BASE_COLUMNS, FEATURE_COLUMNS, build_training_set
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+LEADERBOARD_PATH = "backend/ai_model/leaderboard.json"
+
+# Default search space; override with --grid pointing at a JSON file of the same shape
+PARAM_GRID = {
+    "n_estimators": [100, 200],
+    "max_depth": [None, 10, 20],
+    "min_samples_leaf": [1, 5],
+}
+FEATURE_SETS = {
+    "all": FEATURE_COLUMNS,
+    "no_timestamp": [c for c in FEATURE_COLUMNS if c != "timestamp"],
+    "market_only": ["volume_usd", "gas_price", "tvl"],
+}
+N_SPLITS = int(os.getenv("TUNING_SPLITS", 5))
+N_JOBS = int(os.getenv("TUNING_N_JOBS", -1))
+
+
+def _fit_fold(X, y, params, train_end, test_start, test_end):
+    """
+    Fits one candidate on one walk-forward fold and returns its errors.
+
+    X holds only the candidate's feature set and TimeSeriesSplit folds are
+    contiguous, so the train and test sets are slices (views) of the shared
+    read-only arrays rather than copies.
+    """
+    model = RandomForestRegressor(random_state=42, n_jobs=1, **params)
+    model.fit(X[:train_end], y[:train_end])
+    y_pred = model.predict(X[test_start:test_end])
+    y_true = y[test_start:test_end]
+    mse = mean_squared_error(y_true, y_pred)
+    return mean_absolute_error(y_true, y_pred), float(mse), float(np.sqrt(mse))
+
+
+def tune(X, y, param_grid=None, feature_sets=None, n_splits=N_SPLITS, n_jobs=N_JOBS):
+    """
+    Runs walk-forward cross-validation for every (feature set, parameters) candidate.
+
+    Each (candidate, fold) pair is a separate task in a process pool. Arrays
+    larger than 1 MB are dumped once to a memory-mapped file that every worker
+    opens read-only, so workers do not receive their own copies.
+
+    Args:
+        X (ndarray): Feature matrix in FEATURE_COLUMNS order, sorted by time.
+        y (ndarray): Target prices.
+        param_grid (dict): RandomForestRegressor parameter grid.
+        feature_sets (dict): Name -> list of feature columns.
+        n_splits (int): Number of TimeSeriesSplit folds.
+        n_jobs (int): Worker processes (-1 = all cores).
+
+    Returns:
+        list: Leaderboard entries sorted by mean RMSE (best first).
+    """
+    param_grid = param_grid or PARAM_GRID
+    feature_sets = feature_sets or FEATURE_SETS
+    folds = [
+        (train[-1] + 1, test[0], test[-1] + 1)
+        for train, test in TimeSeriesSplit(n_splits=n_splits).split(X)
+    ]
+    # One contiguous matrix per feature set, selected once instead of per fold
+    matrices = {
+        name: np.ascontiguousarray(X[:, [FEATURE_COLUMNS.index(c) for c in columns]])
+        for name, columns in feature_sets.items()
+    }
+    candidates = [(name, params) for name in feature_sets for params in ParameterGrid(param_grid)]
+    logging.info(f"🔍 Evaluating {len(candidates)} candidates x {len(folds)} folds with n_jobs={n_jobs}...")
+
+    start = time.perf_counter()
+    scores = Parallel(n_jobs=n_jobs, max_nbytes="1M", mmap_mode="r")(
+        delayed(_fit_fold)(matrices[name], y, params, *fold)
+        for name, params in candidates
+        for fold in folds
+    )
+    logging.info(f"✅ Search finished in {time.perf_counter() - start:.1f}s.")
+
+    leaderboard = []
+    for i, (name, params) in enumerate(candidates):
+        maes, mses, rmses = zip(*scores[i * len(folds):(i + 1) * len(folds)])
+        leaderboard.append({
+            "feature_set": name,
+            "features": list(feature_sets[name]),
+            "params": params,
+            "mean_rmse": float(np.mean(rmses)),
+            "std_rmse": float(np.std(rmses)),
+            "mean_mae": float(np.mean(maes)),
+            "mean_mse": float(np.mean(mses)),
+            "fold_rmse": [float(r) for r in rmses],
+        })
+    leaderboard.sort(key=lambda entry: entry["mean_rmse"])
+    for rank, entry in enumerate(leaderboard, start=1):
+        entry["rank"] = rank
+    return leaderboard
+
+
+def fit_best(X, y, entry):
+    """
+    Refits the best candidate on the full history using every core.
+
+    The model is fitted on a named DataFrame so serving can select its
+    feature subset via `feature_names_in_`.
+    """
+    frame = pd.DataFrame(X, columns=FEATURE_COLUMNS)[entry["features"]]
+    model = RandomForestRegressor(random_state=42, n_jobs=N_JOBS, **entry["params"])
+    model.fit(frame, y)
+    return model
+
+
+def save_leaderboard(leaderboard, path=None):
+    with open(path or LEADERBOARD_PATH, "w") as file:
+        json.dump(leaderboard, file, indent=2)
+    logging.info(f"✅ Leaderboard saved to {path or LEADERBOARD_PATH}")
+
+
+def load_grid(path):
+    """
+    Loads {"params": {...}, "feature_sets": {...}} from a JSON file.
+    """
+    with open(path) as file:
+        config = json.load(file)
+    return config.get("params"), config.get("feature_sets")
+
+
+def load_arrays(use_feature_store=False, rebuild=False):
+    """
+    Returns (X, y) as NumPy arrays in FEATURE_COLUMNS order; `rebuild`
+    rebuilds the feature store first.
+    """
+    if use_feature_store:
+        store = train_model.load_feature_store(rebuild=rebuild)
+        if store is None or not len(store):
+            return None, None
+        df = pd.DataFrame(store.load(BASE_COLUMNS))
+    else:
+        df = train_model.load_data()
+        if df is None:
+            return None, None
+
+    X, y = build_training_set(df)
+    if X.empty:
+        return None, None
+    return X.to_numpy(dtype=np.float64), y.to_numpy(dtype=np.float64)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward hyperparameter search for the ETH forecast model.")
+    parser.add_argument("--grid", help="JSON file with 'params' and/or 'feature_sets'")
+    parser.add_argument("--splits", type=int, default=N_SPLITS)
+    parser.add_argument("--n-jobs", type=int, default=N_JOBS)
+    parser.add_argument("--feature-store", action="store_true", help="Load data from the feature store")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the feature store before loading")
+    parser.add_argument("--no-save", action="store_true", help="Only write the leaderboard")
+    args = parser.parse_args()
+
+    logging.info("🚀 Starting hyperparameter search...")
+    param_grid, feature_sets = load_grid(args.grid) if args.grid else (None, None)
+    X, y = load_arrays(args.feature_store, args.rebuild)
+    if X is None:
+        logging.error("❌ No data available for tuning.")
+        raise SystemExit(1)
+
+    leaderboard = tune(X, y, param_grid, feature_sets, n_splits=args.splits, n_jobs=args.n_jobs)
+    save_leaderboard(leaderboard)
+    best = leaderboard[0]
+    logging.info(f"🏆 Best: {best['feature_set']} {best['params']} (RMSE {best['mean_rmse']:.4f})")
+
+    if not args.no_save:
+        model = fit_best(X, y, best)
+        metrics = {"mae": best["mean_mae"], "rmse": best["mean_rmse"], "mse": best["mean_mse"]}
+        metadata = train_model.build_metadata(model, X, metrics, mode="tuned", features=best["features"])
+        metadata["params"] = best["params"]
+        train_model.save_model(model, metadata)
+    dump_metrics()
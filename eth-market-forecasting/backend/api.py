@@ -1,16 +1,44 @@
 
-from flask import Flask, jsonify
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
+import io
 import os
+import time
 import logging
 import numpy as np
-from backend.ai_model.model_utils import load_model, fetch_latest_data
+from backend import metrics
+from backend.ai_model.model_utils import (
+    fetch_latest_data, fetch_data_version, fetch_features_at, forecast_horizon,
+    FEATURE_COLUMNS,
+)
+from backend.ai_model.prediction_cache import PredictionCache
+from backend.ai_model.batcher import InferenceBatcher, Overloaded
+from backend.ai_model.registry import get_registry
+from backend.ai_model.feed import get_feed
+from backend.data_pipeline.connection import release_connections
+from backend.data_pipeline.rollup import RANGE_POINTS, fetch_range, fetch_top_projects
+from backend.lazy import lazy_import
+from backend.profiling import profiled_request
+
+# Arrow responses are optional; pyarrow is only imported for the first one
+pa = lazy_import("pyarrow", optional=True)
 
 # Load environment variables
 load_dotenv()
 DEBUG = os.getenv("DEBUG", "False").lower() in ("true", "1", "yes")
 
+# Upper bounds for /api/predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 10000))
+MAX_HORIZON = int(os.getenv("MAX_HORIZON", 168))
+
+# Binary batch responses: a NumPy .npy structured array or an Arrow IPC stream
+NPY_DTYPE = np.dtype([("timestamp", "<i8"), ("predicted_price", "<f8")])
+MIMETYPES = {
+    "npy": "application/octet-stream",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -18,46 +46,305 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 app = Flask(__name__)
 CORS(app)
 
-# Load model once at startup
-model = load_model()
+# Model loaded lazily on first use and hot-swapped when a new artifact is saved
+registry = get_registry()
+
+# Features and predictions only change when new rows are ingested
+cache = PredictionCache()
+
+# Concurrent requests share model.predict calls on a bounded inference pool
+batcher = InferenceBatcher(lambda: registry.get())
+
+# Seconds clients are asked to wait when the inference queue is full
+RETRY_AFTER = os.getenv("API_RETRY_AFTER", "1")
+
+# Fields returned by /api/market-data: its original response, a subset of FEATURE_COLUMNS
+MARKET_DATA_COLUMNS = ["timestamp", "volume_usd", "gas_price"]
+
+# Prometheus text exposition format served by /metrics
+METRICS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+API_SECONDS = metrics.histogram("api_request_seconds", "Request handling time by endpoint")
+API_ERRORS = metrics.counter("api_errors_total", "Responses with status >= 400 by endpoint and status")
+
+
+def component_stats():
+    """
+    Cache and batcher counters for /metrics, read from whichever instances
+    the module currently holds.
+    """
+    cache_stats, batcher_stats = cache.stats(), batcher.stats()
+    return [
+        ("prediction_cache_lookups_total", "counter", "Prediction cache lookups by result",
+         [({"result": name}, cache_stats[name]) for name in ("hits", "misses", "coalesced")]),
+        ("prediction_cache_entries", "gauge", "Entries held in the prediction cache",
+         [({}, cache_stats["entries"])]),
+        ("inference_batches_total", "counter", "Batched model.predict calls", [({}, batcher_stats["batches"])]),
+        ("inference_rows_total", "counter", "Rows predicted by the inference batcher", [({}, batcher_stats["rows"])]),
+        ("inference_rejected_total", "counter", "Requests rejected by the inference batcher",
+         [({}, batcher_stats["rejected"])]),
+        ("inference_queue_depth", "gauge", "Requests waiting for an inference worker", [({}, batcher_stats["queued"])]),
+    ]
+
+
+metrics.REGISTRY.register_collector(component_stats)
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    start = g.pop("request_start", None)
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    if start is not None:
+        API_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+    if response.status_code >= 400:
+        API_ERRORS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+@app.teardown_appcontext
+def release_request_connections(exc):
+    # Request threads come and go; hand their SQLite connections back to the pool
+    release_connections()
+
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    logging.warning(f"⚠ Rejecting request: {e}")
+    return jsonify({"error": "Server busy, retry later"}), 503, {"Retry-After": RETRY_AFTER}
+
+
+def latest_features(version):
+    return cache.get_or_compute(("features", version), fetch_latest_data)
 
 
 @app.route('/api/predict', methods=['GET'])
+@profiled_request("api_predict")
 def predict_eth_price():
     """
     API endpoint to predict ETH price using the trained model and the latest market data.
+
+    Results are cached per model and data version, so repeated requests
+    between ingest cycles skip both the feature query and the forest inference.
     """
+    model, model_version = registry.current()
     if model is None:
         return jsonify({"error": "Model not loaded"}), 500
 
-    latest_features = fetch_latest_data()
-    if latest_features is None:
+    version = fetch_data_version()
+    features = latest_features(version)
+    if features is None:
         return jsonify({"error": "No valid input data available"}), 500
 
     try:
-        predicted_price = model.predict(latest_features)[0]
+        predicted_price = cache.get_or_compute(
+            ("predict", model_version, version),
+            lambda: float(batcher.predict(features)[0]),
+        )
+    except Overloaded:
+        raise
     except Exception as e:
         logging.error(f"❌ Prediction error: {e}")
         return jsonify({"error": "Prediction failed"}), 500
 
-    return jsonify({"predicted_price": float(predicted_price)})
+    return jsonify({"predicted_price": predicted_price})
+
+
+def _batch_params():
+    """
+    Reads `timestamps` (list or comma-separated) or `horizon` from the JSON body or query string.
+    """
+    body = request.get_json(silent=True) or {}
+    timestamps = body.get("timestamps", request.args.get("timestamps"))
+    horizon = body.get("horizon", request.args.get("horizon"))
+    if (timestamps is None) == (horizon is None):
+        raise ValueError("Provide either 'timestamps' or 'horizon'")
+    if horizon is not None:
+        horizon = int(horizon)
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f"'horizon' must be between 1 and {MAX_HORIZON}")
+        return None, horizon
+    if isinstance(timestamps, str):
+        timestamps = [t for t in timestamps.split(",") if t.strip()]
+    timestamps = [int(t) for t in timestamps]
+    if not 1 <= len(timestamps) <= MAX_BATCH_SIZE:
+        raise ValueError(f"'timestamps' must contain between 1 and {MAX_BATCH_SIZE} values")
+    return timestamps, None
+
+
+def _encode_batch(timestamps, predictions, fmt):
+    """
+    Serializes (timestamp, predicted_price) pairs; missing predictions are NaN/null.
+    """
+    if fmt == "json":
+        return jsonify({
+            "timestamps": [int(t) for t in timestamps],
+            "predicted_prices": [None if np.isnan(p) else float(p) for p in predictions],
+        })
+
+    if fmt == "npy":
+        table = np.empty(len(timestamps), dtype=NPY_DTYPE)
+        table["timestamp"] = timestamps
+        table["predicted_price"] = predictions
+        buffer = io.BytesIO()
+        np.save(buffer, table, allow_pickle=False)
+        payload = buffer.getvalue()
+    else:
+        batch = pa.record_batch(
+            [pa.array(np.asarray(timestamps, dtype=np.int64)), pa.array(predictions, from_pandas=True)],
+            names=list(NPY_DTYPE.names),
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        payload = sink.getvalue().to_pybytes()
+    return Response(payload, mimetype=MIMETYPES[fmt])
+
+
+@app.route('/api/predict/batch', methods=['GET', 'POST'])
+def predict_batch():
+    """
+    API endpoint to predict many points in one request.
+
+    - `timestamps`: predicts from the latest tick at or before each timestamp;
+      all rows go through a single vectorized model.predict call.
+    - `horizon`: forecasts the next N ticks, feeding each prediction back as
+      the next tick's price (so steps are evaluated one after another).
+
+    `format` selects json (default), npy or arrow (requires pyarrow).
+    """
+    model, model_version = registry.current()
+    if model is None:
+        return jsonify({"error": "Model not loaded"}), 500
+
+    fmt = request.args.get("format", "json")
+    if fmt not in ("json", *MIMETYPES):
+        return jsonify({"error": f"Unknown format: {fmt}"}), 400
+    if fmt == "arrow" and pa is None:
+        return jsonify({"error": "Arrow responses require pyarrow"}), 406
+
+    try:
+        timestamps, horizon = _batch_params()
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        if horizon is not None:
+            forecast = cache.get_or_compute(
+                ("horizon", model_version, fetch_data_version(), horizon),
+                lambda: forecast_horizon(model, horizon),
+            )
+            if forecast is None:
+                return jsonify({"error": "No valid input data available"}), 500
+            timestamps, predictions = forecast
+        else:
+            _, features, valid = fetch_features_at(timestamps)
+            predictions = np.full(len(timestamps), np.nan)
+            if valid.any():
+                predictions[valid] = batcher.predict(features[valid])
+    except Overloaded:
+        raise
+    except Exception as e:
+        logging.error(f"❌ Batch prediction error: {e}")
+        return jsonify({"error": "Prediction failed"}), 500
+
+    return _encode_batch(timestamps, predictions, fmt)
+
+
+@app.route('/api/predictions', methods=['GET'])
+def prediction_stream():
+    """
+    API endpoint returning actual vs. predicted points newer than the client's cursor.
+
+    Points are computed once by the process-wide feed; pass back the returned
+    `cursor` as `since` and `generation` to receive only new points.
+    """
+    try:
+        since = int(request.args.get("since", 0))
+        generation = request.args.get("generation", type=int)
+    except ValueError:
+        return jsonify({"error": "'since' must be an integer"}), 400
+    return jsonify(get_feed().delta(since, generation))
+
+
+@app.route('/api/history/<series>', methods=['GET'])
+def get_history(series):
+    """
+    API endpoint returning a downsampled time range of one series
+    (eth_price, gas_price, tvl or market_share).
+
+    Served from the 1m/1h/1d rollup tables, so a year of minute data comes
+    back as about `points` buckets. market_share is the total volume per
+    hourly/daily reporting period, taken from the newest snapshot. Query parameters: `start`, `end` (epoch
+    seconds), `points` and `method` (ohlc or lttb).
+    """
+    try:
+        start = request.args.get("start", type=int)
+        end = request.args.get("end", type=int)
+        points = int(request.args.get("points", RANGE_POINTS))
+        method = request.args.get("method", "ohlc")
+        result = cache.get_or_compute(
+            ("history", series, start, end, points, method, fetch_data_version()),
+            lambda: fetch_range(series, start, end, points, method),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+
+@app.route('/api/market-share', methods=['GET'])
+def get_market_share():
+    """
+    API endpoint returning the top projects by volume and their market share.
+
+    Query parameters: `market`, `chain`, `resolution` (1h or 1d), `start`,
+    `end` (epoch seconds) and `top`.
+    """
+    try:
+        market = request.args.get("market", "dex")
+        chain = request.args.get("chain", "ethereum")
+        resolution = request.args.get("resolution", "1d")
+        start = request.args.get("start", type=int)
+        end = request.args.get("end", type=int)
+        top = int(request.args.get("top", 10))
+        result = cache.get_or_compute(
+            ("market-share", market, chain, resolution, start, end, top, fetch_data_version()),
+            lambda: fetch_top_projects(market, chain, resolution, start, end, top),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
 
 
 @app.route('/api/market-data', methods=['GET'])
+@profiled_request("api_market_data")
 def get_latest_market_data():
     """
     API endpoint to fetch the latest ETH price, market share, and gas price.
     """
-    latest_features = fetch_latest_data()
-    if latest_features is None:
+    features = latest_features(fetch_data_version())
+    if features is None:
         return jsonify({"error": "Missing market data"}), 500
 
     # Convert features array to a dict for response
-    # Assuming columns: timestamp, volume_usd, gas_price
-    feature_names = ["timestamp", "volume_usd", "gas_price"]
-    data_dict = dict(zip(feature_names, latest_features[0]))
+    row = dict(zip(FEATURE_COLUMNS, features[0].tolist()))
+    data_dict = {name: row[name] for name in MARKET_DATA_COLUMNS}
     return jsonify(data_dict)
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus scrape endpoint: fetch, SQL, feature, model load and predict
+    timings plus cache, batcher and error counters for this process, or for
+    every worker of the server when METRICS_MULTIPROC_DIR is set.
+    """
+    return Response(metrics.REGISTRY.render(), content_type=METRICS_MIMETYPE)
+
 if __name__ == '__main__':
+    # Development server; in production run: gunicorn -c backend/gunicorn.conf.py backend.api:app
     logging.info("🚀 Starting AI-Powered Ethereum Price Prediction API...")
     app.run(host="0.0.0.0", port=5000, debug=DEBUG)
@@ -0,0 +1,151 @@
+import os
+
+from backend import metrics
+from backend.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+SQL_SECONDS = metrics.histogram("sql_query_seconds", "SQLite query time by query")
+
+# The market/chain pair whose total volume is the model's volume_usd feature.
+# Other INGEST_PAIRS are stored as well but not mixed into it; '' matches rows
+# stored before the pair was recorded, when only dex/ethereum was fetched.
+FEATURE_MARKET = os.getenv("FEATURE_MARKET", "dex")
+FEATURE_CHAIN = os.getenv("FEATURE_CHAIN", "ethereum")
+PAIR_FILTER = "market IN (:market, '') AND blockchain IN (:chain, '')"
+
+# All joins run on the INTEGER epoch column `ts`, returned as "timestamp".
+# Market share rows for one snapshot share a timestamp; their totals are read
+# from market_share_snapshot (one row per market/chain/period instead of one per
+# project) so every price tick is matched with exactly one total DEX volume figure.
+# :since limits the price ticks to ts > :since; the other series also return the
+# last observation at or before :since so the first new tick still has a match.
+# :until is an inclusive upper bound for every series.
+PRICE_QUERY = """
+    SELECT ts AS timestamp, price FROM eth_price
+    WHERE ts > :since AND ts <= :until
+    ORDER BY ts, id
+"""
+VOLUME_QUERY = f"""
+    SELECT ts AS timestamp, SUM(volume_usd) AS volume_usd
+    FROM market_share_snapshot
+    WHERE {PAIR_FILTER}
+      AND ts >= IFNULL((SELECT MAX(ts) FROM market_share_snapshot WHERE {PAIR_FILTER} AND ts <= :since), :since)
+      AND ts <= :until
+    GROUP BY ts
+    ORDER BY ts
+"""
+GAS_QUERY = """
+    SELECT ts AS timestamp, average AS gas_price FROM gas_price
+    WHERE ts >= IFNULL((SELECT MAX(ts) FROM gas_price WHERE ts <= :since), :since) AND ts <= :until
+    ORDER BY ts, id
+"""
+TVL_QUERY = """
+    SELECT ts AS timestamp, tvl FROM tvl
+    WHERE ts >= IFNULL((SELECT MAX(ts) FROM tvl WHERE ts <= :since), :since) AND ts <= :until
+    ORDER BY ts, id
+"""
+
+# Price tick `:lookback` positions before the newest tick at or before :since;
+# loading from there returns the last `lookback` ticks up to :since plus all later ones
+LOOKBACK_QUERY = """
+    SELECT ts FROM eth_price
+    WHERE ts <= :since
+    ORDER BY ts DESC
+    LIMIT 1 OFFSET :lookback
+"""
+
+# Bounds used when loading the whole history
+EPOCH_MIN = -(2 ** 62)
+EPOCH_MAX = 2 ** 62
+
+# Latest feature row resolved with index seeks instead of a scan per joined table
+LATEST_ROW_QUERY = f"""
+    SELECT e.ts AS timestamp,
+           COALESCE((
+               SELECT SUM(volume_usd) FROM market_share_snapshot
+               WHERE {PAIR_FILTER} AND ts = (
+                   SELECT MAX(ts) FROM market_share_snapshot WHERE {PAIR_FILTER} AND ts <= e.ts
+               )
+           ), 0) AS volume_usd,
+           COALESCE((
+               SELECT average FROM gas_price
+               WHERE ts <= e.ts
+               ORDER BY ts DESC, id DESC LIMIT 1
+           ), 0) AS gas_price
+    FROM (SELECT ts FROM eth_price WHERE ts IS NOT NULL ORDER BY ts DESC, id DESC LIMIT 1) e;
+"""
+
+
+def asof_merge(prices, *series):
+    """
+    Attaches the most recent value of each series at or before every price tick.
+
+    All frames must carry an integer epoch "timestamp" column and be sorted by
+    it. Series values that have no earlier observation are filled with 0,
+    matching the COALESCE defaults of the original SQL join.
+
+    Args:
+        prices (DataFrame): Price ticks, one row per output row.
+        *series (DataFrame): Frames with a timestamp column plus value columns.
+
+    Returns:
+        DataFrame: One row per price tick, in timestamp order.
+    """
+    merged = prices.astype({"timestamp": "int64"})
+    for frame in series:
+        right = frame.astype({"timestamp": "int64"})
+        merged = pd.merge_asof(merged, right, on="timestamp", direction="backward")
+        value_columns = [c for c in right.columns if c != "timestamp"]
+        merged[value_columns] = merged[value_columns].fillna(0)
+    return merged
+
+
+def load_asof_frame(conn, since=None, lookback=0, until=None):
+    """
+    Loads the training history as a single sorted as-of merge.
+
+    Each table is read once in `ts` index order, so the cost is O(N + M) rather
+    than one correlated subquery per price row.
+
+    Args:
+        conn: Open SQLite connection.
+        since (int, optional): Only return price ticks with ts greater than this epoch.
+        lookback (int): Also return this many ticks at or before `since`, e.g. the
+            window history needed to compute features for the first new tick.
+            Without `since`, only the last `lookback` ticks are returned.
+        until (int, optional): Only return price ticks with ts at or before this epoch.
+
+    Returns:
+        DataFrame: Columns timestamp (epoch seconds), price, volume_usd, gas_price, tvl.
+    """
+    with SQL_SECONDS.time(query="asof_frame"):
+        if lookback:
+            bound = EPOCH_MAX if since is None else int(since)
+            row = conn.execute(LOOKBACK_QUERY, {"since": bound, "lookback": int(lookback)}).fetchone()
+            since = row[0] if row else None
+        params = {
+            "since": EPOCH_MIN if since is None else int(since),
+            "until": EPOCH_MAX if until is None else int(until),
+            "market": FEATURE_MARKET,
+            "chain": FEATURE_CHAIN,
+        }
+        prices = pd.read_sql(PRICE_QUERY, conn, params=params)
+        volume = pd.read_sql(VOLUME_QUERY, conn, params=params)
+        gas = pd.read_sql(GAS_QUERY, conn, params=params)
+        tvl = pd.read_sql(TVL_QUERY, conn, params=params)
+    return asof_merge(prices, volume, gas, tvl)
+
+
+def load_latest_row(conn):
+    """
+    Loads the feature row for the most recent price tick.
+
+    Args:
+        conn: Open SQLite connection.
+
+    Returns:
+        DataFrame: At most one row with columns timestamp (epoch seconds), volume_usd, gas_price.
+    """
+    with SQL_SECONDS.time(query="latest_row"):
+        return pd.read_sql(LATEST_ROW_QUERY, conn, params={"market": FEATURE_MARKET, "chain": FEATURE_CHAIN})
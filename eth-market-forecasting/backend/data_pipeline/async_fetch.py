@@ -0,0 +1,360 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import contextlib
+from urllib.parse import urlsplit
+import aiohttp
+from dotenv import load_dotenv
+
+from backend.data_pipeline.fetch_data import (
+    DUNE_API_KEY,
+    FETCH_REQUESTS,
+    FETCH_SECONDS,
+    market_share_url,
+    gas_price_url,
+    tvl_url,
+    parse_gas_price,
+    parse_tvl,
+)
+from backend.data_pipeline.fetch_state import UNCHANGED, market_share_source
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Per-source request timeouts in seconds
+SOURCE_TIMEOUTS = {
+    "market_share": float(os.getenv("DUNE_TIMEOUT", 20)),
+    "gas_price": float(os.getenv("ETHERSCAN_TIMEOUT", 5)),
+    "tvl": float(os.getenv("DEFILLAMA_TIMEOUT", 10)),
+}
+
+# Retry policy: exponential backoff with full jitter
+MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", 3))
+BACKOFF_BASE = float(os.getenv("FETCH_BACKOFF_BASE", 0.5))
+BACKOFF_CAP = float(os.getenv("FETCH_BACKOFF_CAP", 8.0))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Connection pool size shared by every source
+POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", 20))
+
+# (market, chain) pairs ingested every cycle, e.g. "dex:ethereum,dex:arbitrum,nft:ethereum"
+INGEST_PAIRS = os.getenv("INGEST_PAIRS", "dex:ethereum")
+# Requests in flight at once across every source
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", 8))
+# Requests per second allowed per host, e.g. "api.dune.com=2,api.etherscan.io=5"
+FETCH_HOST_RATES = os.getenv("FETCH_HOST_RATES", "api.dune.com=2")
+
+
+class RetryableStatus(Exception):
+    """Raised for HTTP statuses that are worth retrying (rate limits, 5xx)."""
+
+
+def parse_pairs(spec=INGEST_PAIRS):
+    """
+    Parses a comma-separated list of market:chain pairs.
+
+    :param spec: e.g. "dex:ethereum,dex:arbitrum".
+    :return: List of (market, chain) tuples in the given order, without duplicates.
+    """
+    pairs = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        market, _, chain = item.strip().partition(":")
+        if not market or not chain:
+            raise ValueError(f"Invalid market:chain pair: {item!r}")
+        if (market, chain) not in pairs:
+            pairs.append((market, chain))
+    return pairs
+
+
+def parse_rates(spec=FETCH_HOST_RATES):
+    """
+    Parses a comma-separated list of host=requests_per_second limits.
+
+    :return: Dictionary mapping host names to rates.
+    """
+    rates = {}
+    for item in spec.split(","):
+        if item.strip():
+            host, _, rate = item.strip().partition("=")
+            rates[host] = float(rate)
+    return rates
+
+
+class HostRateLimiter:
+    """
+    Spaces the start of requests to one host at least 1 / rate seconds apart.
+
+    Each caller reserves the next free slot before sleeping, so concurrent
+    requests queue up in order without a lock (the event loop is single threaded).
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    async def wait(self):
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class FetchLimits:
+    """
+    Global cap on requests in flight plus per-host rate limits, shared by every
+    request of a fetch cycle (or of the ingest daemon's lifetime).
+
+    Create it inside the event loop that uses it.
+    """
+
+    def __init__(self, concurrency=FETCH_CONCURRENCY, host_rates=None):
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        rates = parse_rates() if host_rates is None else host_rates
+        self.hosts = {host: HostRateLimiter(rate) for host, rate in rates.items()}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        """
+        Waits for a free concurrency slot, then for the host's next rate-limit slot.
+
+        Rate-limit slots are only reserved by requests that can start, so
+        requests queued on the semaphore cannot use up their slots while
+        waiting and then reach the host in a burst.
+        """
+        limiter = self.hosts.get(urlsplit(url).hostname)
+        if self.semaphore is None:
+            if limiter is not None:
+                await limiter.wait()
+            yield
+            return
+        async with self.semaphore:
+            if limiter is not None:
+                await limiter.wait()
+            yield
+
+
+# Used when a caller passes no limits
+NO_LIMITS = FetchLimits(concurrency=0, host_rates={})
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """
+    Returns a jittered backoff delay for the given (zero-based) retry attempt.
+
+    :param attempt: Number of attempts already made.
+    :return: Delay in seconds drawn uniformly from [0, min(cap, base * 2**attempt)].
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def create_session(pool_size=POOL_SIZE):
+    """
+    Creates a pooled aiohttp session that can be shared across fetch cycles.
+
+    :param pool_size: Maximum number of open connections.
+    :return: aiohttp.ClientSession
+    """
+    connector = aiohttp.TCPConnector(limit=pool_size, ttl_dns_cache=300)
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def get_json(session, url, source, headers=None, timeout=None, retries=MAX_RETRIES, limits=None,
+                   tracker=None, key=None):
+    """
+    GETs a JSON document, retrying transient failures with jittered backoff.
+
+    Every attempt takes a slot from `limits`; backoff sleeps do not hold one.
+    With a ChangeTracker the request is conditional (ETag/Last-Modified), and
+    a 304 or a payload identical to the last one returns UNCHANGED. The state
+    of a changed payload is left pending in the tracker for the caller to
+    store along with its rows.
+
+    :param session: Shared aiohttp session.
+    :param url: Request URL.
+    :param source: Source name, used for the default timeout and log messages.
+    :param headers: Optional request headers.
+    :param timeout: Total timeout per attempt in seconds.
+    :param retries: Number of retries after the first attempt.
+    :param limits: Optional FetchLimits shared with concurrent requests.
+    :param tracker: Optional ChangeTracker.
+    :param key: Source key for the tracker; defaults to `source`.
+    :return: Decoded JSON response, UNCHANGED, or None if every attempt failed.
+    """
+    client_timeout = aiohttp.ClientTimeout(total=timeout or SOURCE_TIMEOUTS.get(source, 10))
+    limits = limits or NO_LIMITS
+    key = key or source
+    if tracker is not None:
+        headers = {**(headers or {}), **tracker.headers(key)}
+    for attempt in range(retries + 1):
+        status = "error"
+        try:
+            async with limits.slot(url):
+                # Timed inside the slot so limiter waits do not count as latency
+                with FETCH_SECONDS.time(source=source):
+                    async with session.get(url, headers=headers, timeout=client_timeout) as response:
+                        status = response.status
+                        if response.status in RETRY_STATUSES:
+                            raise RetryableStatus(f"HTTP {response.status}")
+                        if response.status == 304 and tracker is not None:
+                            tracker.not_modified(key)
+                            return UNCHANGED
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+                if tracker is not None and not tracker.observe(
+                    key, data, response.headers.get("ETag"), response.headers.get("Last-Modified")
+                ):
+                    return UNCHANGED
+                return data
+        except (RetryableStatus, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if isinstance(e, aiohttp.ClientResponseError) or attempt == retries:
+                logging.error(f"❌ {source} request failed after {attempt + 1} attempt(s): {e!r}")
+                return None
+            delay = backoff_delay(attempt)
+            logging.warning(f"⚠ {source} request failed ({e!r}), retrying in {delay:.2f}s...")
+            await asyncio.sleep(delay)
+        except ValueError as e:
+            # An HTML error page or empty body served with status 200
+            logging.error(f"❌ {source} returned a body that is not valid JSON: {e!r}")
+            return None
+        finally:
+            FETCH_REQUESTS.inc(source=source, status=status)
+    return None
+
+
+async def fetch_market_share_async(session, market="dex", chain="ethereum", base_url=None, **kwargs):
+    """
+    Async counterpart of fetch_data.fetch_market_share.
+    """
+    url = market_share_url(market, chain, base_url)
+    data = await get_json(
+        session, url, "market_share", headers={"X-Dune-Api-Key": DUNE_API_KEY or ""},
+        key=market_share_source(market, chain), **kwargs
+    )
+    if data is UNCHANGED:
+        logging.info(f"♻ Market share data unchanged for {market}/{chain}.")
+    elif data is not None:
+        logging.info(f"✅ Market share data fetched successfully for {market}/{chain}.")
+    return data
+
+
+async def fetch_gas_price_async(session, base_url=None, **kwargs):
+    """
+    Async counterpart of fetch_data.fetch_gas_price.
+    """
+    data = await get_json(session, gas_price_url(base_url), "gas_price", **kwargs)
+    if data is UNCHANGED:
+        return UNCHANGED
+    gas_price = parse_gas_price(data) if data is not None else None
+    if gas_price is not None:
+        logging.info("✅ Gas price data fetched successfully.")
+    return gas_price
+
+
+async def fetch_tvl_async(session, base_url=None, **kwargs):
+    """
+    Async counterpart of fetch_data.fetch_tvl.
+    """
+    data = await get_json(session, tvl_url(base_url), "tvl", **kwargs)
+    if data is UNCHANGED:
+        return UNCHANGED
+    tvl = parse_tvl(data) if data is not None else None
+    if tvl is not None:
+        logging.info("✅ TVL data fetched successfully.")
+    return tvl
+
+
+async def fetch_market_share_pairs(session, pairs, base_url=None, limits=None, tracker=None):
+    """
+    Fans market share requests out over (market, chain) pairs, bounded by `limits`.
+
+    :param session: Shared aiohttp session.
+    :param pairs: Iterable of (market, chain) tuples.
+    :param base_url: Optional Dune base URL.
+    :param limits: Optional FetchLimits shared with other requests.
+    :param tracker: Optional ChangeTracker; unchanged pairs map to UNCHANGED.
+    :return: Tuple of ({(market, chain): data}, {(market, chain): seconds}).
+    """
+    async def timed(market, chain):
+        start = time.perf_counter()
+        data = await fetch_market_share_async(session, market, chain, base_url, limits=limits, tracker=tracker)
+        return data, time.perf_counter() - start
+
+    pairs = list(pairs)
+    results = await asyncio.gather(*(timed(market, chain) for market, chain in pairs))
+    payloads = {pair: data for pair, (data, _) in zip(pairs, results)}
+    latency = {pair: seconds for pair, (_, seconds) in zip(pairs, results)}
+    return payloads, latency
+
+
+def log_pair_latency(latency, payloads):
+    """
+    Logs one line per (market, chain) pair, slowest first.
+    """
+    for (market, chain), seconds in sorted(latency.items(), key=lambda item: -item[1]):
+        data = payloads.get((market, chain))
+        status = "unchanged" if data is UNCHANGED else "failed" if data is None else "ok"
+        logging.info(f"⏱ {market}/{chain}: {seconds:.2f}s ({status})")
+
+
+async def fetch_all_async(markets=("dex",), chains=("ethereum",), session=None, endpoints=None, pairs=None, limits=None,
+                          tracker=None):
+    """
+    Fetches market share for every (market, chain) pair plus gas price and TVL concurrently.
+
+    :param markets: Iterable of market names ("dex", "nft").
+    :param chains: Iterable of blockchain names.
+    :param session: Optional shared aiohttp session; a temporary one is created if omitted.
+    :param endpoints: Optional dict overriding the base URL per source
+                      ("market_share", "gas_price", "tvl").
+    :param pairs: Explicit (market, chain) pairs; overrides `markets` x `chains`.
+    :param limits: Optional FetchLimits; a default one (FETCH_CONCURRENCY, FETCH_HOST_RATES) is created if omitted.
+    :param tracker: Optional ChangeTracker; sources that did not change come back as UNCHANGED.
+    :return: Dictionary with "market_share" ({(market, chain): data}), "gas_price", "tvl",
+             "latency" ({(market, chain): seconds}) and "elapsed" (seconds for the whole cycle).
+    """
+    endpoints = endpoints or {}
+    limits = limits or FetchLimits()
+    owns_session = session is None
+    if owns_session:
+        session = create_session()
+
+    if pairs is None:
+        pairs = [(market, chain) for market in markets for chain in chains]
+    start = time.perf_counter()
+    try:
+        gas_price, tvl, (payloads, latency) = await asyncio.gather(
+            fetch_gas_price_async(session, endpoints.get("gas_price"), limits=limits, tracker=tracker),
+            fetch_tvl_async(session, endpoints.get("tvl"), limits=limits, tracker=tracker),
+            fetch_market_share_pairs(session, pairs, endpoints.get("market_share"), limits, tracker),
+        )
+    finally:
+        if owns_session:
+            await session.close()
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"⏱ Fetched {len(payloads) + 2} sources in {elapsed:.2f}s.")
+    log_pair_latency(latency, payloads)
+    if tracker is not None:
+        tracker.log_summary()
+    return {
+        "market_share": payloads,
+        "gas_price": gas_price,
+        "tvl": tvl,
+        "latency": latency,
+        "elapsed": elapsed,
+    }
+
+
+def fetch_all(markets=("dex",), chains=("ethereum",), endpoints=None, pairs=None, tracker=None):
+    """
+    Synchronous entry point for fetch_all_async, for scripts that are not already running an event loop.
+    """
+    return asyncio.run(fetch_all_async(markets, chains, endpoints=endpoints, pairs=pairs, tracker=tracker))
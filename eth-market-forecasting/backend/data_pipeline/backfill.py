@@ -0,0 +1,137 @@
+import csv
+import time
+import numbers
+import logging
+import argparse
+import sqlite3
+from datetime import datetime
+from itertools import islice
+
+from backend import metrics
+from backend.data_pipeline.schema import DB_PATH, INSERT_SQL, stamp
+from backend.data_pipeline.connection import ROWS_INSERTED, get_connection
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Value columns expected after the timestamp for each table, in INSERT_SQL order
+BACKFILL_COLUMNS = {
+    "eth_price": ("price",),
+    "gas_price": ("low", "average", "high"),
+    "tvl": ("tvl",),
+    "market_share": ("market", "blockchain", "project", "version", "volume_usd", "trades", "period"),
+}
+
+# Rows per executemany/transaction
+CHUNK_SIZE = 50_000
+
+
+def normalize_timestamp(value):
+    """
+    Converts an epoch number, ISO string or datetime into the stored (ISO text, epoch) pair.
+
+    :param value: Epoch seconds, ISO-8601 string, datetime or pandas Timestamp.
+    :return: Tuple (timestamp, ts).
+    """
+    if isinstance(value, numbers.Real):
+        return stamp(datetime.fromtimestamp(value))
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        return stamp(value)
+    raise ValueError(f"Unsupported timestamp: {value!r}")
+
+
+def iter_rows(table, records):
+    """
+    Yields rows in INSERT_SQL column order from records or a DataFrame.
+
+    :param table: Target table name.
+    :param records: Iterable of (timestamp, *values) tuples, or a DataFrame with
+                    a "timestamp" column plus the table's value columns.
+    """
+    columns = BACKFILL_COLUMNS[table]
+    if hasattr(records, "itertuples"):
+        frame = records.reset_index() if "timestamp" not in records.columns else records
+        frame = frame.reindex(columns=("timestamp",) + columns)
+        frame = frame.astype(object).where(frame.notna(), None)
+        records = frame.itertuples(index=False, name=None)
+
+    for record in records:
+        if len(record) != len(columns) + 1:
+            raise ValueError(f"Expected {len(columns) + 1} fields for {table}, got {len(record)}")
+        yield normalize_timestamp(record[0]) + tuple(record[1:])
+
+
+def backfill(table, records, chunk_size=CHUNK_SIZE, conn=None):
+    """
+    Streams historical records into a table in large executemany transactions.
+
+    Rows whose natural key already exists are skipped by INSERT OR IGNORE, so
+    a backfill can be re-run or overlap live ingest safely.
+
+    :param table: One of eth_price, gas_price, tvl or market_share.
+    :param records: Iterable of (timestamp, *values) tuples or a DataFrame.
+    :param chunk_size: Rows per transaction.
+    :param conn: Optional open connection; defaults to this thread's shared connection.
+    :return: Dictionary with rows_in, rows_inserted, duplicates, seconds and rows_per_sec.
+    """
+    if table not in BACKFILL_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    conn = conn or get_connection(DB_PATH)
+
+    rows = iter_rows(table, records)
+    rows_in = 0
+    rows_inserted = 0
+    start = time.perf_counter()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        with conn:
+            # rowcount excludes the rollup trigger writes that total_changes would include
+            rows_inserted += conn.executemany(INSERT_SQL[table], chunk).rowcount
+        rows_in += len(chunk)
+        logging.info(f"⏳ {table}: {rows_in} rows processed...")
+
+    seconds = time.perf_counter() - start
+    ROWS_INSERTED.inc(rows_inserted, table=table)
+    report = {
+        "table": table,
+        "rows_in": rows_in,
+        "rows_inserted": rows_inserted,
+        "duplicates": rows_in - rows_inserted,
+        "seconds": seconds,
+        "rows_per_sec": rows_in / seconds if seconds else float(rows_in),
+    }
+    logging.info(
+        f"✅ Backfilled {table}: {rows_inserted}/{rows_in} rows inserted "
+        f"({report['duplicates']} duplicates) at {report['rows_per_sec']:.0f} rows/s."
+    )
+    return report
+
+
+def read_csv(table, path):
+    """
+    Yields (timestamp, *values) tuples from a CSV file with a header row.
+    """
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            yield (row["timestamp"],) + tuple(row.get(column) or None for column in BACKFILL_COLUMNS[table])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill historical market data from a CSV file.")
+    parser.add_argument("table", choices=sorted(BACKFILL_COLUMNS))
+    parser.add_argument("csv_path", help="CSV with a 'timestamp' column plus the table's value columns")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    logging.info(f"🚀 Backfilling {args.table} from {args.csv_path}...")
+    try:
+        backfill(args.table, read_csv(args.table, args.csv_path), chunk_size=args.chunk_size)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        logging.error(f"❌ Backfill failed: {e}")
+    metrics.dump()
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from backend import metrics
+from backend.data_pipeline.schema import DB_PATH, INSERT_SQL, TIMESERIES_TABLES, connect
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Buffered writer defaults: flush after this many pending rows or this many seconds
+WRITE_BUFFER_ROWS = int(os.getenv("WRITE_BUFFER_ROWS", 500))
+WRITE_BUFFER_SECONDS = float(os.getenv("WRITE_BUFFER_SECONDS", 1.0))
+# Pending rows at which add_many() refuses more, e.g. while the database stays locked
+WRITE_BUFFER_LIMIT = int(os.getenv("WRITE_BUFFER_LIMIT", 50000))
+# Failed flushes of a batch (database locked or busy) before it is dead-lettered
+WRITE_BUFFER_RETRIES = int(os.getenv("WRITE_BUFFER_RETRIES", 5))
+# Batches that cannot be written are appended here as JSON lines (empty: dropped)
+WRITE_DEAD_LETTER = os.getenv("WRITE_DEAD_LETTER", "backend/data_pipeline/dead_letter.jsonl")
+# Released connections kept open per database for reuse by other threads
+DB_POOL_IDLE = int(os.getenv("DB_POOL_IDLE", 4))
+
+ROWS_INSERTED = metrics.counter("rows_inserted_total", "Rows inserted by table (duplicates excluded)")
+FLUSH_ERRORS = metrics.counter("buffered_flush_errors_total", "Buffered writer flushes that failed")
+ROWS_DEAD_LETTERED = metrics.counter("buffered_rows_dead_lettered_total", "Buffered rows given up on by table")
+
+# Parameters per row of each INSERT_SQL statement
+ROW_ARITY = {table: sql.count("?") for table, sql in INSERT_SQL.items()}
+
+
+class BufferFull(Exception):
+    """
+    Raised by BufferedWriter.add_many when WRITE_BUFFER_LIMIT rows are pending.
+    """
+
+
+class ConnectionManager:
+    """
+    Hands out one connection per thread for a database file.
+
+    sqlite3 connections must not be shared across threads without external
+    locking, so each thread holds its own connection from its first get()
+    until it calls release(). Released connections go back to a small idle
+    pool for the next thread, so short-lived request threads reuse a handful
+    of connections instead of opening one each; long-lived workers simply
+    never release. Connections of threads that exited without releasing are
+    reclaimed the next time a thread needs one.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_idle=DB_POOL_IDLE):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owners = {}
+        self._idle = []
+
+    def get(self):
+        """
+        Returns the calling thread's connection, taking one from the idle pool
+        or opening a new one on first use.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                self._reclaim()
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                # Connections are pooled and closed from other threads
+                conn = connect(self.db_path, check_same_thread=False)
+            with self._lock:
+                self._owners[threading.current_thread()] = conn
+            self._local.conn = conn
+        return conn
+
+    def release(self):
+        """
+        Returns the calling thread's connection to the idle pool, closing it
+        if the pool already holds max_idle connections.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._owners.pop(threading.current_thread(), None)
+            self._put_idle(conn)
+
+    def _reclaim(self):
+        for thread in [thread for thread in self._owners if not thread.is_alive()]:
+            self._put_idle(self._owners.pop(thread))
+
+    def _put_idle(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if len(self._idle) < self.max_idle:
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+    def open_connections(self):
+        """
+        Number of connections currently open (held by a thread or idle).
+        """
+        with self._lock:
+            return len(self._owners) + len(self._idle)
+
+    def close_all(self):
+        with self._lock:
+            connections = list(self._owners.values()) + self._idle
+            self._owners, self._idle = {}, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(db_path=DB_PATH):
+    """
+    Returns the process-wide ConnectionManager for a database path.
+    """
+    with _managers_lock:
+        manager = _managers.get(db_path)
+        if manager is None:
+            manager = _managers[db_path] = ConnectionManager(db_path)
+        return manager
+
+
+def get_connection(db_path=DB_PATH):
+    """
+    Shortcut for get_manager(db_path).get().
+    """
+    return get_manager(db_path).get()
+
+
+def release_connections():
+    """
+    Releases the calling thread's connection to every database, e.g. at the
+    end of a web request.
+    """
+    with _managers_lock:
+        managers = list(_managers.values())
+    for manager in managers:
+        manager.release()
+
+
+class BufferedWriter:
+    """
+    Groups pending inserts across tables and writes them in a single transaction.
+
+    Rows are flushed when `max_rows` are pending, when the oldest pending row
+    is `max_delay` seconds old (checked by a background thread), or on close().
+    A batch that fails because the database is locked or busy goes back to the
+    front of the queue and is retried with the next flush, up to `retries`
+    times; any other error, or running out of retries, dead-letters it so it
+    cannot block later flushes. At most `limit` rows are held.
+    """
+
+    def __init__(self, manager=None, max_rows=WRITE_BUFFER_ROWS, max_delay=WRITE_BUFFER_SECONDS,
+                 limit=WRITE_BUFFER_LIMIT, retries=WRITE_BUFFER_RETRIES, dead_letter=WRITE_DEAD_LETTER):
+        self.manager = manager or get_manager()
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.limit = limit
+        self.retries = retries
+        self.dead_letter = dead_letter
+        self.rows_written = 0
+        self.rows_dead_lettered = 0
+        self.flush_errors = 0
+        self._failures = 0
+        self._pending = {}
+        self._pending_count = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._flush_periodically, name="buffered-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, table, row):
+        """
+        Queues one row (a tuple in INSERT_SQL column order) for `table`.
+        """
+        self.add_many(table, [row])
+
+    def add_many(self, table, rows):
+        """
+        Queues several rows for `table`.
+
+        :return: Number of rows queued.
+        :raises ValueError: For an unknown table or a row with the wrong number of columns.
+        :raises BufferFull: If the rows would take the buffer past its limit.
+        """
+        if table not in INSERT_SQL:
+            raise ValueError(f"Unknown table: {table}")
+        rows = list(rows)
+        for row in rows:
+            if len(row) != ROW_ARITY[table]:
+                raise ValueError(f"{table} rows have {ROW_ARITY[table]} columns, got {len(row)}: {row!r}")
+        with self._lock:
+            if self._pending_count + len(rows) > self.limit:
+                raise BufferFull(f"{self._pending_count} rows already pending (limit {self.limit})")
+            self._pending.setdefault(table, []).extend(rows)
+            self._pending_count += len(rows)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = self._pending_count >= self.max_rows
+        if full:
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Logged by flush(); the rows stay queued for the next one
+                pass
+        return len(rows)
+
+    def flush(self):
+        """
+        Writes every pending row in one transaction.
+
+        :return: Number of rows written; duplicates of existing keys are not counted.
+        :raises sqlite3.Error: If the transaction fails; the rows stay queued
+                               unless they were dead-lettered.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                count, self._pending_count = self._pending_count, 0
+                oldest, self._oldest = self._oldest, None
+            if not count:
+                return 0
+
+            written = {}
+            try:
+                conn = self.manager.get()
+                with conn:
+                    for table, rows in pending.items():
+                        # rowcount excludes rows written by the rollup triggers
+                        cursor = conn.executemany(INSERT_SQL[table], rows)
+                        if table in TIMESERIES_TABLES:
+                            written[table] = cursor.rowcount
+            except sqlite3.Error as e:
+                self.flush_errors += 1
+                FLUSH_ERRORS.inc()
+                self._failures += 1
+                # Locked or busy database; other errors will not go away on retry
+                if isinstance(e, sqlite3.OperationalError) and self._failures <= self.retries:
+                    self._requeue(pending, count, oldest)
+                    logging.error(f"❌ Database error while flushing {count} buffered rows, keeping them queued: {e}")
+                else:
+                    self._failures = 0
+                    self._dead_letter(pending, e)
+                raise
+            self._failures = 0
+            for table, rows in written.items():
+                ROWS_INSERTED.inc(rows, table=table)
+            written = sum(written.values())
+            self.rows_written += written
+            logging.info(f"✅ Flushed {written}/{count} buffered rows across {len(pending)} table(s).")
+            return written
+
+    def _dead_letter(self, pending, error):
+        """
+        Gives up on a batch: appends its rows to the dead_letter file (if set)
+        as one JSON line per table, so they can be inspected and re-imported.
+        """
+        count = sum(len(rows) for rows in pending.values())
+        self.rows_dead_lettered += count
+        for table, rows in pending.items():
+            ROWS_DEAD_LETTERED.inc(len(rows), table=table)
+        if self.dead_letter:
+            try:
+                with open(self.dead_letter, "a") as file:
+                    for table, rows in pending.items():
+                        file.write(json.dumps({"table": table, "error": str(error), "rows": rows}) + "\n")
+            except OSError as e:
+                logging.error(f"❌ Could not write dead letter file {self.dead_letter}: {e}")
+        destination = f"written to {self.dead_letter}" if self.dead_letter else "dropped"
+        logging.error(f"❌ Giving up on {count} buffered rows after a database error ({error}); {destination}.")
+
+    def _requeue(self, pending, count, oldest):
+        # Rows queued while the failed flush ran go after the failed batch
+        with self._lock:
+            for table, rows in self._pending.items():
+                pending.setdefault(table, []).extend(rows)
+            self._pending = pending
+            self._pending_count += count
+            self._oldest = oldest if self._oldest is None else min(oldest, self._oldest)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.max_delay / 2):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay
+            if due:
+                try:
+                    self.flush()
+                except sqlite3.Error:
+                    # Logged by flush(); the rows are retried on the next tick
+                    pass
+
+    def close(self):
+        """
+        Stops the background thread and flushes what is left.
+
+        :raises sqlite3.Error: If the final flush fails.
+        """
+        self._closed.set()
+        self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,7 +1,8 @@
 import sqlite3
 import json
 import logging
-from datetime import datetime
+from backend.data_pipeline.schema import INSERT_SQL, migrate, stamp
+from backend.data_pipeline.connection import get_connection
 
 # Database and JSON file paths
 DB_PATH = "backend/data_pipeline/market_data.db"
@@ -11,44 +12,27 @@ JSON_PATH = "backend/data_pipeline/market_share_data.json"
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
-def create_tables():
+def _connection(conn=None):
     """
-    Creates necessary database tables for market share, ETH price, gas price, and TVL.
+    Returns the caller's connection if one is given, otherwise this thread's
+    shared connection from the connection manager.
+
+    sqlite3 connections used as context managers only wrap a transaction, so
+    the connection stays open for the next write.
+    """
+    return conn if conn is not None else get_connection(DB_PATH)
+
+
+def create_tables(conn=None):
+    """
+    Creates necessary database tables for market share, ETH price, gas price, and TVL
+    by applying any pending schema migrations.
+
+    :param conn: Optional open connection to reuse.
     """
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.executescript("""
-                CREATE TABLE IF NOT EXISTS market_share (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT,
-                    market TEXT,
-                    blockchain TEXT,
-                    project TEXT,
-                    version TEXT,
-                    volume_usd REAL,
-                    trades INTEGER
-                );
-                CREATE TABLE IF NOT EXISTS eth_price (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT,
-                    price REAL
-                );
-                CREATE TABLE IF NOT EXISTS gas_price (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT,
-                    low REAL,
-                    average REAL,
-                    high REAL
-                );
-                CREATE TABLE IF NOT EXISTS tvl (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT,
-                    tvl REAL
-                );
-            """)
-            conn.commit()
-            logging.info("✅ Database tables verified/created successfully.")
+        migrate(_connection(conn))
+        logging.info("✅ Database tables verified/created successfully.")
     except sqlite3.Error as e:
         logging.error(f"❌ Database error during table creation: {e}")
 
@@ -64,106 +48,142 @@ def store_market_data():
         logging.error(f"❌ Error loading JSON data: {e}")
         return
 
-    if "result" in data and "rows" in data["result"]:
+    store_market_share(data)
+
+
+def store_market_share(data, conn=None, writer=None, market=None, chain=None, stamped=None):
+    """
+    Stores a Dune market share payload in the database.
+
+    :param data: Decoded Dune API response.
+    :param conn: Optional open connection to reuse.
+    :param writer: Optional BufferedWriter; rows are queued instead of written immediately.
+    :param market: Market the payload was requested for, stored when a row has none.
+    :param chain: Chain the payload was requested for, stored when a row has none.
+    :param stamped: (timestamp, ts) shared by all pairs of one fetch cycle (default: now).
+    :return: Number of rows written (or queued).
+    """
+    if data and "result" in data and "rows" in data["result"]:
         rows = data["result"]["rows"]
-        timestamp = datetime.now().isoformat()
+        timestamp, ts = stamped or stamp()
         batch_data = [
             (
                 timestamp,
-                row.get("market"),
-                row.get("blockchain"),
+                ts,
+                row.get("market") or market,
+                row.get("blockchain") or chain,
                 row.get("project"),
                 row.get("version"),
                 row.get("volume_usd"),
-                row.get("trades")
+                row.get("trades"),
+                row.get("time")
             )
             for row in rows if row.get("volume_usd") is not None  # Ensure valid data
         ]
 
+        if batch_data and writer is not None:
+            return writer.add_many("market_share", batch_data)
         if batch_data:
             try:
-                with sqlite3.connect(DB_PATH) as conn:
+                with _connection(conn) as conn:
                     cursor = conn.cursor()
-                    cursor.executemany("""
-                        INSERT INTO market_share (timestamp, market, blockchain, project, version, volume_usd, trades)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, batch_data)
+                    cursor.executemany(INSERT_SQL["market_share"], batch_data)
                     conn.commit()
                     logging.info(f"✅ Stored {len(batch_data)} market share records.")
+                    return len(batch_data)
             except sqlite3.Error as e:
                 logging.error(f"❌ Database error while storing market share data: {e}")
         else:
             logging.warning("⚠ No valid market share data to insert.")
     else:
         logging.warning("⚠ No valid market share data found in JSON.")
+    return 0
 
 
-def store_eth_price(price):
+def store_eth_price(price, conn=None, writer=None):
     """
     Stores Ethereum price data into the database.
 
     :param price: ETH price as a float.
+    :param conn: Optional open connection to reuse.
+    :param writer: Optional BufferedWriter; the row is queued instead of written immediately.
+    :return: Number of rows written (or queued).
     """
     if price is None:
         logging.warning("⚠ Skipping ETH price storage due to missing data.")
-        return
+        return 0
 
-    timestamp = datetime.now().isoformat()
+    timestamp, ts = stamp()
+    if writer is not None:
+        return writer.add_many("eth_price", [(timestamp, ts, price)])
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with _connection(conn) as conn:
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO eth_price (timestamp, price) VALUES (?, ?)", (timestamp, price))
+            cursor.execute(INSERT_SQL["eth_price"], (timestamp, ts, price))
             conn.commit()
             logging.info("✅ ETH price data stored successfully.")
+            return 1
     except sqlite3.Error as e:
         logging.error(f"❌ Database error while storing ETH price: {e}")
+    return 0
 
 
-def store_gas_price(low, average, high):
+def store_gas_price(low, average, high, conn=None, writer=None):
     """
     Stores Ethereum gas price data into the database.
 
     :param low: Low gas price.
     :param average: Average gas price.
     :param high: High gas price.
+    :param conn: Optional open connection to reuse.
+    :param writer: Optional BufferedWriter; the row is queued instead of written immediately.
+    :return: Number of rows written (or queued).
     """
     if None in (low, average, high):
         logging.warning("⚠ Skipping gas price storage due to missing data.")
-        return
+        return 0
 
-    timestamp = datetime.now().isoformat()
+    timestamp, ts = stamp()
+    if writer is not None:
+        return writer.add_many("gas_price", [(timestamp, ts, low, average, high)])
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with _connection(conn) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO gas_price (timestamp, low, average, high) VALUES (?, ?, ?, ?)",
-                (timestamp, low, average, high)
-            )
+            cursor.execute(INSERT_SQL["gas_price"], (timestamp, ts, low, average, high))
             conn.commit()
             logging.info("✅ Gas price data stored successfully.")
+            return 1
     except sqlite3.Error as e:
         logging.error(f"❌ Database error while storing gas price: {e}")
+    return 0
 
 
-def store_tvl(tvl):
+def store_tvl(tvl, conn=None, writer=None):
     """
     Stores Ethereum Total Value Locked (TVL) data into the database.
 
     :param tvl: TVL in USD.
+    :param conn: Optional open connection to reuse.
+    :param writer: Optional BufferedWriter; the row is queued instead of written immediately.
+    :return: Number of rows written (or queued).
     """
     if tvl is None:
         logging.warning("⚠ Skipping TVL storage due to missing data.")
-        return
+        return 0
 
-    timestamp = datetime.now().isoformat()
+    timestamp, ts = stamp()
+    if writer is not None:
+        return writer.add_many("tvl", [(timestamp, ts, tvl)])
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with _connection(conn) as conn:
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO tvl (timestamp, tvl) VALUES (?, ?)", (timestamp, tvl))
+            cursor.execute(INSERT_SQL["tvl"], (timestamp, ts, tvl))
             conn.commit()
             logging.info("✅ TVL data stored successfully.")
+            return 1
     except sqlite3.Error as e:
         logging.error(f"❌ Database error while storing TVL: {e}")
+    return 0
 
 
 if __name__ == "__main__":
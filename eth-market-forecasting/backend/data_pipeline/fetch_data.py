@@ -2,10 +2,11 @@ import os
 import requests
 import json
 import sqlite3
-import pandas as pd
 import logging
-from datetime import datetime
 from dotenv import load_dotenv
+from backend.data_pipeline.schema import INSERT_SQL, migrate, stamp
+from backend.data_pipeline.connection import ROWS_INSERTED, get_connection
+from backend import metrics
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +20,82 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 DB_PATH = "backend/data_pipeline/market_data.db"
 JSON_PATH = "backend/data_pipeline/market_share_data.json"
 
+# API endpoints (overridable so the fetchers can be pointed at a local stub server)
+DUNE_API_URL = os.getenv("DUNE_API_URL", "https://api.dune.com")
+ETHERSCAN_API_URL = os.getenv("ETHERSCAN_API_URL", "https://api.etherscan.io")
+DEFILLAMA_API_URL = os.getenv("DEFILLAMA_API_URL", "https://api.llama.fi")
+
+# Shared with async_fetch; `status` is the HTTP status, or "error" if no response arrived
+FETCH_SECONDS = metrics.histogram("fetch_seconds", "HTTP request duration per attempt, by source")
+FETCH_REQUESTS = metrics.counter("fetch_requests_total", "HTTP request attempts by source and status")
+
+
+def get(url, source, headers=None, timeout=10):
+    """
+    requests.get, timed and counted under `source`.
+    """
+    status = "error"
+    try:
+        with FETCH_SECONDS.time(source=source):
+            response = requests.get(url, headers=headers, timeout=timeout)
+        status = response.status_code
+        return response
+    finally:
+        FETCH_REQUESTS.inc(source=source, status=status)
+
+
+def market_share_url(market="dex", chain="ethereum", base_url=None):
+    """
+    Builds the Dune market share endpoint for a (market, chain) pair.
+    """
+    return f"{base_url or DUNE_API_URL}/api/v1/marketshare/{market}/{chain}"
+
+
+def gas_price_url(base_url=None):
+    """
+    Builds the Etherscan gas oracle endpoint.
+    """
+    return f"{base_url or ETHERSCAN_API_URL}/api?module=gastracker&action=gasoracle&apikey={ETHERSCAN_API_KEY}"
+
+
+def tvl_url(base_url=None):
+    """
+    Builds the DeFiLlama Ethereum TVL endpoint.
+    """
+    return f"{base_url or DEFILLAMA_API_URL}/tvl/ethereum"
+
+
+def parse_gas_price(data):
+    """
+    Extracts low/average/high gas prices from an Etherscan gas oracle response.
+
+    :param data: Decoded JSON response.
+    :return: Dictionary containing gas price data or None if the API reported an error.
+    """
+    if isinstance(data, dict) and data.get("status") == "1":
+        return {
+            "low": data["result"]["SafeGasPrice"],
+            "average": data["result"]["ProposeGasPrice"],
+            "high": data["result"]["FastGasPrice"]
+        }
+    logging.warning(f"⚠ Etherscan API returned an error: {data}")
+    return None
+
+
+def parse_tvl(data):
+    """
+    Extracts the TVL value from a DeFiLlama response.
+
+    The endpoint returns either a bare number or an object with a "tvl" key.
+
+    :param data: Decoded JSON response.
+    :return: TVL in USD or None if missing.
+    """
+    tvl = data.get("tvl") if isinstance(data, dict) else data
+    if tvl is None:
+        logging.warning("⚠ TVL data missing in API response.")
+    return tvl
+
 
 def fetch_market_share(market="dex", chain="ethereum"):
     """
@@ -28,11 +105,11 @@ def fetch_market_share(market="dex", chain="ethereum"):
     :param chain: Blockchain name (e.g., ethereum, polygon, bnb).
     :return: JSON response with market share data or None if the request fails.
     """
-    url = f"https://api.dune.com/api/v1/marketshare/{market}/{chain}"
+    url = market_share_url(market, chain)
     headers = {"X-Dune-Api-Key": DUNE_API_KEY}
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get(url, "market_share", headers=headers)
         response.raise_for_status()
         logging.info("✅ Market share data fetched successfully.")
         return response.json()
@@ -47,21 +124,14 @@ def fetch_gas_price():
     
     :return: Dictionary containing gas price data or None if the request fails.
     """
-    url = f"https://api.etherscan.io/api?module=gastracker&action=gasoracle&apikey={ETHERSCAN_API_KEY}"
+    url = gas_price_url()
     try:
-        response = requests.get(url, timeout=10)
+        response = get(url, "gas_price")
         response.raise_for_status()
-        data = response.json()
-        if data.get("status") == "1":
+        gas_price = parse_gas_price(response.json())
+        if gas_price is not None:
             logging.info("✅ Gas price data fetched successfully.")
-            return {
-                "low": data["result"]["SafeGasPrice"],
-                "average": data["result"]["ProposeGasPrice"],
-                "high": data["result"]["FastGasPrice"]
-            }
-        else:
-            logging.warning(f"⚠ Etherscan API returned an error: {data}")
-            return None
+        return gas_price
     except requests.exceptions.RequestException as e:
         logging.error(f"❌ Etherscan API request failed: {e}")
         return None
@@ -72,21 +142,13 @@ def fetch_tvl():
     Fetches the latest DeFi Total Value Locked (TVL) for Ethereum from the DeFiLlama API.
     :return: TVL in USD or None if the request fails.
     """
-    url = "https://api.llama.fi/tvl/ethereum"
+    url = tvl_url()
     try:
-        response = requests.get(url, timeout=10)
+        response = get(url, "tvl")
         response.raise_for_status()
-        
-        # Debugging: Print response before parsing
-        print("🔍 Raw TVL API Response:", response.text)
-
-        data = response.json()
-        
-        tvl = data.get("tvl")
+        tvl = parse_tvl(response.json())
         if tvl is not None:
             logging.info("✅ TVL data fetched successfully.")
-        else:
-            logging.warning("⚠ TVL data missing in API response.")
         
         return tvl
     except requests.exceptions.RequestException as e:
@@ -96,14 +158,14 @@ def fetch_tvl():
 
 def save_to_json(data, file_path=JSON_PATH):
     """
-    Saves market data to a JSON file.
+    Saves market data to a compact JSON file.
     
     :param data: Data to save.
     :param file_path: Path to the JSON file.
     """
     try:
         with open(file_path, "w") as file:
-            json.dump(data, file, indent=4)
+            json.dump(data, file, separators=(",", ":"))
         logging.info(f"✅ Market share data saved to {file_path}")
     except IOError as e:
         logging.error(f"❌ Failed to save JSON data: {e}")
@@ -115,92 +177,76 @@ def create_tables(cursor):
     
     :param cursor: SQLite cursor object.
     """
-    cursor.executescript("""
-        CREATE TABLE IF NOT EXISTS market_share (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            market TEXT,
-            blockchain TEXT,
-            project TEXT,
-            version TEXT,
-            volume_usd REAL,
-            trades INTEGER
-        );
-        CREATE TABLE IF NOT EXISTS gas_price (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            low REAL,
-            average REAL,
-            high REAL
-        );
-        CREATE TABLE IF NOT EXISTS tvl (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            tvl REAL
-        );
-    """)
-
-
-def store_market_data(market_data, gas_price, tvl):
+    migrate(cursor.connection)
+
+
+def store_market_data(market_data, gas_price, tvl, states=()):
     """
     Stores market share, TVL, and gas price data in an SQLite database.
     
-    :param market_data: Market share data fetched from the Dune API.
+    :param market_data: Market share payload fetched from the Dune API, a list of payloads, or a
+                        dict of payloads keyed by the (market, chain) they were requested for,
+                        which is stored for rows that do not name their own market or chain.
     :param gas_price: Gas price data fetched from the Etherscan API.
     :param tvl: Total Value Locked (TVL) fetched from the DeFiLlama API.
+    :param states: Fetch state rows (ChangeTracker.state_rows()) committed with the data.
     """
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection(DB_PATH) as conn:
             cursor = conn.cursor()
-            create_tables(cursor)
-            timestamp = datetime.now().isoformat()
+            timestamp, ts = stamp()
 
             # Insert Gas Price Data
             if gas_price:
-                cursor.execute("""
-                    INSERT INTO gas_price (timestamp, low, average, high)
-                    VALUES (?, ?, ?, ?)
-                """, (timestamp, gas_price["low"], gas_price["average"], gas_price["high"]))
+                cursor.execute(
+                    INSERT_SQL["gas_price"],
+                    (timestamp, ts, gas_price["low"], gas_price["average"], gas_price["high"])
+                )
+                ROWS_INSERTED.inc(cursor.rowcount, table="gas_price")
                 logging.info("✅ Gas price data stored successfully.")
             else:
                 logging.warning("⚠ Gas price data could not be retrieved.")
 
             # Insert TVL Data
             if tvl:
-                cursor.execute("""
-                    INSERT INTO tvl (timestamp, tvl)
-                    VALUES (?, ?)
-                """, (timestamp, tvl))
+                cursor.execute(INSERT_SQL["tvl"], (timestamp, ts, tvl))
+                ROWS_INSERTED.inc(cursor.rowcount, table="tvl")
                 logging.info("✅ TVL data stored successfully.")
             else:
                 logging.warning("⚠ TVL data could not be retrieved.")
 
-            # Insert Market Share Data
-            if market_data and "result" in market_data and "rows" in market_data["result"]:
-                rows = market_data["result"]["rows"]
-                batch_data = [
-                    (
-                        timestamp,
-                        row.get("market"),
-                        row.get("blockchain"),
-                        row.get("project"),
-                        row.get("version"),
-                        row.get("volume_usd"),
-                        row.get("trades")
-                    )
-                    for row in rows
-                ]
-                if batch_data:
-                    cursor.executemany("""
-                        INSERT INTO market_share (timestamp, market, blockchain, project, version, volume_usd, trades)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, batch_data)
-                    logging.info(f"✅ Stored {len(batch_data)} market share records.")
-                else:
-                    logging.warning("⚠ No valid market share data to insert.")
+            # Insert Market Share Data (one payload per market/chain pair)
+            if isinstance(market_data, list):
+                payloads = [((None, None), payload) for payload in market_data]
+            elif isinstance(market_data, dict) and "result" not in market_data:
+                payloads = market_data.items()
+            else:
+                payloads = [((None, None), market_data)]
+            batch_data = [
+                (
+                    timestamp,
+                    ts,
+                    row.get("market") or market,
+                    row.get("blockchain") or chain,
+                    row.get("project"),
+                    row.get("version"),
+                    row.get("volume_usd"),
+                    row.get("trades"),
+                    row.get("time")
+                )
+                for (market, chain), payload in payloads
+                if payload and "result" in payload and "rows" in payload["result"]
+                for row in payload["result"]["rows"]
+            ]
+            if batch_data:
+                cursor.executemany(INSERT_SQL["market_share"], batch_data)
+                ROWS_INSERTED.inc(cursor.rowcount, table="market_share")
+                logging.info(f"✅ Stored {len(batch_data)} market share records.")
             else:
                 logging.warning("⚠ Market share data structure is invalid or empty.")
 
+            if states:
+                cursor.executemany(INSERT_SQL["fetch_state"], states)
             conn.commit()
     except sqlite3.Error as e:
         logging.error(f"❌ Database error: {e}")
@@ -209,17 +255,33 @@ def store_market_data(market_data, gas_price, tvl):
 
 
 if __name__ == "__main__":
-    logging.info("🚀 Fetching market share data...")
-    market_data = fetch_market_share()
+    import argparse
+    from backend.data_pipeline.async_fetch import fetch_all, parse_pairs
+    from backend.data_pipeline.fetch_state import UNCHANGED, ChangeTracker
+    from backend.profiling import add_profile_argument, profile
 
-    logging.info("⛽ Fetching Ethereum gas price data...")
-    gas_price_data = fetch_gas_price()
+    parser = argparse.ArgumentParser(description="Fetch market share, gas price and TVL data once.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
 
-    logging.info("💰 Fetching Ethereum TVL data...")
-    tvl_data = fetch_tvl()
+    logging.info("🚀 Fetching market share, gas price and TVL data concurrently...")
+    with profile("fetch_data", args.profile):
+        pairs = parse_pairs()
+        # Sources that did not change since the last run come back as UNCHANGED and are not stored again
+        tracker = ChangeTracker(get_connection(DB_PATH))
+        results = fetch_all(pairs=pairs, tracker=tracker)
+        fetched = {pair: data for pair, data in results["market_share"].items() if data is not None}
+        payloads = {pair: data for pair, data in fetched.items() if data is not UNCHANGED}
+        gas_price_data = None if results["gas_price"] is UNCHANGED else results["gas_price"]
+        tvl_data = None if results["tvl"] is UNCHANGED else results["tvl"]
 
-    if market_data:
-        save_to_json(market_data)
-        store_market_data(market_data, gas_price_data, tvl_data)
-    else:
-        logging.error("❌ Failed to fetch market share data.")
+        if not fetched:
+            logging.error("❌ Failed to fetch market share data.")
+        elif payloads or gas_price_data or tvl_data:
+            primary = fetched.get(("dex", "ethereum"), UNCHANGED)
+            if primary is not UNCHANGED:
+                save_to_json(primary)
+            store_market_data(payloads, gas_price_data, tvl_data, tracker.state_rows())
+        else:
+            logging.info("♻ Nothing changed since the last fetch; no rows stored.")
+    metrics.dump()
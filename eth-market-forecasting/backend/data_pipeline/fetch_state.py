@@ -0,0 +1,160 @@
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+
+from backend.data_pipeline.schema import INSERT_SQL
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Returned instead of a payload when a source has not changed since the last fetch
+UNCHANGED = object()
+
+LOAD_QUERY = "SELECT source, etag, last_modified, payload_hash FROM fetch_state"
+
+
+def market_share_source(market, chain):
+    """
+    Source key of one market share (market, chain) pair.
+    """
+    return f"market_share:{market}/{chain}"
+
+
+def hashed_content(source, data):
+    """
+    Part of a payload that identifies its content.
+
+    Dune responses carry a new execution id and timestamps on every call, so
+    only their result rows are compared.
+    """
+    if source.startswith("market_share") and isinstance(data, dict):
+        return data.get("result", {}).get("rows")
+    return data
+
+
+def payload_hash(source, data):
+    """
+    Returns a stable SHA-256 of a decoded JSON payload's content.
+    """
+    content = json.dumps(hashed_content(source, data), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ChangeTracker:
+    """
+    Remembers the HTTP validators (ETag/Last-Modified) and payload hash of each
+    source in the fetch_state table, so fetchers can send conditional requests
+    and drop payloads that have not changed.
+
+    The state of a changed payload is only held in memory until the caller
+    takes it with state_row() and writes it in the same transaction as the
+    payload's rows (INSERT_SQL["fetch_state"]). If that write fails, the stored
+    hash still describes the last payload that made it to the database and
+    the next fetch stores the new one again.
+
+    Sources are keyed by name, e.g. "gas_price" or "market_share:dex/ethereum".
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.stats = {"changed": 0, "not_modified": 0, "unchanged": 0}
+        self._state = {}
+        self._pending = {}
+        try:
+            for source, etag, last_modified, digest in conn.execute(LOAD_QUERY):
+                self._state[source] = {"etag": etag, "last_modified": last_modified, "payload_hash": digest}
+        except sqlite3.Error as e:
+            logging.error(f"❌ Could not load fetch state: {e}")
+
+    def headers(self, source):
+        """
+        Returns the conditional request headers for a source.
+        """
+        state = self._state.get(source, {})
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    def not_modified(self, source):
+        """
+        Records a 304 response.
+        """
+        self.stats["not_modified"] += 1
+        self._save(source, self._state.get(source, {}))
+
+    def observe(self, source, data, etag=None, last_modified=None):
+        """
+        Records a fetched payload.
+
+        An unchanged payload is saved right away (nothing else needs writing);
+        a changed one waits for state_row().
+
+        :param source: Source key.
+        :param data: Decoded JSON payload.
+        :param etag: ETag response header, if any.
+        :param last_modified: Last-Modified response header, if any.
+        :return: True if the payload differs from the last one stored for this source.
+        """
+        digest = payload_hash(source, data)
+        changed = digest != self._state.get(source, {}).get("payload_hash")
+        self.stats["changed" if changed else "unchanged"] += 1
+        state = {"etag": etag, "last_modified": last_modified, "payload_hash": digest}
+        if changed:
+            self._pending[source] = state
+        else:
+            self._state[source] = state
+            self._save(source, state)
+        return changed
+
+    def state_row(self, source):
+        """
+        Takes the pending state of a changed payload.
+
+        :param source: Source key.
+        :return: Row for INSERT_SQL["fetch_state"], or None if nothing is pending.
+        """
+        state = self._pending.pop(source, None)
+        if state is None:
+            return None
+        self._state[source] = state
+        return self._row(source, state, changed=True)
+
+    def state_rows(self):
+        """
+        Takes the pending state of every changed payload.
+
+        :return: List of rows for INSERT_SQL["fetch_state"].
+        """
+        return [self.state_row(source) for source in list(self._pending)]
+
+    @staticmethod
+    def _row(source, state, changed):
+        now = int(time.time())
+        return (
+            source,
+            state.get("etag"),
+            state.get("last_modified"),
+            state.get("payload_hash"),
+            now,
+            now if changed else None,
+        )
+
+    def _save(self, source, state):
+        try:
+            with self.conn:
+                self.conn.execute(INSERT_SQL["fetch_state"], self._row(source, state, changed=False))
+        except sqlite3.Error as e:
+            logging.error(f"❌ Could not save fetch state for {source}: {e}")
+
+    def log_summary(self):
+        skipped = self.stats["not_modified"] + self.stats["unchanged"]
+        total = skipped + self.stats["changed"]
+        logging.info(
+            f"♻ Skipped {skipped}/{total} unchanged payload(s): "
+            f"{self.stats['not_modified']} not modified (304), {self.stats['unchanged']} with the same hash."
+        )
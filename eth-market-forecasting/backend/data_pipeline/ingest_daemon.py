@@ -0,0 +1,260 @@
+import os
+import time
+import signal
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+from backend import metrics
+from backend.data_pipeline import database
+from backend.data_pipeline.connection import BufferedWriter, ConnectionManager
+from backend.data_pipeline.fetch_state import UNCHANGED, ChangeTracker, market_share_source
+from backend.data_pipeline.schema import stamp
+from backend.data_pipeline.async_fetch import (
+    FetchLimits,
+    create_session,
+    fetch_market_share_pairs,
+    fetch_gas_price_async,
+    fetch_tvl_async,
+    parse_pairs,
+)
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Polling interval per source in seconds (gas roughly once per block, TVL hourly, market share daily)
+SCHEDULE = {
+    "gas_price": float(os.getenv("GAS_PRICE_INTERVAL", 12)),
+    "tvl": float(os.getenv("TVL_INTERVAL", 3600)),
+    "market_share": float(os.getenv("MARKET_SHARE_INTERVAL", 86400)),
+}
+
+# How often the daemon logs its counters, in seconds
+STATS_INTERVAL = float(os.getenv("INGEST_STATS_INTERVAL", 300))
+
+
+class IngestDaemon:
+    """
+    Long-running ingestion service that polls each source on its own schedule.
+
+    A single HTTP session and connection manager are reused for the lifetime
+    of the daemon, and rows go through a BufferedWriter so concurrent sources
+    share transactions. If a source is still running when its next tick comes due, the tick
+    is coalesced into the running fetch and counted as a missed deadline.
+
+    Market share is fetched for every configured (market, chain) pair
+    (INGEST_PAIRS) at once, under the global concurrency and per-host rate
+    limits of one FetchLimits shared by all sources.
+
+    Requests are conditional on the last ETag/Last-Modified of each source,
+    and payloads identical to the previous one are not stored again. A
+    source's new validators go through the writer after its rows, so they are
+    never committed before the rows they describe.
+    """
+
+    def __init__(self, schedule=None, db_path=None, pairs=None, endpoints=None, limits=None):
+        self.schedule = dict(schedule or SCHEDULE)
+        self.db_path = db_path or database.DB_PATH
+        self.pairs = parse_pairs() if pairs is None else list(pairs)
+        self.endpoints = endpoints or {}
+        self.limits = limits
+        self.tracker = None
+        self.writer = None
+        self.session = None
+        self.pair_latency = {}
+        self.pair_failures = {}
+        self._tasks = {}
+        self._stop = None
+        self.stats = {
+            source: {
+                "runs": 0,
+                "failures": 0,
+                "rows_written": 0,
+                "unchanged": 0,
+                "missed_deadlines": 0,
+                "last_latency": None,
+                "total_latency": 0.0,
+            }
+            for source in self.schedule
+        }
+
+    async def _ingest_gas_price(self):
+        gas_price = await fetch_gas_price_async(
+            self.session, self.endpoints.get("gas_price"), limits=self.limits, tracker=self.tracker
+        )
+        if gas_price is None or gas_price is UNCHANGED:
+            return gas_price
+        rows = database.store_gas_price(gas_price["low"], gas_price["average"], gas_price["high"], writer=self.writer)
+        self._queue_state("gas_price")
+        return rows
+
+    async def _ingest_tvl(self):
+        tvl = await fetch_tvl_async(self.session, self.endpoints.get("tvl"), limits=self.limits, tracker=self.tracker)
+        if tvl is None or tvl is UNCHANGED:
+            return tvl
+        rows = database.store_tvl(tvl, writer=self.writer)
+        self._queue_state("tvl")
+        return rows
+
+    async def _ingest_market_share(self):
+        payloads, latency = await fetch_market_share_pairs(
+            self.session, self.pairs, self.endpoints.get("market_share"), self.limits, self.tracker
+        )
+        self.pair_latency.update(latency)
+        for pair, data in payloads.items():
+            if data is None:
+                self.pair_failures[pair] = self.pair_failures.get(pair, 0) + 1
+        if all(data is None for data in payloads.values()):
+            return None
+        changed = {pair: data for pair, data in payloads.items() if data is not None and data is not UNCHANGED}
+        if not changed:
+            return UNCHANGED
+        rows = 0
+        # One snapshot time for every pair of the cycle
+        stamped = stamp()
+        for (market, chain), data in changed.items():
+            rows += database.store_market_share(data, writer=self.writer, market=market, chain=chain, stamped=stamped)
+            self._queue_state(market_share_source(market, chain))
+        return rows
+
+    def _queue_state(self, source):
+        """
+        Queues a changed source's validators behind its rows, so the writer
+        commits them in the same (or a later) transaction.
+        """
+        row = self.tracker.state_row(source)
+        if row is not None:
+            self.writer.add("fetch_state", row)
+
+    async def _run_source(self, source):
+        """
+        Runs one fetch-and-store cycle for a source and records its counters.
+        """
+        stats = self.stats[source]
+        start = time.perf_counter()
+        try:
+            rows = await getattr(self, f"_ingest_{source}")()
+        except Exception as e:
+            logging.error(f"❌ Unexpected error while ingesting {source}: {e}")
+            rows = None
+        latency = time.perf_counter() - start
+
+        stats["runs"] += 1
+        stats["last_latency"] = latency
+        stats["total_latency"] += latency
+        if rows is None:
+            stats["failures"] += 1
+        elif rows is UNCHANGED:
+            stats["unchanged"] += 1
+        else:
+            stats["rows_written"] += rows
+
+    def _tick(self, source, due, now):
+        """
+        Starts a source if it is due and returns its next deadline.
+        """
+        interval = self.schedule[source]
+        skipped = int((now - due) // interval)
+        missed = skipped
+        running = self._tasks.get(source)
+        if running is not None and not running.done():
+            missed += 1
+        else:
+            self._tasks[source] = asyncio.create_task(self._run_source(source))
+        if missed:
+            self.stats[source]["missed_deadlines"] += missed
+            logging.warning(f"⚠ {source} missed {missed} deadline(s); coalescing into the current run.")
+        return due + (skipped + 1) * interval
+
+    def snapshot(self):
+        """
+        Returns a copy of the per-source counters, including average fetch latency.
+        """
+        result = {}
+        for source, stats in self.stats.items():
+            result[source] = dict(stats)
+            result[source]["avg_latency"] = stats["total_latency"] / stats["runs"] if stats["runs"] else None
+        return result
+
+    def log_stats(self):
+        for source, stats in self.snapshot().items():
+            avg = f"{stats['avg_latency']:.2f}s" if stats["avg_latency"] is not None else "n/a"
+            logging.info(
+                f"📊 {source}: runs={stats['runs']} failures={stats['failures']} "
+                f"rows={stats['rows_written']} unchanged={stats['unchanged']} "
+                f"missed={stats['missed_deadlines']} avg_latency={avg}"
+            )
+        for (market, chain), seconds in sorted(self.pair_latency.items(), key=lambda item: -item[1]):
+            failures = self.pair_failures.get((market, chain), 0)
+            logging.info(f"📊 market_share {market}/{chain}: last_latency={seconds:.2f}s failures={failures}")
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self, duration=None):
+        """
+        Runs the scheduler until stop() is called or `duration` seconds have elapsed.
+        """
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        manager = ConnectionManager(self.db_path)
+        self.writer = BufferedWriter(manager)
+        self.session = create_session()
+        self.limits = self.limits or FetchLimits()
+        self.tracker = ChangeTracker(manager.get())
+
+        start = loop.time()
+        next_due = {source: start for source in self.schedule}
+        next_stats = start + STATS_INTERVAL
+        try:
+            while not self._stop.is_set():
+                now = loop.time()
+                if duration is not None and now - start >= duration:
+                    break
+                for source, due in next_due.items():
+                    if now >= due:
+                        next_due[source] = self._tick(source, due, now)
+                if now >= next_stats:
+                    self.log_stats()
+                    next_stats = now + STATS_INTERVAL
+
+                wake = min(min(next_due.values()), next_stats)
+                if duration is not None:
+                    wake = min(wake, start + duration)
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=max(wake - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            pending = [task for task in self._tasks.values() if not task.done()]
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            await self.session.close()
+            try:
+                self.writer.close()
+            finally:
+                manager.close_all()
+                self.log_stats()
+                self.tracker.log_summary()
+
+
+async def main():
+    daemon = IngestDaemon()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, daemon.stop)
+        except NotImplementedError:
+            # Signal handlers are not available on Windows event loops
+            pass
+    await daemon.run()
+    metrics.dump()
+
+
+if __name__ == "__main__":
+    logging.info("🚀 Starting continuous market data ingestion...")
+    asyncio.run(main())
@@ -0,0 +1,265 @@
+import os
+import math
+
+import numpy as np
+
+from backend import metrics
+from backend.data_pipeline.connection import get_connection
+from backend.data_pipeline.schema import DB_PATH, MARKET_SHARE_RESOLUTIONS, ROLLUP_RESOLUTIONS, ROLLUP_SERIES
+
+# Target number of points per response, and the most a client may ask for
+RANGE_POINTS = int(os.getenv("RANGE_POINTS", 1000))
+RANGE_MAX_POINTS = int(os.getenv("RANGE_MAX_POINTS", 5000))
+# Span returned when no start is given (seconds before the newest bucket)
+RANGE_DEFAULT_SPAN = int(os.getenv("RANGE_DEFAULT_SPAN", 30 * 86400))
+# LTTB picks its points from up to this many times as many rollup buckets
+RANGE_LTTB_OVERSAMPLE = int(os.getenv("RANGE_LTTB_OVERSAMPLE", 10))
+
+METHODS = ("ohlc", "lttb")
+
+ROLLUP_QUERY = """
+    SELECT bucket, open, high, low, close, sum, count FROM rollup
+    WHERE series = :series AND resolution = :resolution AND bucket >= :start AND bucket <= :end
+    ORDER BY bucket
+"""
+LAST_BUCKET_QUERY = "SELECT MAX(bucket) FROM rollup WHERE series = :series AND resolution = :resolution"
+
+# Total volume per reporting period bucket across markets, chains and
+# projects, each project counted once with its newest snapshot's volume
+MARKET_SHARE_SERIES_QUERY = """
+    SELECT bucket, SUM(volume_usd) FROM market_share_project
+    WHERE resolution = :resolution AND bucket >= :start AND bucket <= :end
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+LAST_MARKET_SHARE_BUCKET_QUERY = "SELECT MAX(bucket) FROM market_share_project WHERE resolution = :resolution"
+
+RESOLUTIONS = sorted(ROLLUP_RESOLUTIONS.values())
+
+# Series served by query_range and the bucket widths available for each
+SERIES_RESOLUTIONS = {series: RESOLUTIONS for series in ROLLUP_SERIES}
+SERIES_RESOLUTIONS["market_share"] = sorted(MARKET_SHARE_RESOLUTIONS.values())
+
+SQL_SECONDS = metrics.histogram("sql_query_seconds", "SQLite query time by query")
+
+# Volume per project between two buckets, read from the per-project aggregate
+# (a primary key range scan) instead of every raw market_share row
+PROJECT_VOLUME_QUERY = """
+    SELECT project, SUM(volume_usd) AS volume_usd, SUM(trades) AS trades
+    FROM market_share_project
+    WHERE market = :market AND blockchain = :blockchain AND resolution = :resolution
+      AND bucket >= :start AND bucket <= :end
+    GROUP BY project
+    ORDER BY volume_usd DESC
+"""
+LAST_PROJECT_BUCKET_QUERY = """
+    SELECT MAX(bucket) FROM market_share_project
+    WHERE market = :market AND blockchain = :blockchain AND resolution = :resolution
+"""
+
+
+def pick_resolution(span, rows, resolutions=RESOLUTIONS):
+    """
+    Coarsest rollup resolution that still yields at least `rows` buckets over
+    `span` seconds (the finest one if none does).
+    """
+    target = span / max(rows, 1)
+    return max([r for r in resolutions if r <= target] or resolutions[:1])
+
+
+def load_rollup(conn, series, resolution, start, end):
+    """
+    Reads one series' buckets between two epoch bounds (inclusive).
+
+    Market share buckets hold one value, the period's total volume, so open,
+    high, low, close and sum are all that volume and count is 1.
+
+    :return: Dict of 1-D arrays: bucket, open, high, low, close, sum, count.
+    """
+    params = {"series": series, "resolution": resolution, "start": start, "end": end}
+    if series == "market_share":
+        with SQL_SECONDS.time(query="market_share_series"):
+            rows = conn.execute(MARKET_SHARE_SERIES_QUERY, params).fetchall()
+        rows = [(bucket, volume, volume, volume, volume, volume, 1) for bucket, volume in rows]
+    else:
+        with SQL_SECONDS.time(query="rollup"):
+            rows = conn.execute(ROLLUP_QUERY, params).fetchall()
+    table = np.array(rows, dtype=np.float64).reshape(len(rows), 7)
+    columns = dict(zip(("bucket", "open", "high", "low", "close", "sum", "count"), table.T))
+    columns["bucket"] = columns["bucket"].astype(np.int64)
+    return columns
+
+
+def merge_buckets(columns, width):
+    """
+    Merges sorted rollup buckets into wider, epoch-aligned buckets of `width` seconds.
+
+    :return: Dict of arrays with the merged bucket start, open, high, low, close, sum and count.
+    """
+    if not len(columns["bucket"]):
+        return columns
+    keys = columns["bucket"] // width * width
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return {
+        "bucket": keys[starts],
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+        "sum": np.add.reduceat(columns["sum"], starts),
+        "count": np.add.reduceat(columns["count"], starts),
+    }
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: keeps `threshold` points that preserve the
+    visual shape of the series, always including the first and last point.
+
+    :param x: Sorted 1-D array of x values.
+    :param y: 1-D array of y values.
+    :param threshold: Number of points to keep.
+    :return: Indices of the kept points.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:threshold], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Interior points split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the triangle's third vertex
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def query_range(conn, series, start=None, end=None, points=RANGE_POINTS, method="ohlc"):
+    """
+    Returns one series between two timestamps, downsampled to about `points` points.
+
+    - `ohlc`: rollup buckets merged into equal time buckets, each with
+      open/high/low/close, average and observation count.
+    - `lttb`: representative bucket averages chosen with LTTB.
+
+    :param conn: Open SQLite connection.
+    :param series: One of SERIES_RESOLUTIONS (the ROLLUP_SERIES plus market_share,
+                   whose finest resolution is 1h).
+    :param start: Epoch seconds; defaults to RANGE_DEFAULT_SPAN before `end`.
+    :param end: Epoch seconds; defaults to the newest stored bucket.
+    :param points: Maximum number of points returned.
+    :param method: "ohlc" or "lttb".
+    :return: Dict with the series, bucket width in seconds, method and columnar values.
+    """
+    if series not in SERIES_RESOLUTIONS:
+        raise ValueError(f"Unknown series: {series}")
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    points = int(points)
+    if not 2 <= points <= RANGE_MAX_POINTS:
+        raise ValueError(f"'points' must be between 2 and {RANGE_MAX_POINTS}")
+
+    resolutions = SERIES_RESOLUTIONS[series]
+    if end is None:
+        last_bucket = LAST_MARKET_SHARE_BUCKET_QUERY if series == "market_share" else LAST_BUCKET_QUERY
+        end = conn.execute(last_bucket, {"series": series, "resolution": resolutions[0]}).fetchone()[0] or 0
+    if start is None:
+        start = end - RANGE_DEFAULT_SPAN
+    start, end = int(start), int(end)
+    if start > end:
+        raise ValueError("'start' must not be after 'end'")
+    span = end - start + 1
+
+    if method == "ohlc":
+        # Merged buckets: span / width <= points - 1, so at most `points` of them
+        resolution = pick_resolution(span, points - 1, resolutions)
+        width = math.ceil(span / (points - 1) / resolution) * resolution
+        merged = merge_buckets(load_rollup(conn, series, resolution, start - start % width, end), width)
+        average = merged["sum"] / np.maximum(merged["count"], 1)
+        return {
+            "series": series,
+            "resolution": width,
+            "method": method,
+            "timestamps": merged["bucket"].tolist(),
+            "open": merged["open"].tolist(),
+            "high": merged["high"].tolist(),
+            "low": merged["low"].tolist(),
+            "close": merged["close"].tolist(),
+            "avg": average.tolist(),
+            "count": merged["count"].astype(np.int64).tolist(),
+        }
+
+    resolution = pick_resolution(span, points * RANGE_LTTB_OVERSAMPLE, resolutions)
+    columns = load_rollup(conn, series, resolution, start - start % resolution, end)
+    average = columns["sum"] / np.maximum(columns["count"], 1)
+    kept = lttb(columns["bucket"], average, points)
+    return {
+        "series": series,
+        "resolution": resolution,
+        "method": method,
+        "timestamps": columns["bucket"][kept].tolist(),
+        "values": average[kept].tolist(),
+    }
+
+
+def top_projects(conn, market="dex", blockchain="ethereum", resolution="1d", start=None, end=None, top=10):
+    """
+    Returns the projects with the most volume between two timestamps and
+    their share of the market's total volume.
+
+    :param conn: Open SQLite connection.
+    :param market: Dune market, e.g. "dex".
+    :param blockchain: Dune chain, e.g. "ethereum".
+    :param resolution: "1h" or "1d" buckets of the reporting period.
+    :param start: Epoch seconds; defaults to RANGE_DEFAULT_SPAN before `end`.
+    :param end: Epoch seconds; defaults to the newest stored bucket.
+    :param top: Number of projects returned.
+    :return: Dict with the bounds, total volume and a list of {project, volume_usd, trades, share}.
+    """
+    if resolution not in MARKET_SHARE_RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    params = {"market": market, "blockchain": blockchain, "resolution": MARKET_SHARE_RESOLUTIONS[resolution]}
+    if end is None:
+        end = conn.execute(LAST_PROJECT_BUCKET_QUERY, params).fetchone()[0] or 0
+    if start is None:
+        start = end - RANGE_DEFAULT_SPAN
+    with SQL_SECONDS.time(query="project_volume"):
+        rows = conn.execute(PROJECT_VOLUME_QUERY, {**params, "start": int(start), "end": int(end)}).fetchall()
+    total = sum(volume for _, volume, _ in rows)
+    return {
+        "market": market,
+        "blockchain": blockchain,
+        "start": int(start),
+        "end": int(end),
+        "total_volume_usd": total,
+        "projects": [
+            {"project": project, "volume_usd": volume, "trades": trades, "share": volume / total if total else 0.0}
+            for project, volume, trades in rows[:top]
+        ],
+    }
+
+
+def fetch_range(series, start=None, end=None, points=RANGE_POINTS, method="ohlc", db_path=DB_PATH):
+    """
+    query_range on the calling thread's shared connection.
+    """
+    return query_range(get_connection(db_path), series, start, end, points, method)
+
+
+def fetch_top_projects(market="dex", blockchain="ethereum", resolution="1d", start=None, end=None, top=10, db_path=DB_PATH):
+    """
+    top_projects on the calling thread's shared connection.
+    """
+    return top_projects(get_connection(db_path), market, blockchain, resolution, start, end, top)
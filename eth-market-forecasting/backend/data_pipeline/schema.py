@@ -0,0 +1,508 @@
+import sqlite3
+import logging
+from datetime import datetime
+
+# Database path
+DB_PATH = "backend/data_pipeline/market_data.db"
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Connection settings: WAL lets the dashboard/API read while ingest writes,
+# synchronous=NORMAL is durable in WAL mode without an fsync per commit.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -65536),  # negative = KiB, i.e. 64 MiB page cache
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),  # milliseconds
+)
+
+TIMESERIES_TABLES = ("market_share", "eth_price", "gas_price", "tvl")
+
+# Insert statements shared by every writer; keeping the SQL text constant lets
+# sqlite3's per-connection statement cache reuse the compiled statements.
+# Rows that repeat an existing natural key (see UNIQUE_KEYS) are ignored, except
+# market share rows from a newer snapshot, which replace the reporting
+# period's row (see _v9_market_share_period_key).
+INSERT_SQL = {
+    "market_share": """
+        INSERT OR IGNORE INTO market_share (timestamp, ts, market, blockchain, project, version, volume_usd, trades, period)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    "eth_price": "INSERT OR IGNORE INTO eth_price (timestamp, ts, price) VALUES (?, ?, ?)",
+    "gas_price": "INSERT OR IGNORE INTO gas_price (timestamp, ts, low, average, high) VALUES (?, ?, ?, ?, ?)",
+    "tvl": "INSERT OR IGNORE INTO tvl (timestamp, ts, tvl) VALUES (?, ?, ?)",
+    # Per-source fetch validators (see fetch_state.ChangeTracker), written in the
+    # same transaction as the rows of the payload they describe. A NULL
+    # changed_ts keeps the previous one.
+    "fetch_state": """
+        INSERT INTO fetch_state (source, etag, last_modified, payload_hash, checked_ts, changed_ts)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (source) DO UPDATE SET
+            etag = excluded.etag,
+            last_modified = excluded.last_modified,
+            payload_hash = excluded.payload_hash,
+            checked_ts = excluded.checked_ts,
+            changed_ts = IFNULL(excluded.changed_ts, changed_ts)
+    """,
+}
+
+
+
+def market_share_key(row=""):
+    """
+    Natural key of a market share row: one per Dune reporting period, market,
+    chain, project and version, with missing values compared as ''.
+
+    :param row: Column prefix, e.g. "NEW." in a trigger body.
+    """
+    return (f"{row}period",) + tuple(f"IFNULL({row}{column}, '')" for column in ("market", "blockchain", "project", "version"))
+
+
+# Natural key of each table, enforced by a UNIQUE index. Market share rows
+# stored before the period column existed are left out of the constraint.
+UNIQUE_KEYS = {
+    "market_share": (market_share_key(), "period IS NOT NULL"),
+    "eth_price": (("ts",), None),
+    "gas_price": (("ts",), None),
+    "tvl": (("ts",), None),
+}
+
+# Schema versions 4 to 8 also keyed market share rows on the fetch time, so
+# every snapshot stored its own copy of each re-reported period
+V4_UNIQUE_KEYS = dict(UNIQUE_KEYS, market_share=(("ts",) + market_share_key(), "period IS NOT NULL"))
+
+# Ids come from AUTOINCREMENT and are never reused, so the sum of the newest id
+# of every time-series table changes whenever any ingest path stores a row
+# (ignored duplicates create no row). MAX(id) is a single b-tree seek per table.
+DATA_VERSION_QUERY = "SELECT " + " + ".join(
+    f"(SELECT IFNULL(MAX(id), 0) FROM {table})" for table in TIMESERIES_TABLES
+)
+
+# Series kept in the rollup table: name -> (source table, value column).
+# Market share rows are per project and re-reported by every snapshot, so its
+# series is read from market_share_project instead (see _v8_market_share_series).
+ROLLUP_SERIES = {
+    "eth_price": ("eth_price", "price"),
+    "gas_price": ("gas_price", "average"),
+    "tvl": ("tvl", "tvl"),
+}
+
+# Rollup bucket widths in seconds, finest first
+ROLLUP_RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# Folds one observation (:ts, :value) into its bucket. Every column combines
+# associatively, so rows may arrive in any order: open/close follow the
+# earliest/latest ts seen, and all right-hand sides read the old row values.
+ROLLUP_UPSERT = """
+    INSERT INTO rollup (series, resolution, bucket, open_ts, open, high, low, close_ts, close, sum, count)
+    SELECT '{series}', {resolution}, {ts} - {ts} % {resolution}, {ts}, {value}, {value}, {value}, {ts}, {value}, {value}, 1
+    {source}
+    ON CONFLICT (series, resolution, bucket) DO UPDATE SET
+        open = CASE WHEN excluded.open_ts < open_ts THEN excluded.open ELSE open END,
+        open_ts = MIN(open_ts, excluded.open_ts),
+        high = MAX(high, excluded.high),
+        low = MIN(low, excluded.low),
+        close = CASE WHEN excluded.close_ts >= close_ts THEN excluded.close ELSE close END,
+        close_ts = MAX(close_ts, excluded.close_ts),
+        sum = sum + excluded.sum,
+        count = count + excluded.count
+"""
+
+# Incrementally maintained market share aggregates, updated by insert triggers.
+# {row} is "NEW." inside a trigger and "" when filling from existing rows.
+# Keys use '' for missing market/chain/project/period so they can be primary keys.
+MARKET_SHARE_SNAPSHOT_UPSERT = """
+    INSERT INTO market_share_snapshot (ts, market, blockchain, period, volume_usd, trades, projects)
+    SELECT {row}ts, IFNULL({row}market, ''), IFNULL({row}blockchain, ''), IFNULL({row}period, ''),
+           {row}volume_usd, IFNULL({row}trades, 0), 1
+    {source}
+    ON CONFLICT (ts, market, blockchain, period) DO UPDATE SET
+        volume_usd = volume_usd + excluded.volume_usd,
+        trades = trades + excluded.trades,
+        projects = projects + 1
+"""
+
+# Epoch of the Dune reporting period ("2025-01-16 00:00:00.000 UTC"), or the
+# fetch time for rows stored without one
+PERIOD_EPOCH = "COALESCE(CAST(strftime('%s', substr({row}period, 1, 19)) AS INTEGER), {row}ts)"
+
+# Each fetch re-reports recent periods, so a project's volume in a bucket is
+# taken from the newest snapshot that reported it: rows of a newer snapshot
+# replace the bucket, rows of the same snapshot add up, older ones are ignored.
+MARKET_SHARE_PROJECT_UPSERT = """
+    INSERT INTO market_share_project (market, blockchain, resolution, bucket, project, ts, volume_usd, trades)
+    SELECT IFNULL({row}market, ''), IFNULL({row}blockchain, ''), {resolution},
+           {period} - {period} % {resolution}, IFNULL({row}project, ''),
+           {row}ts, {row}volume_usd, IFNULL({row}trades, 0)
+    {source}
+    ON CONFLICT (market, blockchain, resolution, bucket, project) DO UPDATE SET
+        volume_usd = CASE WHEN excluded.ts > ts THEN excluded.volume_usd
+                          WHEN excluded.ts = ts THEN volume_usd + excluded.volume_usd
+                          ELSE volume_usd END,
+        trades = CASE WHEN excluded.ts > ts THEN excluded.trades
+                      WHEN excluded.ts = ts THEN trades + excluded.trades
+                      ELSE trades END,
+        ts = MAX(ts, excluded.ts)
+"""
+
+# Project volume is kept per hour and per day of the reporting period
+MARKET_SHARE_RESOLUTIONS = {name: ROLLUP_RESOLUTIONS[name] for name in ("1h", "1d")}
+
+
+def market_share_upserts(row, source):
+    """
+    Returns the statements that fold market_share rows into the aggregate tables.
+
+    :param row: Column prefix, "NEW." in a trigger body or "" for a SELECT.
+    :param source: FROM/WHERE clause of the SELECT ("" in a trigger body).
+    """
+    statements = [MARKET_SHARE_SNAPSHOT_UPSERT.format(row=row, source=source)]
+    period = PERIOD_EPOCH.format(row=row)
+    for resolution in MARKET_SHARE_RESOLUTIONS.values():
+        statements.append(MARKET_SHARE_PROJECT_UPSERT.format(row=row, source=source, period=period, resolution=resolution))
+    return statements
+
+
+def stamp(dt=None):
+    """
+    Returns the (ISO text, epoch seconds) pair stored with every row.
+
+    :param dt: Naive local datetime; defaults to now.
+    """
+    dt = dt or datetime.now()
+    return dt.isoformat(), int(dt.timestamp())
+
+
+def _v1_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS market_share (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            market TEXT,
+            blockchain TEXT,
+            project TEXT,
+            version TEXT,
+            volume_usd REAL,
+            trades INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS eth_price (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            price REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS gas_price (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            low REAL,
+            average REAL,
+            high REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tvl (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            tvl REAL
+        )
+    """)
+
+
+def _v2_timestamp_indexes(conn):
+    for table in TIMESERIES_TABLES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table}(timestamp)")
+
+
+def _v3_epoch_timestamps(conn):
+    """
+    Adds an INTEGER epoch column `ts` next to the ISO text timestamp and backfills it.
+    """
+    for table in TIMESERIES_TABLES:
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "ts" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN ts INTEGER")
+
+        rows = conn.execute(f"SELECT id, timestamp FROM {table} WHERE ts IS NULL AND timestamp IS NOT NULL").fetchall()
+        updates = []
+        for row_id, timestamp in rows:
+            try:
+                updates.append((stamp(datetime.fromisoformat(timestamp))[1], row_id))
+            except ValueError:
+                logging.warning(f"⚠ Unparseable timestamp {timestamp!r} in {table} row {row_id}")
+        conn.executemany(f"UPDATE {table} SET ts = ? WHERE id = ?", updates)
+
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table}(ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_market_share_ts_project ON market_share(ts, project)")
+
+
+def _move_duplicates(conn, table, key, condition, keep):
+    """
+    Keeps one row per natural key and moves the others to <table>_duplicates
+    instead of deleting them.
+
+    :param key: Key expressions.
+    :param condition: Rows the key applies to.
+    :param keep: ORDER BY of the row kept for each key (the first one).
+    :return: Number of rows moved.
+    """
+    duplicates = f"""
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY {", ".join(key)} ORDER BY {keep}) AS position
+            FROM {table} WHERE {condition}
+        ) WHERE position > 1
+    """
+    count = conn.execute(f"SELECT COUNT(*) FROM ({duplicates})").fetchone()[0]
+    if not count:
+        return 0
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table}_duplicates AS SELECT * FROM {table} WHERE 0")
+    conn.execute(f"INSERT INTO {table}_duplicates SELECT * FROM {table} WHERE id IN ({duplicates})")
+    conn.execute(f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table}_duplicates)")
+    logging.warning(f"⚠ Moved {count} duplicate row(s) of {table} to {table}_duplicates.")
+    return count
+
+
+def _v4_unique_keys(conn):
+    """
+    Adds the Dune reporting period to market_share, moves duplicate rows aside
+    and enforces one row per natural key so that re-running a backfill or a
+    fetch is idempotent.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(market_share)")}
+    if "period" not in columns:
+        conn.execute("ALTER TABLE market_share ADD COLUMN period TEXT")
+
+    for table, (key, where) in V4_UNIQUE_KEYS.items():
+        columns = ", ".join(key)
+        condition = f"ts IS NOT NULL AND {where}" if where else "ts IS NOT NULL"
+        _move_duplicates(conn, table, key, condition, keep="id")
+        partial = f" WHERE {where}" if where else ""
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_key ON {table}({columns}){partial}")
+        # The unique index leads with ts, so the plain ts index is redundant
+        conn.execute(f"DROP INDEX IF EXISTS idx_{table}_ts")
+
+
+def _v5_rollups(conn):
+    """
+    Adds 1m/1h/1d rollups of every time series, maintained by insert triggers
+    so that every ingest path (daemon, fetch scripts, backfill) keeps them
+    current, and fills them from the rows already stored.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rollup (
+            series TEXT NOT NULL,
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            open_ts INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close_ts INTEGER NOT NULL,
+            close REAL,
+            sum REAL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (series, resolution, bucket)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM rollup")
+    for series, (table, column) in ROLLUP_SERIES.items():
+        upserts = []
+        for resolution in ROLLUP_RESOLUTIONS.values():
+            conn.execute(ROLLUP_UPSERT.format(
+                series=series, resolution=resolution, ts="ts", value=column,
+                source=f"FROM {table} WHERE ts IS NOT NULL AND {column} IS NOT NULL",
+            ))
+            upserts.append(ROLLUP_UPSERT.format(
+                series=series, resolution=resolution, ts="NEW.ts", value=f"NEW.{column}", source="",
+            ).strip())
+        conn.execute(f"DROP TRIGGER IF EXISTS rollup_{series}")
+        conn.execute(f"""
+            CREATE TRIGGER rollup_{series} AFTER INSERT ON {table}
+            WHEN NEW.ts IS NOT NULL AND NEW.{column} IS NOT NULL
+            BEGIN
+                {"; ".join(upserts)};
+            END
+        """)
+
+
+def _v6_market_share_aggregates(conn):
+    """
+    Adds per-snapshot market share totals and per-project hourly/daily volume,
+    updated by a trigger in the same transaction as every market_share insert,
+    and fills them from the rows already stored.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS market_share_snapshot (
+            ts INTEGER NOT NULL,
+            market TEXT NOT NULL,
+            blockchain TEXT NOT NULL,
+            period TEXT NOT NULL,
+            volume_usd REAL NOT NULL,
+            trades INTEGER NOT NULL,
+            projects INTEGER NOT NULL,
+            PRIMARY KEY (ts, market, blockchain, period)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS market_share_project (
+            market TEXT NOT NULL,
+            blockchain TEXT NOT NULL,
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            project TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            volume_usd REAL NOT NULL,
+            trades INTEGER NOT NULL,
+            PRIMARY KEY (market, blockchain, resolution, bucket, project)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM market_share_snapshot")
+    conn.execute("DELETE FROM market_share_project")
+    # Oldest snapshots first, so the newest one ends up owning each bucket
+    for statement in market_share_upserts("", "FROM market_share WHERE ts IS NOT NULL AND volume_usd IS NOT NULL ORDER BY ts, id"):
+        conn.execute(statement)
+
+    conn.execute("DROP TRIGGER IF EXISTS market_share_aggregates")
+    conn.execute(f"""
+        CREATE TRIGGER market_share_aggregates AFTER INSERT ON market_share
+        WHEN NEW.ts IS NOT NULL AND NEW.volume_usd IS NOT NULL
+        BEGIN
+            {"; ".join(statement.strip() for statement in market_share_upserts("NEW.", ""))};
+        END
+    """)
+
+
+def _v7_fetch_state(conn):
+    """
+    Adds per-source HTTP validators and payload hashes used to skip unchanged fetches.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fetch_state (
+            source TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            payload_hash TEXT,
+            checked_ts INTEGER,
+            changed_ts INTEGER
+        )
+    """)
+
+
+def _v8_market_share_series(conn):
+    """
+    Stops rolling up raw market_share rows: summing every project row of every
+    snapshot counted re-reported periods once per fetch. The market share
+    series is now read from market_share_project, which keeps the newest
+    snapshot's volume per reporting period.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS rollup_market_share")
+    conn.execute("DELETE FROM rollup WHERE series = 'market_share'")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_market_share_project_bucket ON market_share_project(resolution, bucket)"
+    )
+
+
+def _v9_market_share_period_key(conn):
+    """
+    Keys market share rows on the reporting period instead of the fetch time.
+
+    Each reporting period keeps the row of the newest snapshot that reported
+    it. Older copies are moved to market_share_duplicates. A trigger removes
+    the period's row when a newer snapshot re-reports it, so INSERT OR IGNORE
+    stores the revision under a new id (which advances data_version) and the
+    aggregate triggers see it. Rows from the same or an older snapshot are
+    still ignored. The aggregates already keep every snapshot and are left
+    as they are.
+    """
+    key, where = UNIQUE_KEYS["market_share"]
+    _move_duplicates(conn, "market_share", key, where, keep="ts DESC, id DESC")
+    conn.execute("DROP INDEX IF EXISTS uq_market_share_key")
+    conn.execute(f"CREATE UNIQUE INDEX uq_market_share_key ON market_share({', '.join(key)}) WHERE {where}")
+
+    same_key = " AND ".join(f"{column} = {new}" for column, new in zip(key, market_share_key("NEW.")))
+    conn.execute("DROP TRIGGER IF EXISTS market_share_revisions")
+    conn.execute(f"""
+        CREATE TRIGGER market_share_revisions BEFORE INSERT ON market_share
+        WHEN NEW.period IS NOT NULL AND NEW.ts IS NOT NULL
+        BEGIN
+            DELETE FROM market_share WHERE {same_key} AND ts < NEW.ts;
+        END
+    """)
+
+
+# Ordered (version, migration) pairs; the applied version is kept in PRAGMA user_version
+MIGRATIONS = (
+    (1, _v1_base_tables),
+    (2, _v2_timestamp_indexes),
+    (3, _v3_epoch_timestamps),
+    (4, _v4_unique_keys),
+    (5, _v5_rollups),
+    (6, _v6_market_share_aggregates),
+    (7, _v7_fetch_state),
+    (8, _v8_market_share_series),
+    (9, _v9_market_share_period_key),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def apply_pragmas(conn):
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def migrate(conn):
+    """
+    Applies every pending migration, each in its own transaction.
+
+    The write lock is taken before the version is re-read, so concurrent
+    processes starting at the same time apply each migration exactly once.
+
+    :param conn: Open SQLite connection.
+    :return: Schema version after migrating.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if target > version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                logging.info(f"✅ Database schema migrated to version {target}.")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        version = target
+    return version
+
+
+def data_version(conn):
+    """
+    Returns a number that increases whenever rows are added to any time-series table.
+
+    :param conn: Open SQLite connection.
+    :return: int
+    """
+    return conn.execute(DATA_VERSION_QUERY).fetchone()[0]
+
+
+def connect(db_path=DB_PATH, check_same_thread=True):
+    """
+    Opens a connection with the standard pragmas applied and the schema up to date.
+
+    :param db_path: Path to the SQLite database.
+    :param check_same_thread: Passed through to sqlite3.connect.
+    :return: sqlite3.Connection
+    """
+    conn = sqlite3.connect(db_path, timeout=5.0, check_same_thread=check_same_thread, cached_statements=256)
+    apply_pragmas(conn)
+    migrate(conn)
+    return conn
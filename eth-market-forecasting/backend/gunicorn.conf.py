@@ -0,0 +1,59 @@
+# Production server settings for the prediction API:
+#   gunicorn -c backend/gunicorn.conf.py backend.api:app
+import os
+import multiprocessing
+
+from backend import metrics
+
+bind = os.getenv("API_BIND", "0.0.0.0:5000")
+
+# Each worker process serves requests on a pool of threads (gthread). SQLite
+# reads and forest inference release the GIL for most of their run time, and
+# inference itself is funneled through the per-process InferenceBatcher.
+workers = int(os.getenv("API_WORKERS", max(2, multiprocessing.cpu_count() // 2)))
+worker_class = "gthread"
+threads = int(os.getenv("API_THREADS", 8))
+
+# Import the app (and deserialize the model) once in the master so workers
+# share those pages copy-on-write; batcher threads start in each worker.
+preload_app = True
+
+timeout = int(os.getenv("API_WORKER_TIMEOUT", 30))
+graceful_timeout = 10
+keepalive = 5
+# Pending connections the kernel holds before refusing new ones
+backlog = int(os.getenv("API_BACKLOG", 256))
+
+accesslog = "-"
+
+# With METRICS_MULTIPROC_DIR set, workers share their metrics through that
+# directory and any worker's /metrics reports the whole server.
+
+
+def on_starting(server):
+    if metrics.METRICS_MULTIPROC_DIR:
+        metrics.clear_snapshots()
+
+
+def when_ready(server):
+    # Model load and other preload timings recorded in the master
+    if metrics.METRICS_MULTIPROC_DIR:
+        metrics.REGISTRY.write_snapshot()
+
+
+def post_fork(server, worker):
+    if not metrics.METRICS_MULTIPROC_DIR:
+        return
+    # The master's counts are already in its own snapshot
+    metrics.REGISTRY.reset()
+    metrics.REGISTRY.start_sync()
+
+
+def worker_exit(server, worker):
+    if metrics.METRICS_MULTIPROC_DIR:
+        metrics.REGISTRY.write_snapshot()
+
+
+def child_exit(server, worker):
+    if metrics.METRICS_MULTIPROC_DIR:
+        metrics.mark_process_dead(worker.pid)
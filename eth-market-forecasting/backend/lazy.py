@@ -0,0 +1,43 @@
+import importlib
+import importlib.util
+import threading
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Used for heavy dependencies (pandas, joblib, pyarrow) that most entry
+    points only need on a code path they may never take, so importing a
+    module does not pay for them up front.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name, optional=False):
+    """
+    Returns a LazyModule for `name`.
+
+    :param optional: Return None instead if the package is not installed;
+                     the check only looks the package up without importing it.
+    """
+    if optional and importlib.util.find_spec(name) is None:
+        return None
+    return LazyModule(name)
@@ -0,0 +1,420 @@
+import os
+import glob
+import json
+import time
+import bisect
+import logging
+import threading
+from functools import wraps
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# With METRICS_ENABLED=false every counter/histogram call returns immediately
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("true", "1", "yes")
+# Batch scripts also write the Prometheus text here at exit (e.g. for a node_exporter textfile collector)
+METRICS_FILE = os.getenv("METRICS_FILE")
+# Directory shared by the processes of one server (e.g. gunicorn workers): each
+# process writes its metrics to <pid>.json there and /metrics serves their sum
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+# Seconds between snapshot writes of each process in multiprocess mode
+METRICS_SYNC_INTERVAL = float(os.getenv("METRICS_SYNC_INTERVAL", 5))
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    escaped = (name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for name, value in key)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    """
+    Monotonic count per label set.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help, registry):
+        self.name = name
+        self.help = help
+        self._registry = registry
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not self._registry.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+    def state(self):
+        with self._lock:
+            return {"kind": self.kind, "help": self.help, "values": [[key, value] for key, value in self._values.items()]}
+
+    def merge(self, state):
+        with self._lock:
+            for key, value in state["values"]:
+                key = tuple(map(tuple, key))
+                self._values[key] = self._values.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    Bucketed distribution (count, sum and cumulative buckets) per label set.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, registry, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._registry = registry
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not self._registry.enabled:
+            return
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """
+        Context manager and decorator observing the elapsed seconds.
+        """
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        samples = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, count))
+        return samples
+
+    def summary(self):
+        """
+        Returns {label key: (count, total seconds)}.
+        """
+        with self._lock:
+            return {key: (count, total) for key, (_, total, count) in self._values.items()}
+
+    def state(self):
+        with self._lock:
+            values = [[key, [list(counts), total, count]] for key, (counts, total, count) in self._values.items()]
+        return {"kind": self.kind, "help": self.help, "buckets": self.buckets, "values": values}
+
+    def merge(self, state):
+        with self._lock:
+            for key, (counts, total, count) in state["values"]:
+                key = tuple(map(tuple, key))
+                current = self._values.get(key)
+                if current is None:
+                    current = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                current[0] = [a + b for a, b in zip(current[0], counts)]
+                current[1] += total
+                current[2] += count
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        if self.histogram._registry.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, function):
+        histogram, labels = self.histogram, self.labels
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Timer(histogram, labels):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of counters and histograms, rendered in the Prometheus
+    text format.
+
+    Collectors are callables returning (name, kind, help, [(labels, value)])
+    tuples, read at render time, for state other components already count
+    themselves (cache and batcher stats).
+
+    With a `multiproc_dir`, every process of a server writes a snapshot of its
+    metrics and collector values to <multiproc_dir>/<pid>.json (at most
+    `sync_interval` seconds old, see start_sync) and render() returns the sum
+    over all snapshots, so any worker can answer a scrape for the whole server.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, multiproc_dir=METRICS_MULTIPROC_DIR,
+                 sync_interval=METRICS_SYNC_INTERVAL):
+        self.enabled = enabled
+        self.multiproc_dir = multiproc_dir
+        self.sync_interval = sync_interval
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._sync_pid = None
+
+    def _get(self, cls, name, help, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, self, **kwargs)
+            return metric
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _collect(self):
+        """
+        Runs the collectors; a failing one is logged and skipped.
+        """
+        with self._lock:
+            collectors = list(self._collectors)
+        collected = []
+        for collector in collectors:
+            try:
+                collected.extend(collector())
+            except Exception as e:
+                logging.error(f"❌ Metrics collector failed: {e}")
+        return collected
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format; in
+        multiprocess mode, summed over the snapshots of all processes.
+        """
+        if self.multiproc_dir:
+            self.write_snapshot()
+            return merge_snapshots(self.multiproc_dir).render()
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, kind, help, values in self._collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Returns this process's metrics and collector values as JSON-serializable data.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "metrics": {metric.name: metric.state() for metric in metrics},
+            "collected": [
+                [name, kind, help, [[_label_key(labels), value] for labels, value in values]]
+                for name, kind, help, values in self._collect()
+            ],
+        }
+
+    def write_snapshot(self):
+        """
+        Writes snapshot() to <multiproc_dir>/<pid>.json, atomically.
+        """
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        path = os.path.join(self.multiproc_dir, f"{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        """
+        Drops every recorded value; called in a freshly forked worker so it
+        does not report the parent's counts a second time.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def start_sync(self):
+        """
+        Starts a daemon thread writing this process's snapshot every
+        sync_interval seconds (once per process; a no-op without multiproc_dir).
+        """
+        with self._lock:
+            if not self.multiproc_dir or self._sync_pid == os.getpid():
+                return
+            self._sync_pid = os.getpid()
+        threading.Thread(target=self._sync, name="metrics-sync", daemon=True).start()
+
+    def _sync(self):
+        while True:
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logging.error(f"❌ Failed to write metrics snapshot: {e}")
+            time.sleep(self.sync_interval)
+
+    def dump(self, path=METRICS_FILE):
+        """
+        Logs a one-line summary per metric and label set, and writes the
+        Prometheus text to `path` if one is configured. Called at the end of batch scripts.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                for key, (count, total) in sorted(metric.summary().items()):
+                    logging.info(
+                        f"📏 {metric.name}{_format_labels(key)}: n={count} "
+                        f"total={total:.3f}s avg={total / count * 1000:.2f}ms"
+                    )
+            else:
+                for _, key, value in metric.samples():
+                    logging.info(f"📏 {metric.name}{_format_labels(key)}: {value}")
+        if path:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as file:
+                file.write(self.render())
+            os.replace(tmp_path, path)
+
+
+def _read_snapshots(directory):
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠ Skipping metrics snapshot {path}: {e}")
+    return snapshots
+
+
+def merge_snapshots(directory):
+    """
+    Sums the snapshots in `directory` into a new registry: counters and
+    histograms per label set, collector values per name and label set.
+    """
+    merged = MetricsRegistry(enabled=True, multiproc_dir=None)
+    collected = {}
+    for snapshot in _read_snapshots(directory):
+        for name, state in snapshot["metrics"].items():
+            if state["kind"] == "histogram":
+                merged.histogram(name, state["help"], tuple(state["buckets"])).merge(state)
+            else:
+                merged.counter(name, state["help"]).merge(state)
+        for name, kind, help, values in snapshot["collected"]:
+            entry = collected.setdefault(name, (kind, help, {}))
+            for key, value in values:
+                key = tuple(map(tuple, key))
+                entry[2][key] = entry[2].get(key, 0) + value
+    merged.register_collector(lambda: [
+        (name, kind, help, [(dict(key), value) for key, value in sorted(values.items())])
+        for name, (kind, help, values) in sorted(collected.items())
+    ])
+    return merged
+
+
+def mark_process_dead(pid, directory=METRICS_MULTIPROC_DIR):
+    """
+    Drops the gauges from an exited process's snapshot. Its counters and
+    histograms stay in the sum, so server totals do not go backwards.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    if not os.path.exists(path):
+        return
+    with open(path) as file:
+        snapshot = json.load(file)
+    snapshot["collected"] = [entry for entry in snapshot["collected"] if entry[1] != "gauge"]
+    with open(path + ".tmp", "w") as file:
+        json.dump(snapshot, file)
+    os.replace(path + ".tmp", path)
+
+
+def clear_snapshots(directory=METRICS_MULTIPROC_DIR):
+    """
+    Removes the snapshots of a previous server run.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name, help=""):
+    """
+    Returns the process-wide counter `name`, creating it on first use.
+    """
+    return REGISTRY.counter(name, help)
+
+
+def histogram(name, help="", buckets=DEFAULT_BUCKETS):
+    """
+    Returns the process-wide histogram `name`, creating it on first use.
+    """
+    return REGISTRY.histogram(name, help, buckets)
+
+
+def dump(path=METRICS_FILE):
+    REGISTRY.dump(path)
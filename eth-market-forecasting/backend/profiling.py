@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import random
+import cProfile
+import logging
+import threading
+import itertools
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+MODES = ("cprofile", "sample", "all")
+
+
+def parse_mode(value):
+    """
+    Validates a PROFILE value; anything but "" or one of MODES (e.g. "1" or
+    "true") is logged and turns profiling off.
+    """
+    value = (value or "").strip().lower()
+    if value and value not in MODES:
+        logging.warning(f"⚠ Ignoring PROFILE={value!r}: expected one of {', '.join(MODES)}. Profiling is off.")
+        return ""
+    return value
+
+
+# "" (off), "cprofile" (deterministic, .pstats), "sample" (wall-clock stack
+# sampling, .collapsed) or "all" (both at once)
+PROFILE_MODE = parse_mode(os.getenv("PROFILE"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Fraction of /api/predict and /api/market-data requests profiled when PROFILE is set
+PROFILE_API_RATE = float(os.getenv("PROFILE_API_RATE", 0.01))
+# Seconds between stack samples
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+
+_run_ids = itertools.count()
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples one thread's call stack every `interval` seconds from a background
+    thread and counts identical stacks.
+
+    The result is wall-clock time: a thread blocked on I/O or a lock keeps
+    being sampled in the blocking call, which is what makes stalls visible.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            del frame
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        """
+        Writes the stacks in the collapsed format read by flamegraph.pl,
+        speedscope and inferno: one "root;...;leaf count" line per stack.
+        """
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class ProfileRun:
+    """
+    One profiled block: starts the profilers for `mode` on the calling thread
+    and writes their artifacts to `directory` when stopped.
+    """
+
+    def __init__(self, name, mode, directory=PROFILE_DIR, interval=PROFILE_SAMPLE_INTERVAL):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.name = name
+        self.mode = mode
+        self.directory = directory
+        self.profiler = cProfile.Profile() if mode in ("cprofile", "all") else None
+        self.sampler = StackSampler(interval=interval) if mode in ("sample", "all") else None
+        self.paths = []
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.sampler is not None:
+            self.sampler.start()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        """
+        Stops profiling and writes <name>-<UTC time>-<pid>-<n>.pstats / .collapsed.
+
+        :return: List of written paths.
+        """
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+        seconds = time.perf_counter() - self._start
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        base = os.path.join(self.directory, f"{self.name}-{stamp}-{os.getpid()}-{next(_run_ids)}")
+        if self.profiler is not None:
+            self.profiler.dump_stats(base + ".pstats")
+            self.paths.append(base + ".pstats")
+        if self.sampler is not None:
+            self.sampler.write(base + ".collapsed")
+            self.paths.append(base + ".collapsed")
+        logging.info(f"🔬 Profiled {self.name} ({seconds:.3f}s): {', '.join(self.paths)}")
+        return self.paths
+
+
+@contextmanager
+def profile(name, mode=None, directory=None):
+    """
+    Profiles the enclosed block when `mode` (default: PROFILE) is set.
+
+    :param name: Prefix of the artifact files, e.g. "train_model".
+    :param mode: "cprofile", "sample", "all", or empty to do nothing.
+    :param directory: Output directory (default: PROFILE_DIR).
+    :return: The ProfileRun, or None when profiling is off.
+    """
+    mode = PROFILE_MODE if mode is None else mode
+    if not mode:
+        yield None
+        return
+    run = ProfileRun(name, mode, directory or PROFILE_DIR)
+    run.start()
+    try:
+        yield run
+    finally:
+        run.stop()
+
+
+def profiled_request(name):
+    """
+    Decorator for Flask views: profiles a PROFILE_API_RATE fraction of calls.
+
+    Mode, rate and directory come from PROFILE, PROFILE_API_RATE and
+    PROFILE_DIR at import. Only the request thread is profiled; work handed to
+    the inference batcher shows up as the wait for its result.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not PROFILE_MODE or random.random() >= PROFILE_API_RATE:
+                return view(*args, **kwargs)
+            with profile(name, PROFILE_MODE, PROFILE_DIR):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_profile_argument(parser):
+    """
+    Adds --profile [MODE] to a script's argument parser; without a value it
+    runs both profilers. Defaults to the PROFILE environment variable, which
+    parse_mode() has already checked (argparse does not check defaults
+    against choices).
+    """
+    parser.add_argument("--profile", nargs="?", const="all", default=PROFILE_MODE, choices=("",) + MODES,
+                        help=f"Profile the run and write artifacts to PROFILE_DIR ({PROFILE_DIR})")
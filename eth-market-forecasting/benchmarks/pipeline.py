@@ -0,0 +1,208 @@
+"""
+End-to-end pipeline benchmark on synthetic data.
+
+For each history length a fresh database is filled by benchmarks.synthetic
+and every stage is timed: backfill ingest, load_data (as-of join),
+preprocess_data, train_and_evaluate, pickle vs. compact model load and
+single-row predict, fetch_latest_data and /api/predict through the Flask
+test client. No network access is needed. Run from the
+eth-market-forecasting directory:
+
+    python -m benchmarks.pipeline --days 1 7 30 --output benchmarks/pipeline.json
+    python -m benchmarks.pipeline --days 1 7 30 --compare benchmarks/pipeline.json --check
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import subprocess
+from functools import partial
+
+import numpy as np
+
+from benchmarks.synthetic import populate
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+DEFAULT_DAYS = (1, 7, 30)
+DEFAULT_REQUESTS = 200
+
+# A stage counts as a regression when it is this much slower than the baseline
+COMPARE_TOLERANCE = float(os.getenv("BENCHMARK_TOLERANCE", 1.25))
+
+
+def timed(function, *args, **kwargs):
+    """
+    Calls `function` and returns (result, seconds).
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latency_summary(samples):
+    """
+    Returns p50/p99 in milliseconds for a list of durations in seconds.
+    """
+    p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+    return float(p50), float(p99)
+
+
+def api_client(db_path, model_path):
+    """
+    Points the API module at a benchmark database and model and returns a Flask test client.
+    """
+    from backend import api
+    from backend.ai_model import model_utils
+    from backend.ai_model.prediction_cache import PredictionCache
+    from backend.ai_model.registry import ModelRegistry
+
+    api.registry = ModelRegistry(model_path)
+    api.cache = PredictionCache()
+    api.fetch_latest_data = partial(model_utils.fetch_latest_data, db_path=db_path)
+    api.fetch_data_version = partial(model_utils.fetch_data_version, db_path=db_path)
+    return api.app.test_client(), api.cache
+
+
+def bench_size(days, workdir, resolution=60, seed=0, requests=DEFAULT_REQUESTS):
+    """
+    Benchmarks every stage on `days` of synthetic history.
+
+    :return: Dictionary with the row counts and stage timings.
+    """
+    import joblib
+    from backend.ai_model import model_utils, train_model
+    from backend.ai_model.compact import compact_path, export_model
+    from backend.ai_model.registry import artifact_version
+
+    db_path = os.path.join(workdir, f"market_data_{days}d.db")
+    model_path = os.path.join(workdir, f"model_{days}d.pkl")
+    stages = {}
+
+    reports, stages["ingest_s"] = timed(populate, db_path, days, resolution, seed)
+    rows = {table: report["rows_inserted"] for table, report in reports.items()}
+    stages["ingest_rows_per_sec"] = sum(rows.values()) / stages["ingest_s"]
+
+    train_model.DB_PATH = db_path
+    df, stages["load_data_s"] = timed(train_model.load_data)
+    split, stages["preprocess_s"] = timed(train_model.preprocess_data, df)
+    model, stages["train_s"] = timed(train_model.train_and_evaluate, *split)
+    joblib.dump(model, model_path)
+    export_model(model, compact_path(model_path), source_version=artifact_version(model_path))
+    stages["artifact_pickle_mb"] = os.path.getsize(model_path) / 1e6
+    stages["artifact_compact_mb"] = os.path.getsize(compact_path(model_path)) / 1e6
+    pickled, stages["model_load_pickle_ms"] = timed(model_utils.load_model, model_path)
+    compacted, stages["model_load_compact_ms"] = timed(model_utils.load_model, compact_path(model_path))
+    stages["model_load_pickle_ms"] *= 1000
+    stages["model_load_compact_ms"] *= 1000
+
+    # Cold: first call loads HISTORY ticks into the ring buffers; warm: no new rows
+    model_utils._online_features.pop(db_path, None)
+    _, cold = timed(model_utils.fetch_latest_data, db_path)
+    warm = [timed(model_utils.fetch_latest_data, db_path)[1] for _ in range(20)]
+    stages["fetch_latest_cold_ms"] = cold * 1000
+    stages["fetch_latest_warm_ms"] = float(np.median(warm)) * 1000
+
+    row = model_utils.align_features(pickled, model_utils.fetch_latest_data(db_path))
+    for name, loaded in (("pickle", pickled), ("compact", compacted)):
+        loaded.predict(row)
+        samples = [timed(loaded.predict, row)[1] for _ in range(50)]
+        stages[f"predict_row_{name}_ms"] = float(np.median(samples)) * 1000
+
+    client, cache = api_client(db_path, model_path)
+    client.get("/api/predict")  # loads the model and starts the inference workers
+    uncached = []
+    for _ in range(requests):
+        cache.clear()
+        response, seconds = timed(client.get, "/api/predict")
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+        uncached.append(seconds)
+    cached = [timed(client.get, "/api/predict")[1] for _ in range(requests)]
+    stages["predict_p50_ms"], stages["predict_p99_ms"] = latency_summary(uncached)
+    stages["predict_cached_p50_ms"], stages["predict_cached_p99_ms"] = latency_summary(cached)
+
+    logging.info(
+        f"📊 {days}d ({rows['eth_price']} ticks): ingest {stages['ingest_rows_per_sec']:.0f} rows/s, "
+        f"load_data {stages['load_data_s']:.2f}s, train {stages['train_s']:.2f}s, "
+        f"model load {stages['model_load_pickle_ms']:.0f}ms -> {stages['model_load_compact_ms']:.0f}ms compact, "
+        f"predict p50 {stages['predict_p50_ms']:.2f}ms p99 {stages['predict_p99_ms']:.2f}ms"
+    )
+    return {"days": days, "resolution": resolution, "rows": rows, "stages": stages}
+
+
+def run(days=DEFAULT_DAYS, resolution=60, seed=0, requests=DEFAULT_REQUESTS, workdir=None):
+    """
+    Benchmarks each history length in its own database.
+
+    :return: List of per-size results.
+    """
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        return [bench_size(d, directory, resolution, seed, requests) for d in days]
+
+
+def compare(baseline, results, tolerance=COMPARE_TOLERANCE):
+    """
+    Compares stage timings with a previous run of the same sizes.
+
+    Throughput (`*_per_sec`) regresses when it drops, every other stage when it grows.
+
+    :return: List of (days, stage, ratio) for stages worse than `tolerance`.
+    """
+    previous = {entry["days"]: entry["stages"] for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        for stage, value in entry["stages"].items():
+            old = previous.get(entry["days"], {}).get(stage)
+            if not old or not value:
+                continue
+            ratio = old / value if stage.endswith("_per_sec") else value / old
+            flag = "❌" if ratio > tolerance else "✅"
+            logging.info(f"{flag} {entry['days']}d {stage}: {old:.4g} -> {value:.4g} ({ratio:.2f}x)")
+            if ratio > tolerance:
+                regressions.append((entry["days"], stage, ratio))
+    return regressions
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest, training and serving on synthetic data.")
+    parser.add_argument("--days", type=float, nargs="+", default=list(DEFAULT_DAYS), help="History lengths to test")
+    parser.add_argument("--resolution", type=int, default=60, help="Seconds between price ticks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="/api/predict requests per size")
+    parser.add_argument("--workdir", help="Directory for the temporary databases (default: system temp)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any stage regressed")
+    args = parser.parse_args()
+
+    results = run(args.days, args.resolution, args.seed, args.requests, args.workdir)
+    report = {
+        "python": sys.version.split()[0],
+        "commit": git_commit(),
+        "config": {"resolution": args.resolution, "seed": args.seed, "requests": args.requests},
+        "results": results,
+    }
+    regressions = []
+    if args.compare:
+        # Read before --output, which may overwrite the same file
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        logging.info(f"✅ Results saved to {args.output}")
+    if args.check and regressions:
+        sys.exit(1)
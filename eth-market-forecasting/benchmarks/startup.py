@@ -0,0 +1,138 @@
+"""
+Import-time benchmark for the project's entry points.
+
+Every entry point is imported in a fresh interpreter with `python -X importtime`
+so the numbers reflect a cold start (cron job, new API worker). Run from the
+eth-market-forecasting directory:
+
+    python -m benchmarks.startup --runs 5 --output benchmarks/startup.json --check
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import statistics
+import subprocess
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point -> import-time budget in seconds (module import only, excluding interpreter startup)
+ENTRY_POINTS = {
+    "backend.data_pipeline.fetch_data": 0.3,
+    "backend.data_pipeline.backfill": 0.3,
+    "backend.data_pipeline.ingest_daemon": 0.5,
+    "backend.ai_model.predict": 0.3,
+    "backend.ai_model.train_model": 3.0,
+    "backend.api": 0.5,
+    "frontend.dashboard": 2.0,
+}
+
+# Third-party packages whose presence at import time is reported per entry point
+HEAVY_MODULES = ("numpy", "pandas", "sklearn", "scipy", "joblib", "flask", "dash", "plotly", "aiohttp", "pyarrow")
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output.
+
+    :param stderr: Interpreter stderr.
+    :return: Tuple (total seconds of top-level imports, {module: cumulative seconds}).
+    """
+    cumulative = {}
+    total = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            seconds = int(cumulative_us) / 1e6
+        except ValueError:
+            continue  # header row
+        raw_name = line.rsplit("|", 1)[1]
+        # Nested imports are indented by two spaces per level
+        if len(raw_name) - len(raw_name.lstrip()) <= 1:
+            total += seconds
+        cumulative[name] = max(seconds, cumulative.get(name, 0.0))
+    return total, cumulative
+
+
+def measure(module, runs=5):
+    """
+    Imports `module` in `runs` fresh interpreters.
+
+    :return: Dictionary with wall/import times, loaded heavy packages and the slowest imports.
+    """
+    walls, imports, cumulative = [], [], {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        # -X importtime also lists failed optional imports, so loaded packages come from sys.modules
+        probe = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", probe],
+            cwd=PROJECT_DIR, capture_output=True, text=True,
+        )
+        walls.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed"
+            return {"module": module, "error": error}
+        total, cumulative = parse_importtime(result.stderr)
+        imports.append(total)
+        heavy = sorted(filter(None, result.stdout.strip().split(",")))
+
+    slowest = sorted(
+        ((name, seconds) for name, seconds in cumulative.items() if "." not in name and name != module.split(".")[0]),
+        key=lambda item: item[1], reverse=True,
+    )[:5]
+    return {
+        "module": module,
+        "wall_s": statistics.median(walls),
+        "import_s": statistics.median(imports),
+        "heavy_modules": heavy,
+        "slowest": [{"module": name, "seconds": seconds} for name, seconds in slowest],
+    }
+
+
+def run(entry_points=None, runs=5):
+    """
+    Measures every entry point and compares it with its budget.
+
+    :return: List of result dictionaries.
+    """
+    results = []
+    for module, budget in (entry_points or ENTRY_POINTS).items():
+        result = measure(module, runs)
+        result["budget_s"] = budget
+        if "error" in result:
+            logging.warning(f"⚠ {module}: {result['error']}")
+        else:
+            result["over_budget"] = result["import_s"] > budget
+            flag = "❌" if result["over_budget"] else "✅"
+            logging.info(
+                f"{flag} {module}: import {result['import_s']:.3f}s (budget {budget}s), "
+                f"wall {result['wall_s']:.3f}s, heavy: {', '.join(result['heavy_modules']) or '-'}"
+            )
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold import time of each entry point.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any entry point is over budget")
+    parser.add_argument("modules", nargs="*", help="Entry points to measure (default: all)")
+    args = parser.parse_args()
+
+    selected = {m: ENTRY_POINTS.get(m, float("inf")) for m in args.modules} if args.modules else None
+    results = run(selected, args.runs)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"python": sys.version.split()[0], "runs": args.runs, "results": results}, file, indent=2)
+        logging.info(f"✅ Results saved to {args.output}")
+    if args.check and any(r.get("over_budget") for r in results):
+        sys.exit(1)
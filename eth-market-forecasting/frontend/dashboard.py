@@ -1,69 +1,98 @@
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
-from .config import DEBUG
+from dash.dependencies import Input, Output, State
+from .config import DEBUG, DASHBOARD_UPDATE_INTERVAL
 import plotly.graph_objs as go
 import logging
-from backend.ai_model.predict import predict_eth_price
+from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Points kept in each browser's chart
+MAX_POINTS = 500
+
 # Initialize Dash app
 app = dash.Dash(__name__)
 
+LAYOUT = go.Layout(
+    title='📊 Real-Time ETH Price Forecast',
+    xaxis={'title': 'Time'},
+    yaxis={'title': 'ETH Price (USD)'},
+    template="plotly_dark"
+)
+
+
+def columns(points):
+    """
+    Splits feed points into the x values and the actual/predicted y values.
+    """
+    x = [datetime.fromtimestamp(point["timestamp"]) for point in points]
+    return x, [point["actual"] for point in points], [point["predicted"] for point in points]
+
+
+def build_figure(points):
+    """
+    Full figure with the actual and predicted series.
+    """
+    x, actual, predicted = columns(points)
+    return {
+        'data': [
+            go.Scatter(x=x, y=actual, mode='lines', name='Actual ETH Price', line=dict(color='white')),
+            go.Scatter(x=x, y=predicted, mode='lines', name='Predicted ETH Price', line=dict(color='blue', dash='dot')),
+        ],
+        'layout': LAYOUT
+    }
+
 # Define the Dash app layout
 app.layout = html.Div([
     html.H1("📈 Ethereum Market Forecasting Dashboard", style={'textAlign': 'center'}),
-    dcc.Graph(id='eth-prediction-graph'),
+    dcc.Graph(id='eth-prediction-graph', figure=build_figure([])),
     dcc.Interval(
         id='interval-update',
-        interval=60000,  # Refresh every 60 seconds
+        interval=DASHBOARD_UPDATE_INTERVAL,
         n_intervals=0
     ),
+    # Per-browser cursor into the feed: {"generation": ..., "seq": ...}
+    dcc.Store(id='feed-cursor'),
     html.Div(id='prediction-output', style={'textAlign': 'center', 'fontSize': 24, 'marginTop': 20})
 ])
 
-# Callback to update the graph and prediction output in real time
+
+# Sends each browser only the points it has not seen yet
 @app.callback(
-    [Output('eth-prediction-graph', 'figure'),
+    [Output('eth-prediction-graph', 'extendData'),
+     Output('eth-prediction-graph', 'figure'),
+     Output('feed-cursor', 'data'),
      Output('prediction-output', 'children')],
-    [Input('interval-update', 'n_intervals')]
+    [Input('interval-update', 'n_intervals')],
+    [State('feed-cursor', 'data')]
 )
-def update_graph(n):
+def update_graph(n, cursor):
     """
-    Updates the dashboard with real-time ETH price predictions.
+    Extends the chart with new points from the shared prediction feed.
+
+    Predictions are computed once per tick by the feed's background thread,
+    not per browser session.
     """
-    logging.info("🔄 Fetching latest ETH price prediction...")
-    
-    # Predict ETH price using live data
-    predicted_price = predict_eth_price()
-    if predicted_price is None:
-        logging.error("❌ Failed to generate prediction.")
-        return {
-            'data': [],
-            'layout': go.Layout(title="Error: No prediction available")
-        }, "❌ Prediction Unavailable"
-
-    # Create a bar graph to display the predicted ETH price
-    figure = {
-        'data': [
-            go.Bar(
-                x=['Now'],
-                y=[predicted_price],
-                marker=dict(color='blue'),
-                name='Predicted ETH Price'
-            )
-        ],
-        'layout': go.Layout(
-            title='📊 Real-Time ETH Price Forecast',
-            xaxis={'title': 'Time'},
-            yaxis={'title': 'Predicted ETH Price (USD)'},
-            template="plotly_dark"
-        )
-    }
+    # Imported on first use so starting the dashboard does not load the model stack
+    from backend.ai_model.feed import get_feed
+
+    cursor = cursor or {}
+    delta = get_feed().delta(cursor.get("seq", 0), cursor.get("generation"))
+    new_cursor = {"generation": delta["generation"], "seq": delta["cursor"]}
+    forecast = delta["forecast"]
+    text = f"📊 Predicted ETH Price: ${forecast:.2f}" if forecast is not None else "❌ Prediction Unavailable"
+
+    if delta["reset"]:
+        # First load or a new model: replace the whole series
+        return dash.no_update, build_figure(delta["points"]), new_cursor, text
+    if not delta["points"]:
+        return dash.no_update, dash.no_update, new_cursor, text
 
-    return figure, f"📊 Predicted ETH Price: ${predicted_price:.2f}"
+    # Append to both traces, keeping at most MAX_POINTS in the browser
+    x, actual, predicted = columns(delta["points"])
+    return ({'x': [x, x], 'y': [actual, predicted]}, [0, 1], MAX_POINTS), dash.no_update, new_cursor, text
 
 if __name__ == '__main__':
     app.run_server(debug=DEBUG)
@@ -5,7 +5,7 @@ Write-Host "🚀 Starting Ethereum Market Forecasting System..."
 
 # Run data pipeline
 Write-Host "📡 Fetching live ETH data..."
-python backend/data_pipeline/fetch_data.py
+python -m backend.data_pipeline.fetch_data
 
 # Train the model (only first-time or when retraining)
 Write-Host "🤖 Training AI model..."
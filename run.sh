@@ -5,8 +5,8 @@ echo "Setting up environment..."
 pip install -r backend/requirements.txt
 
 echo "Starting data pipeline..."
-# Run data fetching in the background; consider using a scheduler (e.g., cron) for production
-python backend/data_pipeline/fetch_data.py &
+# Long-running ingestion service; polls each source on its own schedule
+python -m backend.data_pipeline.ingest_daemon &
 
 echo "Training AI model..."
 python backend/ai_model/train_model.py
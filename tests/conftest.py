@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.3
+    failures = {}
+    # Paths answered with status 200 and a body that is not JSON
+    malformed = set()
+    # Requests inside the handler's delay right now, and the most seen at once
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StubHandler.lock:
+            StubHandler.in_flight += 1
+            StubHandler.max_in_flight = max(StubHandler.max_in_flight, StubHandler.in_flight)
+        time.sleep(self.delay)
+        # Left before responding, so a client cannot start its next request first
+        with StubHandler.lock:
+            StubHandler.in_flight -= 1
+        remaining = StubHandler.failures.get(self.path.split('?')[0], 0)
+        if remaining:
+            StubHandler.failures[self.path.split('?')[0]] = remaining - 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if self.path.startswith('/api/v1/marketshare/'):
+            market, chain = self.path.split('/')[-2:]
+            body = {"result": {"rows": [{"market": market, "blockchain": chain, "volume_usd": 1.0}]}}
+        elif self.path.startswith('/api?'):
+            body = {"status": "1", "result": {"SafeGasPrice": "10", "ProposeGasPrice": "20", "FastGasPrice": "30"}}
+        else:
+            # Only the TVL endpoint supports conditional requests
+            if self.headers.get('If-None-Match') == '"tvl-1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = 123.4
+        payload = b'<html>Bad gateway</html>' if self.path.split('?')[0] in StubHandler.malformed else json.dumps(body).encode()
+        self.send_response(200)
+        if self.path.startswith('/tvl/'):
+            self.send_header('ETag', '"tvl-1"')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_handler():
+    """
+    The stub server's handler class, for tests that set its delay and
+    failures or read its in-flight counters.
+    """
+    return StubHandler
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.max_in_flight = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield {"market_share": base, "gas_price": base, "tvl": base}
+    server.shutdown()
+    StubHandler.failures = {}
+    StubHandler.malformed = set()
+
+
+@pytest.fixture
+def synthetic_arrays():
+    """
+    Factory for a deterministic (X, y) training set of `rows` hourly ticks
+    whose price is driven by volume.
+    """
+    np = pytest.importorskip('numpy')
+    pd = pytest.importorskip('pandas')
+    from backend.ai_model.features import build_training_set
+
+    def make(rows=240):
+        rng = np.random.default_rng(0)
+        volume = rng.uniform(1e6, 2e6, rows)
+        frame = pd.DataFrame({
+            "timestamp": 1704067200 + 3600 * np.arange(rows),
+            "price": 2000 + volume / 1e4 + rng.normal(0, 1, rows),
+            "volume_usd": volume,
+            "gas_price": rng.uniform(5, 50, rows),
+            "tvl": rng.uniform(1e9, 2e9, rows),
+        })
+        X, y = build_training_set(frame)
+        return X.to_numpy(dtype=np.float64), y.to_numpy()
+    return make
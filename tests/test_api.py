@@ -0,0 +1,153 @@
+import io
+from functools import partial
+
+import joblib
+import numpy as np
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('flask_cors')
+pytest.importorskip('sklearn')
+
+from sklearn.ensemble import RandomForestRegressor
+
+from backend import api
+from backend.ai_model import model_utils
+from backend.ai_model.features import HISTORY, build_training_set, compute_features
+from backend.ai_model.prediction_cache import PredictionCache
+from backend.ai_model.registry import ModelRegistry
+from backend.data_pipeline.asof import load_asof_frame
+from backend.data_pipeline.backfill import backfill
+from backend.data_pipeline.rollup import fetch_range
+from backend.data_pipeline.schema import connect
+
+START = 1704067200
+ROWS = HISTORY + 30
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'market_data.db')
+    conn = connect(db_path)
+    rng = np.random.default_rng(1)
+    prices = 2000 * np.exp(np.cumsum(rng.normal(0, 0.01, ROWS)))
+    backfill("eth_price", [(START + 3600 * i, p) for i, p in enumerate(prices)], conn=conn)
+    backfill("gas_price", [(START + 3600 * i, 1, 10 + i % 5, 30) for i in range(ROWS)], conn=conn)
+    frame = load_asof_frame(conn)
+    conn.close()
+
+    X, y = build_training_set(frame)
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    joblib.dump(model, str(tmp_path / 'model.pkl'))
+    monkeypatch.setattr(api, 'registry', ModelRegistry(str(tmp_path / 'model.pkl')))
+    monkeypatch.setattr(api, 'cache', PredictionCache(ttl=60))
+    monkeypatch.setattr(api, 'fetch_data_version', lambda: 1)
+    monkeypatch.setattr(api, 'fetch_features_at', partial(model_utils.fetch_features_at, db_path=db_path))
+    monkeypatch.setattr(api, 'forecast_horizon', partial(model_utils.forecast_horizon, db_path=db_path))
+    monkeypatch.setattr(api, 'fetch_range', partial(fetch_range, db_path=db_path))
+    return api.app.test_client(), model, frame
+
+
+def test_batch_matches_row_by_row_predictions(client):
+    client, model, frame = client
+    requested = [START + 3600 * (ROWS - 1) + 60, START, START + 3600 * HISTORY]
+
+    body = client.post('/api/predict/batch', json={"timestamps": requested}).get_json()
+
+    features = compute_features(frame)
+    expected = model.predict(features.iloc[[ROWS - 1, HISTORY]])
+    assert body["timestamps"] == requested
+    assert body["predicted_prices"][1] is None  # no window history yet
+    np.testing.assert_allclose([body["predicted_prices"][0], body["predicted_prices"][2]], expected)
+
+
+def test_batch_npy_response_round_trips(client):
+    client, _, _ = client
+    response = client.get(f'/api/predict/batch?timestamps={START + 3600 * HISTORY},{START}&format=npy')
+
+    table = np.load(io.BytesIO(response.data))
+    assert response.mimetype == "application/octet-stream"
+    assert table.dtype == api.NPY_DTYPE
+    assert table["timestamp"].tolist() == [START + 3600 * HISTORY, START]
+    assert np.isfinite(table["predicted_price"][0]) and np.isnan(table["predicted_price"][1])
+
+
+def test_horizon_forecasts_future_ticks(client, monkeypatch):
+    client, _, _ = client
+    body = client.get('/api/predict/batch?horizon=5').get_json()
+
+    last = START + 3600 * (ROWS - 1)
+    assert body["timestamps"] == [last + 3600 * step for step in range(1, 6)]
+    assert all(isinstance(price, float) for price in body["predicted_prices"])
+
+    monkeypatch.setattr(api, 'pa', None)
+    assert client.get('/api/predict/batch?horizon=5&format=arrow').status_code == 406
+    assert client.get(f'/api/predict/batch?horizon={api.MAX_HORIZON + 1}').status_code == 400
+
+
+def test_saturated_inference_pool_returns_503(client, monkeypatch):
+    client, _, _ = client
+
+    class FullBatcher:
+        def predict(self, features):
+            raise api.Overloaded("Inference queue is full")
+
+    monkeypatch.setattr(api, 'batcher', FullBatcher())
+    response = client.get(f'/api/predict/batch?timestamps={START + 3600 * HISTORY}')
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == api.RETRY_AFTER
+
+
+def test_prediction_stream_returns_feed_delta(client, monkeypatch):
+    client, _, _ = client
+    calls = []
+
+    class Feed:
+        def delta(self, since, generation):
+            calls.append((since, generation))
+            return {"generation": 1, "reset": False, "points": [], "cursor": since, "forecast": None}
+
+    monkeypatch.setattr(api, 'get_feed', lambda: Feed())
+    assert client.get('/api/predictions?since=7&generation=1').get_json()["cursor"] == 7
+    assert client.get('/api/predictions?since=x').status_code == 400
+    assert calls == [(7, 1)]
+
+
+def test_history_returns_downsampled_buckets(client):
+    client, _, frame = client
+    body = client.get(f'/api/history/eth_price?start={START}&end={START + 3600 * ROWS}&points=10').get_json()
+
+    assert len(body["timestamps"]) <= 10
+    assert sum(body["count"]) == ROWS
+    assert max(body["high"]) == pytest.approx(frame["price"].max())
+    assert client.get('/api/history/unknown').status_code == 400
+    assert client.get('/api/history/eth_price?points=1').status_code == 400
+
+
+def test_market_data_keeps_its_response_fields(client, monkeypatch):
+    client, _, frame = client
+    X, _ = build_training_set(frame)
+    monkeypatch.setattr(api, 'latest_features', lambda version: X.to_numpy()[-1:])
+
+    response = client.get('/api/market-data')
+
+    assert response.status_code == 200
+    assert set(response.get_json()) == {"timestamp", "volume_usd", "gas_price"}
+    assert response.get_json()["timestamp"] == X["timestamp"].iloc[-1]
+
+
+def test_metrics_endpoint_reports_requests_and_errors(client):
+    client, _, _ = client
+    client.post('/api/predict/batch', json={"timestamps": [START + 3600 * (ROWS - 1)]})
+    client.get('/api/predict/batch?format=xml')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'api_request_seconds_count{endpoint="/api/predict/batch"}' in body
+    assert 'api_errors_total{endpoint="/api/predict/batch",status="400"}' in body
+    assert 'predict_seconds_count{caller="batcher"}' in body
+    assert 'prediction_cache_lookups_total{result="hits"}' in body
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip('pandas')
+
+from backend.data_pipeline.schema import connect
+from backend.data_pipeline.asof import load_asof_frame, load_latest_row
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'market_data.db'))
+    conn.executemany("INSERT INTO eth_price (ts, price) VALUES (?, ?)", [
+        (0, 100.0),
+        (3600, 101.0),
+        (7200, 102.0),
+    ])
+    conn.executemany("INSERT INTO market_share (ts, project, volume_usd) VALUES (?, ?, ?)", [
+        (1800, "uniswap", 10.0),
+        (1800, "curve", 5.0),
+        (5400, "uniswap", 20.0),
+    ])
+    conn.executemany("INSERT INTO gas_price (ts, low, average, high) VALUES (?, ?, ?, ?)", [
+        (0, 1, 2, 3),
+        (6300, 4, 5, 6),
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_load_asof_frame_returns_one_row_per_price_tick(conn):
+    df = load_asof_frame(conn)
+
+    assert list(df.columns) == ["timestamp", "price", "volume_usd", "gas_price", "tvl"]
+    assert df["timestamp"].tolist() == [0, 3600, 7200]
+    assert df["price"].tolist() == [100.0, 101.0, 102.0]
+    assert df["volume_usd"].tolist() == [0.0, 15.0, 20.0]
+    assert df["gas_price"].tolist() == [2.0, 2.0, 5.0]
+
+
+def test_load_latest_row_matches_full_merge(conn):
+    latest = load_latest_row(conn)
+    full = load_asof_frame(conn).iloc[-1]
+
+    assert len(latest) == 1
+    assert latest.loc[0, "timestamp"] == full["timestamp"]
+    assert latest.loc[0, "volume_usd"] == full["volume_usd"]
+    assert latest.loc[0, "gas_price"] == full["gas_price"]
+
+
+def test_volume_feature_only_counts_the_feature_pair(conn):
+    conn.executemany("INSERT INTO market_share (ts, market, blockchain, project, volume_usd) VALUES (?, ?, ?, ?, ?)", [
+        (5400, "nft", "ethereum", "blur", 1000.0),
+        (6000, "dex", "arbitrum", "camelot", 500.0),
+    ])
+    conn.commit()
+
+    assert load_asof_frame(conn)["volume_usd"].tolist() == [0.0, 15.0, 20.0]
+    assert load_latest_row(conn).loc[0, "volume_usd"] == 20.0
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from backend.data_pipeline import async_fetch
+from backend.data_pipeline.fetch_state import UNCHANGED, ChangeTracker
+from backend.data_pipeline.schema import INSERT_SQL, connect
+
+
+def test_fetch_all_runs_sources_concurrently(stub_server, stub_handler):
+    results = async_fetch.fetch_all(["dex", "nft"], ["ethereum", "polygon"], endpoints=stub_server)
+
+    assert results["gas_price"] == {"low": "10", "average": "20", "high": "30"}
+    assert results["tvl"] == 123.4
+    assert set(results["market_share"]) == {
+        ("dex", "ethereum"), ("dex", "polygon"), ("nft", "ethereum"), ("nft", "polygon")
+    }
+    assert results["market_share"][("nft", "polygon")]["result"]["rows"][0]["blockchain"] == "polygon"
+    # All six requests (0.3s each) were in the stub at the same time
+    assert stub_handler.max_in_flight == 6
+
+
+def test_get_json_retries_transient_errors(stub_server, stub_handler, monkeypatch):
+    monkeypatch.setattr(async_fetch, 'backoff_delay', lambda attempt: 0)
+    stub_handler.failures = {'/tvl/ethereum': 2}
+
+    async def run():
+        async with async_fetch.create_session() as session:
+            return await async_fetch.fetch_tvl_async(session, stub_server["tvl"])
+
+    assert asyncio.run(run()) == 123.4
+
+
+def test_malformed_body_fails_only_its_source(stub_server, stub_handler):
+    stub_handler.malformed = {'/tvl/ethereum'}
+
+    results = async_fetch.fetch_all(["dex"], ["ethereum"], endpoints=stub_server)
+
+    assert results["tvl"] is None
+    assert results["gas_price"] == {"low": "10", "average": "20", "high": "30"}
+    assert results["market_share"][("dex", "ethereum")]["result"]["rows"]
+
+
+def test_get_json_gives_up_after_timeout(stub_server, monkeypatch):
+    monkeypatch.setattr(async_fetch, 'backoff_delay', lambda attempt: 0)
+
+    async def run():
+        async with async_fetch.create_session() as session:
+            return await async_fetch.get_json(
+                session, f"{stub_server['tvl']}/tvl/ethereum", "tvl", timeout=0.05, retries=1
+            )
+
+    assert asyncio.run(run()) is None
+
+
+def test_parse_pairs():
+    assert async_fetch.parse_pairs("dex:ethereum, dex:arbitrum,,dex:ethereum") == [("dex", "ethereum"), ("dex", "arbitrum")]
+    with pytest.raises(ValueError):
+        async_fetch.parse_pairs("dex")
+
+
+def test_fan_out_respects_concurrency_and_host_rate(stub_server, stub_handler, monkeypatch):
+    monkeypatch.setattr(stub_handler, 'delay', 0.2)
+    pairs = [("dex", chain) for chain in ("ethereum", "arbitrum", "optimism", "base")]
+
+    async def run(limits):
+        async with async_fetch.create_session() as session:
+            start = time.perf_counter()
+            payloads, latency = await async_fetch.fetch_market_share_pairs(
+                session, pairs, stub_server["market_share"], limits
+            )
+            return payloads, latency, time.perf_counter() - start
+
+    # Never more than two requests in flight at a time
+    payloads, latency, _ = asyncio.run(run(async_fetch.FetchLimits(concurrency=2, host_rates={})))
+    assert set(payloads) == set(pairs) and all(payloads.values())
+    assert set(latency) == set(pairs)
+    assert stub_handler.max_in_flight == 2
+
+    # Five requests per second to the stub host: starts spaced 0.2s apart
+    _, latency, elapsed = asyncio.run(run(async_fetch.FetchLimits(concurrency=8, host_rates={"127.0.0.1": 5})))
+    assert elapsed >= 0.8
+    assert max(latency.values()) >= 0.8
+
+
+def test_unchanged_sources_are_skipped_across_runs(stub_server, tmp_path):
+    conn = connect(str(tmp_path / 'market_data.db'))
+
+    tracker = ChangeTracker(conn)
+    first = async_fetch.fetch_all(["dex"], ["ethereum"], endpoints=stub_server, tracker=tracker)
+    assert first["tvl"] == 123.4 and first["market_share"][("dex", "ethereum")] is not None
+
+    # Changed payloads are only recorded once the caller stores them with their rows
+    assert conn.execute("SELECT COUNT(*) FROM fetch_state").fetchone()[0] == 0
+    with conn:
+        conn.executemany(INSERT_SQL["fetch_state"], tracker.state_rows())
+
+    # A new tracker reads the validators and hashes saved by the first run
+    tracker = ChangeTracker(conn)
+    second = async_fetch.fetch_all(["dex"], ["ethereum"], endpoints=stub_server, tracker=tracker)
+    conn.close()
+
+    assert second["tvl"] is UNCHANGED  # 304 from If-None-Match
+    assert second["market_share"][("dex", "ethereum")] is UNCHANGED  # same rows hash
+    assert second["gas_price"] is UNCHANGED
+    assert tracker.stats == {"changed": 0, "not_modified": 1, "unchanged": 2}
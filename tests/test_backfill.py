@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+
+from backend.data_pipeline.backfill import backfill
+from backend.data_pipeline.schema import connect
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'market_data.db'))
+    yield conn
+    conn.close()
+
+
+def test_backfill_streams_chunks_and_skips_duplicates(conn):
+    records = [(1704067200 + 3600 * i, 2000.0 + i) for i in range(25)]
+
+    first = backfill("eth_price", records, chunk_size=10, conn=conn)
+    second = backfill("eth_price", records[20:] + [(1704067200 + 3600 * 25, 2025.0)], chunk_size=10, conn=conn)
+
+    assert first["rows_in"] == 25 and first["rows_inserted"] == 25
+    assert second["rows_inserted"] == 1 and second["duplicates"] == 5
+    assert conn.execute("SELECT COUNT(*), MIN(ts), MAX(price) FROM eth_price").fetchone() == (26, 1704067200, 2025.0)
+
+
+def test_backfill_accepts_mixed_timestamp_types(conn):
+    report = backfill("gas_price", [
+        ("2024-01-01T00:00:00", 1, 2, 3),
+        (datetime(2024, 1, 1, 1), 4, 5, 6),
+    ], conn=conn)
+
+    assert report["rows_inserted"] == 2
+    assert conn.execute("SELECT timestamp FROM gas_price ORDER BY ts").fetchall() == [
+        ("2024-01-01T00:00:00",), ("2024-01-01T01:00:00",)
+    ]
+
+
+def test_backfill_accepts_dataframes(conn):
+    pd = pytest.importorskip('pandas')
+    frame = pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-01", periods=48, freq="h"),
+        "tvl": [5.0e10 + i for i in range(48)],
+    })
+
+    report = backfill("tvl", frame, conn=conn)
+
+    assert report["rows_inserted"] == 48
+    assert conn.execute("SELECT COUNT(DISTINCT ts) FROM tvl").fetchone()[0] == 48
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+from backend.ai_model import backtest
+
+
+def test_walk_forward_folds_cover_every_row_after_min_train():
+    folds = backtest.walk_forward_folds(100, min_train=40, retrain_every=25)
+
+    assert folds == [(0, 40, 40, 65), (0, 65, 65, 90), (0, 90, 90, 100)]
+    # Sliding window, and targets 3 ticks ahead only known for rows before start - 2
+    assert backtest.walk_forward_folds(100, 40, 25, window=30, horizon=3)[1] == (33, 63, 65, 90)
+
+
+def test_rolling_mean_matches_a_trailing_window():
+    values = np.arange(10, dtype=float)
+
+    expected = [np.mean(values[max(0, i - 2):i + 1]) for i in range(10)]
+    np.testing.assert_allclose(backtest.rolling_mean(values, 3), expected)
+
+
+def test_backtest_replays_history_with_scheduled_retrains(synthetic_arrays, tmp_path):
+    X, y = synthetic_arrays(rows=300)
+
+    result = backtest.backtest(
+        X, y, features=["volume_usd", "gas_price"], params={"n_estimators": 5},
+        min_train=100, retrain_every=50, rolling=20, n_jobs=2,
+    )
+
+    summary = result["summary"]
+    assert summary["folds"] == len(result["folds"]) == -(-(len(X) - 100) // 50)
+    assert summary["predictions"] == len(X) - 100 == sum(fold["predictions"] for fold in result["folds"])
+    assert [fold["train_rows"] for fold in result["folds"]][:2] == [100, 150]
+    # Price is driven by volume, so the forest beats predicting no change
+    assert summary["mae"] < summary["naive_mae"]
+    assert 0 <= summary["directional_accuracy"] <= 1
+    assert len(result["rolling"]["mae"]) == len(result["rolling"]["timestamps"]) == summary["predictions"] // 20
+
+    backtest.save_backtest(result, "v1", str(tmp_path))
+    worse = dict(result, summary=dict(summary, mae=summary["mae"] + 1))
+    backtest.save_backtest(worse, "v2", str(tmp_path))
+    assert [entry["version"] for entry in backtest.load_backtests(str(tmp_path))] == ["v1", "v2"]
+
+
+def test_backtest_needs_more_rows_than_min_train(synthetic_arrays):
+    X, y = synthetic_arrays(rows=120)
+
+    with pytest.raises(ValueError):
+        backtest.backtest(X, y, min_train=len(X), n_jobs=1)
@@ -0,0 +1,47 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.ai_model.batcher import InferenceBatcher, Overloaded
+from backend.ai_model.features import FEATURE_COLUMNS
+
+
+class SlowModel:
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def predict(self, X):
+        self.release.wait(1)
+        self.calls.append(len(X))
+        return np.asarray(X)[:, 1] * 2
+
+
+def rows(*values):
+    return np.array([[0.0, v] + [0.0] * (len(FEATURE_COLUMNS) - 2) for v in values])
+
+
+def test_concurrent_requests_share_one_predict_call():
+    model = SlowModel()
+    batcher = InferenceBatcher(lambda: model, max_wait=0.2)
+
+    futures = [batcher.submit(rows(i)) for i in range(5)] + [batcher.submit(rows(5, 6))]
+    model.release.set()
+
+    assert [f.result(1).tolist() for f in futures] == [[0.0], [2.0], [4.0], [6.0], [8.0], [10.0, 12.0]]
+    assert model.calls == [7]
+    assert batcher.stats()["batches"] == 1
+
+
+def test_full_queue_is_rejected():
+    model = SlowModel()
+    batcher = InferenceBatcher(lambda: model, max_wait=0, queue_size=1)
+    batcher.submit(rows(1))  # taken by the worker, blocks in predict
+
+    pending = []
+    with pytest.raises(Overloaded):
+        for i in range(3):
+            pending.append(batcher.submit(rows(i)))
+    model.release.set()
+    assert batcher.stats()["rejected"] == 1
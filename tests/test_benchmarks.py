@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip('sklearn')
+pytest.importorskip('flask')
+pytest.importorskip('flask_cors')
+
+from backend import api
+from backend.ai_model import train_model
+from benchmarks import pipeline
+from benchmarks.synthetic import generate
+
+
+def test_generator_is_deterministic():
+    first, second = generate(2, resolution=600, seed=7), generate(2, resolution=600, seed=7)
+
+    assert first == second
+    assert len(first["eth_price"]) == 2 * 86400 // 600
+    assert len(first["tvl"]) == 48
+    assert generate(2, resolution=600, seed=8)["eth_price"] != first["eth_price"]
+
+
+def test_pipeline_benchmark_times_every_stage(tmp_path, monkeypatch):
+    # bench_size points these module globals at its temporary database
+    for name in ("registry", "cache", "fetch_latest_data", "fetch_data_version"):
+        monkeypatch.setattr(api, name, getattr(api, name))
+    monkeypatch.setattr(train_model, "DB_PATH", train_model.DB_PATH)
+
+    [result] = pipeline.run(days=[3], resolution=3600, requests=5, workdir=str(tmp_path))
+
+    assert result["rows"]["eth_price"] == 72
+    assert set(result["stages"]) == {
+        "ingest_s", "ingest_rows_per_sec", "load_data_s", "preprocess_s", "train_s",
+        "artifact_pickle_mb", "artifact_compact_mb", "model_load_pickle_ms", "model_load_compact_ms",
+        "fetch_latest_cold_ms", "fetch_latest_warm_ms", "predict_row_pickle_ms", "predict_row_compact_ms",
+        "predict_p50_ms", "predict_p99_ms", "predict_cached_p50_ms", "predict_cached_p99_ms",
+    }
+    assert all(value > 0 for value in result["stages"].values())
+
+    slower = {"results": [{"days": 3, "stages": {"train_s": result["stages"]["train_s"] / 10}}]}
+    assert pipeline.compare(slower, [result]) == [(3, "train_s", pytest.approx(10))]
@@ -0,0 +1,97 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn')
+
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from backend.ai_model import compact, train_model
+from backend.ai_model.compact import CompactForest, export_forest, export_model, load_compact, save_compact
+from backend.ai_model.registry import ModelRegistry, artifact_version
+
+
+def training_data(rows=2000, columns=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, columns)) * [1, 10, 1e3, 0.01, 1, 1][:columns]
+    y = 2000 + 50 * X[:, 0] + np.sin(X[:, 1]) * 20 + rng.normal(size=rows)
+    return X, y
+
+
+@pytest.mark.parametrize("estimator", [RandomForestRegressor, ExtraTreesRegressor])
+def test_compact_forest_matches_sklearn_predictions(estimator, monkeypatch):
+    X, y = training_data()
+    model = estimator(n_estimators=20, random_state=0).fit(X, y)
+    forest = export_forest(model)
+    X_new = training_data(seed=1)[0]
+    # Inputs that sit exactly on split thresholds must take the same branch
+    X_new[:50, 0] = forest.threshold[(forest.feature == 0) & np.isfinite(forest.threshold)][:50]
+    monkeypatch.setattr(compact, 'PREDICT_CHUNK', 256)
+
+    np.testing.assert_allclose(forest.predict(X_new), model.predict(X_new), rtol=1e-6)
+    np.testing.assert_allclose(forest.predict(X_new[:1]), model.predict(X_new[:1]), rtol=1e-6)
+    assert forest.n_estimators == 20
+    assert forest.threshold.dtype == np.float32 and forest.left.dtype == np.int32
+
+
+def test_feature_names_survive_export_and_reload(tmp_path):
+    X, y = training_data()
+    frame = pd.DataFrame(X, columns=[f"f{i}" for i in range(X.shape[1])])
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(frame[["f3", "f0"]], y)
+    path = str(tmp_path / 'model.npz')
+    save_compact(export_forest(model, source_version="v1"), path)
+
+    forest = load_compact(path)
+
+    assert list(forest.feature_names_in_) == ["f3", "f0"]
+    assert forest.source_version == "v1"
+    np.testing.assert_allclose(forest.predict(frame[["f3", "f0"]]), model.predict(frame[["f3", "f0"]]), rtol=1e-6)
+
+
+def test_compressed_quantized_export_is_smaller_and_close(tmp_path):
+    X, y = training_data()
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+    forest = export_forest(model)
+    plain, small = str(tmp_path / 'plain.npz'), str(tmp_path / 'small.npz')
+    save_compact(forest, plain)
+    save_compact(forest, small, compress=True, quantize=True)
+
+    assert os.path.getsize(small) < os.path.getsize(plain)
+    step = (forest.value.max() - forest.value.min()) / 65535
+    np.testing.assert_allclose(load_compact(small).predict(X), model.predict(X), atol=step)
+
+
+def test_non_forest_models_keep_only_their_pickle(tmp_path):
+    X, y = training_data()
+    path = str(tmp_path / 'model.npz')
+    export_model(RandomForestRegressor(n_estimators=2, random_state=0).fit(X, y), path)
+    assert os.path.exists(path)
+
+    with pytest.raises(TypeError):
+        export_forest(LinearRegression().fit(X, y))
+    assert export_model(LinearRegression().fit(X, y), path) is None
+    assert not os.path.exists(path)
+
+
+def test_registry_serves_the_matching_compact_export(tmp_path, monkeypatch):
+    model_path = str(tmp_path / 'model.pkl')
+    monkeypatch.setattr(train_model, 'MODEL_PATH', model_path)
+    monkeypatch.setattr(train_model, 'MODEL_META_PATH', str(tmp_path / 'model.json'))
+    X, y = training_data()
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+
+    train_model.save_model(model, {"mode": "full"})
+    served, version = ModelRegistry(model_path, check_interval=0).current()
+    assert isinstance(served, CompactForest)
+    assert served.source_version == version == artifact_version(model_path)
+    np.testing.assert_allclose(served.predict(X), model.predict(X), rtol=1e-6)
+
+    # A pickle replaced without re-exporting is served as is
+    joblib.dump(model, model_path + '.tmp')
+    os.replace(model_path + '.tmp', model_path)
+    assert isinstance(ModelRegistry(model_path, check_interval=0).get(), RandomForestRegressor)
+    assert isinstance(ModelRegistry(model_path, model_format="pickle").get(), RandomForestRegressor)
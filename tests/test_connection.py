@@ -0,0 +1,129 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from backend.data_pipeline.connection import BufferFull, BufferedWriter, ConnectionManager
+
+
+def test_manager_reuses_one_connection_per_thread(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'market_data.db'))
+    main_conn = manager.get()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(manager.get()))
+    thread.start()
+    thread.join()
+
+    assert manager.get() is main_conn
+    assert other[0] is not main_conn
+    manager.close_all()
+
+
+def test_buffered_writer_groups_rows_across_tables(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'market_data.db'))
+    writer = BufferedWriter(manager, max_rows=3, max_delay=60)
+
+    writer.add("eth_price", ("2024-01-01T00:00:00", 1704067200, 2300.0))
+    writer.add("tvl", ("2024-01-01T00:00:00", 1704067200, 5.0e10))
+    conn = manager.get()
+    assert conn.execute("SELECT COUNT(*) FROM eth_price").fetchone()[0] == 0
+
+    writer.add("gas_price", ("2024-01-01T00:00:00", 1704067200, 1, 2, 3))
+    assert writer.rows_written == 3
+    assert conn.execute("SELECT COUNT(*) FROM gas_price").fetchone()[0] == 1
+
+    writer.add("eth_price", ("2024-01-01T00:01:00", 1704067260, 2301.0))
+    writer.close()
+    assert conn.execute("SELECT COUNT(*) FROM eth_price").fetchone()[0] == 2
+    manager.close_all()
+
+
+def test_buffered_writer_keeps_rows_when_a_flush_fails(tmp_path):
+    db_path = str(tmp_path / 'market_data.db')
+    manager = ConnectionManager(db_path)
+    writer = BufferedWriter(manager, max_rows=100, max_delay=60)
+    manager.get().execute("PRAGMA busy_timeout = 0")
+    blocker = sqlite3.connect(db_path)
+    blocker.execute("BEGIN EXCLUSIVE")
+
+    writer.add("eth_price", ("2024-01-01T00:00:00", 1704067200, 2300.0))
+    with pytest.raises(sqlite3.OperationalError):
+        writer.flush()
+    assert writer.flush_errors == 1
+
+    blocker.rollback()
+    blocker.close()
+    writer.add("eth_price", ("2024-01-01T00:01:00", 1704067260, 2301.0))
+    writer.close()
+    assert writer.rows_written == 2
+    assert manager.get().execute("SELECT COUNT(*) FROM eth_price").fetchone()[0] == 2
+    manager.close_all()
+
+
+def test_buffered_writer_dead_letters_a_batch_after_its_retries(tmp_path):
+    db_path = str(tmp_path / 'market_data.db')
+    dead_letter = str(tmp_path / 'dead_letter.jsonl')
+    manager = ConnectionManager(db_path)
+    writer = BufferedWriter(manager, max_rows=100, max_delay=60, limit=2, retries=1, dead_letter=dead_letter)
+    manager.get().execute("PRAGMA busy_timeout = 0")
+    blocker = sqlite3.connect(db_path)
+    blocker.execute("BEGIN EXCLUSIVE")
+
+    with pytest.raises(ValueError):
+        writer.add("eth_price", (1704067200, 2300.0))
+    writer.add_many("eth_price", [("2024-01-01T00:00:00", 1704067200, 2300.0)] * 2)
+    with pytest.raises(BufferFull):
+        writer.add("eth_price", ("2024-01-01T00:01:00", 1704067260, 2301.0))
+    for _ in range(2):
+        with pytest.raises(sqlite3.OperationalError):
+            writer.flush()
+
+    # The second failure used up the retry; the buffer is free again
+    assert writer.rows_dead_lettered == 2
+    blocker.rollback()
+    blocker.close()
+    writer.add("eth_price", ("2024-01-01T00:01:00", 1704067260, 2301.0))
+    writer.close()
+    assert writer.rows_written == 1
+    with open(dead_letter) as file:
+        assert json.loads(file.readline())["table"] == "eth_price"
+    manager.close_all()
+
+
+def test_buffered_writer_flushes_on_time(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'market_data.db'))
+    with BufferedWriter(manager, max_rows=100, max_delay=0.05) as writer:
+        writer.add("eth_price", ("2024-01-01T00:00:00", 1704067200, 2300.0))
+        for _ in range(50):
+            if writer.rows_written:
+                break
+            threading.Event().wait(0.01)
+        assert writer.rows_written == 1
+    manager.close_all()
+
+
+def test_manager_reuses_released_connections_and_reclaims_dead_threads(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'market_data.db'), max_idle=1)
+
+    def request():
+        conns.append(manager.get())
+        manager.release()
+
+    conns = []
+    for _ in range(3):
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+    assert conns[0] is conns[1] is conns[2]
+    assert manager.open_connections() == 1
+
+    # Threads that exit without releasing do not keep their connection open
+    for _ in range(3):
+        thread = threading.Thread(target=lambda: conns.append(manager.get()))
+        thread.start()
+        thread.join()
+    assert manager.get() is conns[0]
+    assert conns[3] is conns[4] is conns[5] is conns[0]
+    assert manager.open_connections() == 1
+    manager.close_all()
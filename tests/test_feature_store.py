@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pandas')
+
+from backend.ai_model.feature_store import FeatureStore
+from backend.data_pipeline.asof import load_asof_frame
+from backend.data_pipeline.schema import connect
+
+
+def insert_prices(conn, rows):
+    conn.executemany("INSERT INTO eth_price (ts, price) VALUES (?, ?)", rows)
+    conn.commit()
+
+
+def test_sync_appends_only_rows_past_the_watermark(tmp_path):
+    conn = connect(str(tmp_path / 'market_data.db'))
+    conn.execute("INSERT INTO gas_price (ts, average) VALUES (50, 7.0)")
+    insert_prices(conn, [(100, 1.0), (200, 2.0)])
+    store = FeatureStore(str(tmp_path / 'store'))
+
+    assert store.sync(conn) == 2
+    insert_prices(conn, [(300, 3.0)])
+    assert store.sync(conn) == 1
+    assert store.sync(conn) == 0
+
+    reopened = FeatureStore(str(tmp_path / 'store'))
+    assert len(reopened) == 3 and reopened.watermark == 300
+    assert isinstance(reopened.column("price"), np.memmap)
+    np.testing.assert_array_equal(reopened.column("price"), [1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(reopened.column("gas_price"), [7.0, 7.0, 7.0])
+    conn.close()
+
+
+def test_matrix_matches_sql_load(tmp_path):
+    conn = connect(str(tmp_path / 'market_data.db'))
+    conn.executemany("INSERT INTO market_share (ts, project, volume_usd) VALUES (?, ?, ?)", [(150, "a", 5.0), (150, "b", 1.0)])
+    insert_prices(conn, [(100 * i, float(i)) for i in range(1, 6)])
+    store = FeatureStore(str(tmp_path / 'store'))
+    store.sync(conn)
+
+    columns = ["timestamp", "volume_usd", "gas_price"]
+    expected = load_asof_frame(conn)[columns].to_numpy(dtype=np.float64)
+    np.testing.assert_array_equal(store.matrix(columns), expected)
+    conn.close()
+
+
+def test_sync_rebuilds_after_history_written_behind_the_watermark(tmp_path):
+    conn = connect(str(tmp_path / 'market_data.db'))
+    insert_prices(conn, [(100, 1.0), (300, 3.0)])
+    store = FeatureStore(str(tmp_path / 'store'))
+    store.sync(conn)
+
+    # Backfilled tick and gas price older than the watermark
+    insert_prices(conn, [(200, 2.0)])
+    conn.execute("INSERT INTO gas_price (ts, average) VALUES (50, 7.0)")
+    conn.commit()
+    assert store.sync(conn) == 3
+    np.testing.assert_array_equal(store.column("price"), [1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(store.column("gas_price"), [7.0, 7.0, 7.0])
+
+    assert store.sync(conn) == 0
+    assert store.sync(conn, rebuild=True) == 3
+    conn.close()
+
+
+def test_revised_market_share_does_not_rebuild(tmp_path):
+    conn = connect(str(tmp_path / 'market_data.db'))
+    insert = "INSERT INTO market_share (ts, market, blockchain, project, period, volume_usd) VALUES (?, 'dex', 'ethereum', 'a', '2025-01-01', ?)"
+    conn.execute(insert, (150, 5.0))
+    insert_prices(conn, [(100, 1.0), (300, 3.0)])
+    store = FeatureStore(str(tmp_path / 'store'))
+    store.sync(conn)
+
+    # A newer report of the same period replaces the raw row stored behind the watermark
+    conn.execute(insert, (400, 6.0))
+    insert_prices(conn, [(500, 5.0)])
+    assert store.sync(conn) == 1
+    np.testing.assert_array_equal(store.column("volume_usd"), [0.0, 5.0, 6.0])
+    conn.close()
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas')
+
+from backend.ai_model import model_utils
+from backend.ai_model.features import FEATURE_COLUMNS, HISTORY, OnlineFeatures, build_training_set, compute_features
+from backend.data_pipeline.backfill import backfill
+from backend.data_pipeline.schema import connect
+
+START = 1704067200
+
+
+def base_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "timestamp": START + 3600 * np.arange(rows),
+        "price": 2000 * np.exp(np.cumsum(rng.normal(0, 0.01, rows))),
+        "volume_usd": rng.uniform(1e6, 2e6, rows),
+        "gas_price": rng.uniform(5, 50, rows),
+        "tvl": rng.uniform(1e9, 2e9, rows),
+    })
+
+
+def test_online_rows_match_vectorized_features():
+    frame = base_frame(HISTORY + 40)
+    expected = compute_features(frame).to_numpy()
+    online = OnlineFeatures()
+
+    for i, row in enumerate(frame.to_dict("records")):
+        online.update(row)
+        latest = online.latest()
+        if i < HISTORY - 1:
+            assert latest is None
+            assert np.isnan(expected[i]).any()
+        else:
+            np.testing.assert_allclose(latest[0], expected[i], rtol=1e-9)
+
+
+def test_training_set_targets_the_next_price():
+    frame = base_frame(HISTORY + 10)
+    X, y = build_training_set(frame)
+
+    assert list(X.columns) == FEATURE_COLUMNS
+    assert len(X) == 10
+    assert X["timestamp"].iloc[0] == frame["timestamp"].iloc[HISTORY - 1]
+    np.testing.assert_array_equal(y, frame["price"].iloc[HISTORY:])
+
+
+def test_fetch_latest_data_only_loads_new_ticks(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'market_data.db')
+    conn = connect(db_path)
+    frame = base_frame(HISTORY + 5)
+    head, tail = frame.iloc[:-1], frame.iloc[-1:]
+    backfill("eth_price", head[["timestamp", "price"]], conn=conn)
+    backfill("gas_price", [(t, 1, g, 99) for t, g in zip(frame["timestamp"], frame["gas_price"])], conn=conn)
+    backfill("tvl", frame[["timestamp", "tvl"]], conn=conn)
+
+    calls = []
+    load = model_utils.load_asof_frame
+    monkeypatch.setattr(model_utils, 'load_asof_frame', lambda *a, **kw: calls.append(kw) or load(*a, **kw))
+    monkeypatch.setattr(model_utils, '_online_features', {})
+
+    first = model_utils.fetch_latest_data(db_path)
+    backfill("eth_price", tail[["timestamp", "price"]], conn=conn)
+    second = model_utils.fetch_latest_data(db_path)
+
+    assert calls == [{"lookback": HISTORY}, {"since": int(head["timestamp"].iloc[-1])}]
+    frame["volume_usd"] = 0.0
+    expected = compute_features(frame).to_numpy()
+    np.testing.assert_allclose(first[0], expected[-2], rtol=1e-9)
+    np.testing.assert_allclose(second[0], expected[-1], rtol=1e-9)
+    conn.close()
+
+
+def test_fetch_features_at_loads_distant_timestamps_separately(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'market_data.db')
+    conn = connect(db_path)
+    frame = base_frame(HISTORY + 200)
+    backfill("eth_price", frame[["timestamp", "price"]], conn=conn)
+    backfill("gas_price", [(t, 1, g, 99) for t, g in zip(frame["timestamp"], frame["gas_price"])], conn=conn)
+    backfill("tvl", frame[["timestamp", "tvl"]], conn=conn)
+
+    calls = []
+    load = model_utils.load_asof_frame
+    monkeypatch.setattr(model_utils, 'load_asof_frame', lambda *a, **kw: calls.append(kw) or load(*a, **kw))
+    last = int(frame["timestamp"].iloc[-1])
+    requested = [last + 60, START + 3600 * HISTORY, last - 1800, START - 86400]
+    ticks, rows, valid = model_utils.fetch_features_at(requested, db_path)
+
+    # Three clusters: before any data, around HISTORY and the last two ticks
+    assert [(call["since"], call["until"]) for call in calls] == [
+        (START - 86400, START - 86400), (START + 3600 * HISTORY, START + 3600 * HISTORY), (last - 1800, last + 60),
+    ]
+    frame["volume_usd"] = 0.0
+    expected = compute_features(frame).to_numpy()
+    assert valid.tolist() == [True, True, True, False]
+    np.testing.assert_allclose(rows[:3], expected[[-1, HISTORY, -2]], rtol=1e-9)
+    assert ticks[0] == last
+    conn.close()
@@ -0,0 +1,67 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+from sklearn.ensemble import RandomForestRegressor
+
+from backend.ai_model.feed import PredictionFeed
+from backend.ai_model.features import HISTORY, build_training_set, compute_features
+from backend.ai_model.registry import ModelRegistry
+from backend.data_pipeline.asof import load_asof_frame
+from backend.data_pipeline.backfill import backfill
+from backend.data_pipeline.schema import connect
+
+START = 1704067200
+ROWS = HISTORY + 20
+
+
+def seed(conn, first, last, rng):
+    prices = 2000 * np.exp(np.cumsum(rng.normal(0, 0.01, last - first)))
+    backfill("eth_price", [(START + 3600 * i, p) for i, p in zip(range(first, last), prices)], conn=conn)
+    backfill("gas_price", [(START + 3600 * i, 1, 10 + i % 5, 30) for i in range(first, last)], conn=conn)
+
+
+def save(model_path, frame, seed_value):
+    X, y = build_training_set(frame)
+    model = RandomForestRegressor(n_estimators=5, random_state=seed_value).fit(X, y)
+    joblib.dump(model, model_path)
+    return model
+
+
+def test_feed_sends_only_new_points_and_resets_on_model_swap(tmp_path):
+    db_path = str(tmp_path / 'market_data.db')
+    model_path = str(tmp_path / 'model.pkl')
+    conn = connect(db_path)
+    rng = np.random.default_rng(2)
+    seed(conn, 0, ROWS, rng)
+    save(model_path, load_asof_frame(conn), 0)
+
+    feed = PredictionFeed(db_path=db_path, maxlen=100, registry=ModelRegistry(model_path, check_interval=0))
+    assert feed.refresh() == ROWS - HISTORY + 1
+    first = feed.delta()
+    assert first["reset"] and len(first["points"]) == ROWS - HISTORY + 1
+    assert first["points"][0]["predicted"] is None
+    assert feed.refresh() == 0  # no new data, nothing recomputed
+
+    seed(conn, ROWS, ROWS + 3, rng)
+    assert feed.refresh() == 3
+    update = feed.delta(first["cursor"], first["generation"])
+    assert not update["reset"]
+    assert [p["timestamp"] for p in update["points"]] == [START + 3600 * i for i in range(ROWS, ROWS + 3)]
+    # Each point carries the forecast made at the previous tick
+    assert update["points"][0]["predicted"] == first["forecast"]
+
+    frame = load_asof_frame(conn)
+    model = save(model_path, frame, 1)
+    os.utime(model_path, ns=(0, 10**18))
+    feed.refresh()
+    swapped = feed.delta(update["cursor"], update["generation"])
+    conn.close()
+    assert swapped["reset"] and swapped["generation"] == first["generation"] + 1
+    assert len(swapped["points"]) == ROWS + 3 - HISTORY + 1
+    expected = model.predict(compute_features(frame).tail(1))[0]
+    assert swapped["forecast"] == pytest.approx(expected)
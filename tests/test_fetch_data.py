@@ -19,7 +19,9 @@ if 'dotenv' not in sys.modules:
     dotenv_stub.load_dotenv = lambda *a, **k: None
     sys.modules['dotenv'] = dotenv_stub
 
+from backend.data_pipeline import fetch_data
 from backend.data_pipeline.fetch_data import fetch_market_share, fetch_gas_price
+from backend.data_pipeline.schema import connect
 
 
 def test_fetch_market_share_success():
@@ -48,3 +50,17 @@ def test_fetch_gas_price_success():
     with patch('backend.data_pipeline.fetch_data.requests.get', return_value=mock_resp):
         result = fetch_gas_price()
     assert result == {"low": "10", "average": "20", "high": "30"}
+
+
+def test_store_market_data_falls_back_to_the_requested_pair(tmp_path):
+    conn = connect(str(tmp_path / 'market_data.db'))
+    payloads = {
+        ("dex", "arbitrum"): {"result": {"rows": [{"project": "uniswap", "volume_usd": 1.0}]}},
+        ("nft", "ethereum"): {"result": {"rows": [{"market": "nft", "blockchain": "base", "volume_usd": 2.0}]}},
+    }
+    with patch.object(fetch_data, 'get_connection', return_value=conn):
+        fetch_data.store_market_data(payloads, None, None)
+
+    rows = conn.execute("SELECT market, blockchain FROM market_share ORDER BY volume_usd").fetchall()
+    assert rows == [("dex", "arbitrum"), ("nft", "base")]
+    conn.close()
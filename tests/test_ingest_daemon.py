@@ -0,0 +1,57 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from backend.data_pipeline.ingest_daemon import IngestDaemon
+
+
+def test_daemon_polls_each_source_on_its_schedule(stub_server, stub_handler, tmp_path, monkeypatch):
+    monkeypatch.setattr(stub_handler, 'delay', 0.01)
+    db_path = str(tmp_path / 'market_data.db')
+    daemon = IngestDaemon(
+        schedule={"gas_price": 0.1, "tvl": 0.3, "market_share": 10},
+        db_path=db_path,
+        pairs=[("dex", "ethereum"), ("dex", "arbitrum")],
+        endpoints=stub_server,
+    )
+
+    asyncio.run(daemon.run(duration=0.65))
+
+    stats = daemon.snapshot()
+    assert stats["gas_price"]["runs"] >= 5
+    assert 2 <= stats["tvl"]["runs"] <= 3
+    assert stats["market_share"]["runs"] == 1
+    with sqlite3.connect(db_path) as conn:
+        gas_rows = conn.execute("SELECT COUNT(*) FROM gas_price").fetchone()[0]
+        market_rows = conn.execute("SELECT COUNT(*) FROM market_share").fetchone()[0]
+        chains = {row[0] for row in conn.execute("SELECT blockchain FROM market_share")}
+        sources = {row[0] for row in conn.execute("SELECT source FROM fetch_state")}
+        snapshots = conn.execute("SELECT COUNT(DISTINCT ts) FROM market_share").fetchone()[0]
+    # The stub always returns the same gas price, so only the first poll is stored
+    assert gas_rows == stats["gas_price"]["rows_written"] == 1
+    assert stats["gas_price"]["unchanged"] == stats["gas_price"]["runs"] - 1
+    assert market_rows == stats["market_share"]["rows_written"] == 2
+    assert chains == {"ethereum", "arbitrum"}
+    # Both pairs of the cycle are stamped as one snapshot
+    assert snapshots == 1
+    # Validators are written through the buffered writer along with the rows
+    assert sources == {"gas_price", "tvl", "market_share:dex/ethereum", "market_share:dex/arbitrum"}
+    assert set(daemon.pair_latency) == {("dex", "ethereum"), ("dex", "arbitrum")}
+
+
+def test_daemon_coalesces_overlapping_ticks(stub_server, stub_handler, tmp_path, monkeypatch):
+    monkeypatch.setattr(stub_handler, 'delay', 0.35)
+    daemon = IngestDaemon(
+        schedule={"gas_price": 0.1},
+        db_path=str(tmp_path / 'market_data.db'),
+        endpoints=stub_server,
+    )
+
+    asyncio.run(daemon.run(duration=0.5))
+
+    stats = daemon.snapshot()["gas_price"]
+    assert stats["runs"] == 2
+    assert stats["missed_deadlines"] >= 2
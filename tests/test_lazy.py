@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+from backend.lazy import lazy_import
+
+PROJECT_DIR = os.path.join(os.path.dirname(__file__), '..', 'eth-market-forecasting')
+
+
+def test_module_is_imported_on_first_attribute_access(tmp_path, monkeypatch):
+    (tmp_path / 'slow_dependency.py').write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    module = lazy_import('slow_dependency')
+    assert 'slow_dependency' not in sys.modules
+    assert module.VALUE == 42
+    assert 'slow_dependency' in sys.modules
+    assert lazy_import('not_an_installed_package', optional=True) is None
+
+
+def test_entry_points_do_not_import_heavy_packages():
+    probe = (
+        "import sys\n"
+        "import backend.data_pipeline.fetch_data, backend.ai_model.predict\n"
+        "print(sorted(m for m in ('pandas', 'joblib', 'sklearn') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', probe], cwd=PROJECT_DIR, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
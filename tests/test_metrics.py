@@ -0,0 +1,84 @@
+import os
+
+from backend.metrics import MetricsRegistry, mark_process_dead
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    registry = MetricsRegistry(enabled=True)
+    registry.counter("rows_total", "Rows").inc(3, table="tvl")
+    registry.counter("rows_total").inc(table="tvl")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    latency.observe(0.05, source="gas")
+    latency.observe(0.5, source="gas")
+    latency.observe(5, source="gas")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE rows_total counter" in lines
+    assert 'rows_total{table="tvl"} 4' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{source="gas",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{source="gas",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{source="gas",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{source="gas"} 5.55' in lines
+    assert 'latency_seconds_count{source="gas"} 3' in lines
+
+
+def test_timer_works_as_context_manager_and_decorator():
+    registry = MetricsRegistry(enabled=True)
+    timer = registry.histogram("work_seconds")
+
+    with timer.time(kind="block"):
+        pass
+
+    @timer.time(kind="call")
+    def work(x):
+        return x * 2
+
+    assert work(21) == 42
+    summary = timer.summary()
+    assert summary[(("kind", "block"),)][0] == 1
+    assert summary[(("kind", "call"),)][0] == 1
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    registry.counter("rows_total").inc(table="tvl")
+    with registry.histogram("work_seconds").time():
+        pass
+
+    assert "rows_total{" not in registry.render()
+    assert registry.histogram("work_seconds").summary() == {}
+
+
+def test_collectors_and_label_escaping(tmp_path):
+    registry = MetricsRegistry(enabled=True)
+    registry.register_collector(lambda: [("queue_depth", "gauge", "Depth", [({"name": 'a"b'}, 2)])])
+    registry.register_collector(lambda: 1 / 0)  # a failing collector is skipped
+
+    path = str(tmp_path / "metrics.prom")
+    registry.dump(path)
+
+    with open(path) as file:
+        assert 'queue_depth{name="a\\"b"} 2' in file.read().splitlines()
+
+
+
+def test_multiprocess_render_sums_every_process_snapshot(tmp_path):
+    directory = str(tmp_path)
+    worker = MetricsRegistry(enabled=True, multiproc_dir=directory)
+    worker.counter("rows_total", "Rows").inc(3, table="tvl")
+    worker.histogram("latency_seconds", "Latency", buckets=(1.0,)).observe(0.5)
+    worker.register_collector(lambda: [("queue_depth", "gauge", "Depth", [({}, 2)])])
+    worker.write_snapshot()
+    # Stands in for a second worker process that has since exited
+    os.replace(os.path.join(directory, f"{os.getpid()}.json"), os.path.join(directory, "1.json"))
+    mark_process_dead(1, directory)
+
+    lines = worker.render().splitlines()
+
+    assert 'rows_total{table="tvl"} 6' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+    # Only the live process's gauge is reported
+    assert "queue_depth 2" in lines
@@ -0,0 +1,82 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backend.ai_model.prediction_cache import PredictionCache
+
+
+def test_entries_expire_after_ttl():
+    cache = PredictionCache(ttl=0.05)
+    values = iter([1, 2])
+
+    assert cache.get_or_compute("k", lambda: next(values)) == 1
+    assert cache.get_or_compute("k", lambda: next(values)) == 1
+    time.sleep(0.06)
+    assert cache.get_or_compute("k", lambda: next(values)) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = PredictionCache(ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait()
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 8
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_none_results_are_not_cached():
+    cache = PredictionCache(ttl=60)
+    values = iter([None, 3])
+
+    assert cache.get_or_compute("k", lambda: next(values)) is None
+    assert cache.get_or_compute("k", lambda: next(values)) == 3
+
+
+def test_predict_endpoint_recomputes_only_after_new_data(monkeypatch):
+    pytest.importorskip('flask')
+    pytest.importorskip('flask_cors')
+    from backend import api
+
+    class CountingModel:
+        calls = 0
+
+        def predict(self, X):
+            self.calls += 1
+            return np.full(len(X), 2000.0 + self.calls)
+
+    version = [1]
+    fetches = []
+    model = CountingModel()
+    monkeypatch.setattr(api, 'registry', SimpleNamespace(current=lambda: (model, 'v1'), get=lambda: model))
+    monkeypatch.setattr(api, 'cache', PredictionCache(ttl=60))
+    monkeypatch.setattr(api, 'fetch_data_version', lambda: version[0])
+    monkeypatch.setattr(api, 'fetch_latest_data', lambda: fetches.append(1) or np.zeros((1, len(api.FEATURE_COLUMNS))))
+    client = api.app.test_client()
+
+    first = client.get('/api/predict').get_json()
+    second = client.get('/api/predict').get_json()
+    version[0] += 1
+    third = client.get('/api/predict').get_json()
+
+    assert first == second == {"predicted_price": 2001.0}
+    assert third == {"predicted_price": 2002.0}
+    assert len(fetches) == 2
@@ -0,0 +1,66 @@
+import os
+import time
+import pstats
+
+import pytest
+
+from backend import profiling
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profile_writes_pstats_and_collapsed_stacks(tmp_path):
+    with profiling.profile("job", "all", str(tmp_path)) as run:
+        busy_wait(0.1)
+
+    pstats_path, collapsed_path = run.paths
+    assert pstats_path.endswith(".pstats") and collapsed_path.endswith(".collapsed")
+    stats = pstats.Stats(pstats_path)
+    assert any(name == "busy_wait" for _, _, name in stats.stats)
+
+    with open(collapsed_path) as file:
+        lines = file.read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1].startswith("busy_wait (")
+
+
+def test_profile_is_a_no_op_when_disabled(tmp_path):
+    with profiling.profile("job", "", str(tmp_path)) as run:
+        pass
+
+    assert run is None
+    assert not os.listdir(tmp_path)
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        with profiling.profile("job", "perf", str(tmp_path)):
+            pass
+
+
+def test_invalid_profile_env_values_disable_profiling(caplog):
+    assert profiling.parse_mode(" Sample ") == "sample"
+    assert profiling.parse_mode(None) == ""
+    with caplog.at_level("WARNING"):
+        assert profiling.parse_mode("true") == ""
+    assert "PROFILE='true'" in caplog.text
+
+
+def test_profiled_request_respects_sampling_rate(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_MODE", "sample")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    view = profiling.profiled_request("view")(lambda: "ok")
+
+    monkeypatch.setattr(profiling, "PROFILE_API_RATE", 0.0)
+    assert view() == "ok"
+    assert not os.listdir(tmp_path)
+
+    monkeypatch.setattr(profiling, "PROFILE_API_RATE", 1.0)
+    assert view() == "ok"
+    assert [name.split("-")[0] for name in os.listdir(tmp_path)] == ["view"]
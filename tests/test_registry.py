@@ -0,0 +1,49 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+from sklearn.linear_model import LinearRegression
+
+from backend.ai_model import train_model
+from backend.ai_model.registry import ModelRegistry, artifact_version
+
+
+def fitted(slope):
+    X = np.arange(10, dtype=float).reshape(-1, 1)
+    return LinearRegression().fit(X, slope * X[:, 0])
+
+
+def test_registry_loads_lazily_and_hot_swaps_saved_models(tmp_path, monkeypatch):
+    model_path = str(tmp_path / 'model.pkl')
+    monkeypatch.setattr(train_model, 'MODEL_PATH', model_path)
+    monkeypatch.setattr(train_model, 'MODEL_META_PATH', str(tmp_path / 'model.json'))
+    registry = ModelRegistry(model_path, check_interval=0)
+
+    assert registry.current() == (None, None)
+
+    train_model.save_model(fitted(1), {"mode": "full"})
+    model, version = registry.current()
+    assert model.predict([[2.0]])[0] == pytest.approx(2.0)
+    assert version == train_model.load_metadata()["version"]
+    assert registry.get() is model
+
+    train_model.save_model(fitted(3), {"mode": "full"})
+    assert registry.version != version
+    assert registry.get().predict([[2.0]])[0] == pytest.approx(6.0)
+
+
+def test_registry_waits_for_check_interval(tmp_path):
+    model_path = str(tmp_path / 'model.pkl')
+    joblib.dump(fitted(1), model_path)
+    registry = ModelRegistry(model_path, check_interval=3600)
+    first = registry.get()
+
+    joblib.dump(fitted(2), model_path + '.tmp')
+    os.replace(model_path + '.tmp', model_path)
+
+    assert artifact_version(model_path) != registry.version
+    assert registry.get() is first
@@ -0,0 +1,166 @@
+import numpy as np
+import pytest
+
+from backend.data_pipeline import schema
+from backend.data_pipeline.backfill import backfill
+from backend.data_pipeline.rollup import lttb, query_range, top_projects
+
+START = 1704067200
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = schema.connect(str(tmp_path / 'market_data.db'))
+    yield conn
+    conn.close()
+
+
+def test_rollups_follow_inserts_in_any_order(conn):
+    rng = np.random.default_rng(3)
+    ts = START + np.arange(3 * 3600, step=30)
+    prices = 2000 + rng.normal(0, 5, len(ts)).cumsum()
+    order = rng.permutation(len(ts))
+    backfill("eth_price", [(int(ts[i]), float(prices[i])) for i in order], conn=conn)
+
+    hours = conn.execute(
+        "SELECT bucket, open, high, low, close, sum, count FROM rollup"
+        " WHERE series = 'eth_price' AND resolution = 3600 ORDER BY bucket"
+    ).fetchall()
+    assert len(hours) == 3
+    for bucket, open_, high, low, close, total, count in hours:
+        window = prices[(ts >= bucket) & (ts < bucket + 3600)]
+        assert (open_, close, count) == (window[0], window[-1], 120)
+        assert (high, low) == (window.max(), window.min())
+        assert total == pytest.approx(window.sum())
+
+
+def test_migration_fills_rollups_from_existing_rows(tmp_path):
+    db_path = str(tmp_path / 'market_data.db')
+    conn = schema.connect(db_path)
+    conn.execute("PRAGMA user_version = 4")
+    conn.execute("DROP TABLE rollup")
+    conn.execute("DROP TRIGGER rollup_gas_price")
+    conn.executemany(schema.INSERT_SQL["gas_price"], [("", START + 60 * i, 1, 10 + i, 30) for i in range(5)])
+    conn.commit()
+
+    assert schema.migrate(conn) == schema.SCHEMA_VERSION
+    day = conn.execute("SELECT low, high, count FROM rollup WHERE series = 'gas_price' AND resolution = 86400").fetchone()
+    assert day == (10, 14, 5)
+    conn.close()
+
+
+def test_range_query_downsamples_to_requested_points(conn):
+    ts = START + 60 * np.arange(60 * 24 * 30)
+    backfill("eth_price", [(int(t), 2000 + i % 97) for i, t in enumerate(ts)], conn=conn)
+
+    result = query_range(conn, "eth_price", start=int(ts[0]), end=int(ts[-1]), points=200)
+    assert len(result["timestamps"]) <= 200
+    assert result["resolution"] % 3600 == 0  # served from the hourly rollup
+    assert sum(result["count"]) == len(ts)
+    assert min(result["low"]) == 2000 and max(result["high"]) == 2096
+
+    shape = query_range(conn, "eth_price", points=100, method="lttb")
+    assert len(shape["timestamps"]) == 100
+    assert shape["timestamps"] == sorted(shape["timestamps"])
+
+    with pytest.raises(ValueError):
+        query_range(conn, "unknown")
+
+
+def test_lttb_keeps_extremes_and_endpoints():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[400] = 50
+    kept = lttb(x, y, 20)
+    assert kept[0] == 0 and kept[-1] == 999 and 400 in kept
+
+
+def snapshot(ts, volumes, period="2025-01-16 00:00:00.000 UTC"):
+    return [("", ts, "dex", "ethereum", project, "1", volume, 1, period) for project, volume in volumes.items()]
+
+
+def test_market_share_aggregates_keep_the_newest_snapshot(conn):
+    with conn:
+        conn.executemany(schema.INSERT_SQL["market_share"], snapshot(200, {"uniswap": 8.0, "curve": 2.0}))
+        conn.executemany(schema.INSERT_SQL["market_share"], snapshot(100, {"uniswap": 1.0, "balancer": 5.0}))
+        conn.executemany(schema.INSERT_SQL["market_share"], snapshot(200, {"uniswap": 8.0}))  # duplicate, ignored
+
+    # The older snapshot's uniswap row arrives after the newer one and is not stored
+    totals = conn.execute("SELECT ts, volume_usd, projects FROM market_share_snapshot ORDER BY ts").fetchall()
+    assert totals == [(100, 5.0, 1), (200, 10.0, 2)]
+    assert conn.execute("SELECT COUNT(*) FROM market_share").fetchone()[0] == 3
+
+    result = top_projects(conn, top=2)
+    assert result["total_volume_usd"] == 15.0
+    assert [(p["project"], p["volume_usd"]) for p in result["projects"]] == [("uniswap", 8.0), ("balancer", 5.0)]
+    assert result["projects"][0]["share"] == pytest.approx(8 / 15)
+    with pytest.raises(ValueError):
+        top_projects(conn, resolution="1m")
+
+
+def test_migration_fills_market_share_aggregates(tmp_path):
+    conn = schema.connect(str(tmp_path / 'market_data.db'))
+    conn.execute("PRAGMA user_version = 5")
+    conn.execute("DROP TRIGGER market_share_aggregates")
+    conn.executemany(schema.INSERT_SQL["market_share"], snapshot(200, {"a": 3.0}) + snapshot(100, {"a": 1.0, "b": 2.0}))
+    conn.execute("DELETE FROM market_share_project")
+    conn.commit()
+
+    assert schema.migrate(conn) == schema.SCHEMA_VERSION
+    projects = conn.execute("SELECT project, volume_usd FROM market_share_project WHERE resolution = 86400 ORDER BY project")
+    assert projects.fetchall() == [("a", 3.0), ("b", 2.0)]
+    conn.close()
+
+
+def test_market_share_history_counts_each_period_once(conn):
+    day = "2025-01-16 00:00:00.000 UTC"
+    with conn:
+        # The second fetch re-reports the same period with revised volumes
+        conn.executemany(schema.INSERT_SQL["market_share"], snapshot(100, {"uniswap": 1.0, "curve": 2.0}, day))
+        conn.executemany(schema.INSERT_SQL["market_share"], snapshot(200, {"uniswap": 4.0, "curve": 3.0}, day))
+        conn.executemany(schema.INSERT_SQL["market_share"], snapshot(200, {"uniswap": 6.0}, "2025-01-17 00:00:00.000 UTC"))
+
+    result = query_range(conn, "market_share", start=1736985600, end=1737072000, points=10)
+    assert result["resolution"] % 3600 == 0
+    assert result["timestamps"] == [1736985600, 1737072000]
+    assert result["close"] == [7.0, 6.0]
+    assert sum(result["count"]) == 2
+    assert conn.execute("SELECT COUNT(*) FROM rollup WHERE series = 'market_share'").fetchone()[0] == 0
+
+
+def test_market_share_rows_are_keyed_on_the_reporting_period(conn):
+    with conn:
+        conn.executemany(schema.INSERT_SQL["market_share"], snapshot(100, {"uniswap": 1.0, "curve": 2.0}))
+        version = schema.data_version(conn)
+        conn.executemany(schema.INSERT_SQL["market_share"], snapshot(200, {"uniswap": 4.0}))
+
+    rows = conn.execute("SELECT ts, project, volume_usd FROM market_share ORDER BY project").fetchall()
+    assert rows == [(100, "curve", 2.0), (200, "uniswap", 4.0)]
+    assert schema.data_version(conn) > version
+
+
+def test_migration_moves_duplicate_periods_aside(tmp_path):
+    conn = schema.connect(str(tmp_path / 'market_data.db'))
+    conn.execute("PRAGMA user_version = 8")
+    conn.execute("DROP TRIGGER market_share_revisions")
+    conn.execute("DROP INDEX uq_market_share_key")
+    conn.executemany(schema.INSERT_SQL["market_share"], snapshot(100, {"a": 1.0}) + snapshot(200, {"a": 3.0}))
+    conn.commit()
+
+    assert schema.migrate(conn) == schema.SCHEMA_VERSION
+    assert conn.execute("SELECT ts, volume_usd FROM market_share").fetchall() == [(200, 3.0)]
+    assert conn.execute("SELECT ts, volume_usd FROM market_share_duplicates").fetchall() == [(100, 1.0)]
+    conn.close()
+
+
+def test_migration_drops_raw_market_share_rollup(tmp_path):
+    conn = schema.connect(str(tmp_path / 'market_data.db'))
+    conn.execute("PRAGMA user_version = 7")
+    conn.execute("INSERT INTO rollup VALUES ('market_share', 60, 0, 0, 1, 1, 1, 0, 1, 1, 1)")
+    conn.execute("CREATE TRIGGER rollup_market_share AFTER INSERT ON market_share BEGIN SELECT 1; END")
+    conn.commit()
+
+    assert schema.migrate(conn) == schema.SCHEMA_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM rollup").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'rollup_market_share'").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,49 @@
+import sqlite3
+from datetime import datetime
+
+from backend.data_pipeline import schema
+
+
+def test_migrate_upgrades_legacy_database(tmp_path):
+    db_path = str(tmp_path / 'market_data.db')
+    with sqlite3.connect(db_path) as legacy:
+        legacy.execute("CREATE TABLE eth_price (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, price REAL)")
+        legacy.execute("INSERT INTO eth_price (timestamp, price) VALUES ('2024-01-01T00:00:00.123456', 2300.5)")
+    legacy.close()
+
+    conn = schema.connect(db_path)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == schema.SCHEMA_VERSION
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    timestamp, ts = conn.execute("SELECT timestamp, ts FROM eth_price").fetchone()
+    assert ts == schema.stamp(datetime.fromisoformat(timestamp))[1]
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(market_share)")}
+    assert {"idx_market_share_timestamp", "idx_market_share_ts_project", "uq_market_share_key"} <= indexes
+    conn.close()
+
+
+def test_migrate_is_idempotent(tmp_path):
+    db_path = str(tmp_path / 'market_data.db')
+    schema.connect(db_path).close()
+    conn = schema.connect(db_path)
+
+    assert schema.migrate(conn) == schema.SCHEMA_VERSION
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT price FROM eth_price WHERE ts BETWEEN 0 AND 10").fetchall()
+    assert any("uq_eth_price_key" in row[-1] for row in plan)
+    conn.close()
+
+
+def test_data_version_changes_only_when_rows_are_stored(tmp_path):
+    conn = schema.connect(str(tmp_path / 'market_data.db'))
+    assert schema.data_version(conn) == 0
+
+    row = schema.stamp(datetime(2024, 1, 1)) + (2300.0,)
+    with conn:
+        conn.execute(schema.INSERT_SQL["eth_price"], row)
+    version = schema.data_version(conn)
+    with conn:
+        conn.execute(schema.INSERT_SQL["eth_price"], row)
+
+    assert version > 0
+    assert schema.data_version(conn) == version
+    conn.close()
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip('sklearn')
+
+from backend.ai_model import train_model
+from backend.data_pipeline.backfill import backfill
+from backend.data_pipeline.schema import connect
+
+START = 1704067200
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'market_data.db')
+    monkeypatch.setattr(train_model, 'DB_PATH', db_path)
+    monkeypatch.setattr(train_model, 'MODEL_PATH', str(tmp_path / 'model.pkl'))
+    monkeypatch.setattr(train_model, 'MODEL_META_PATH', str(tmp_path / 'model.json'))
+    conn = connect(db_path)
+    yield conn
+    conn.close()
+
+
+def seed_prices(conn, start, count):
+    backfill("eth_price", [(START + 3600 * i, 2000.0 + (i % 24)) for i in range(start, start + count)], conn=conn)
+    backfill("gas_price", [(START + 3600 * i, 1, 10 + i % 7, 30) for i in range(start, start + count)], conn=conn)
+
+
+def test_incremental_training_only_uses_rows_past_the_watermark(workspace):
+    seed_prices(workspace, 0, 200)
+    X_train, X_test, y_train, y_test = train_model.preprocess_data(train_model.load_data())
+    model, metrics = train_model.train_and_evaluate(X_train, X_test, y_train, y_test, return_metrics=True)
+    train_model.save_model(model, train_model.build_metadata(model, X_train, metrics))
+    # Rows 24..198 have full feature windows and a next-tick target; 140 of them train
+    assert train_model.load_metadata()["watermark"] == START + 3600 * 163
+
+    seed_prices(workspace, 200, 20)
+    model, metadata = train_model.train_incremental(new_trees=5)
+
+    assert model.n_estimators == 105
+    assert metadata["mode"] == "incremental"
+    assert metadata["watermark"] == START + 3600 * 218
+    # 35 held-out rows, the previously unlabelled last row and 19 new labelled rows
+    assert metadata["rows_trained"] == 140 + 55
+    assert set(metadata["metrics"]) == {"mae", "mse", "rmse"}
+
+    # Nothing new since the save: the caller keeps the artifact as it is
+    train_model.save_model(model, metadata)
+    model, metadata = train_model.train_incremental(new_trees=5)
+    assert model.n_estimators == 105 and metadata is None
+
+
+def test_incremental_training_requires_full_retrain_past_tree_cap(workspace):
+    seed_prices(workspace, 0, 50)
+    X_train, X_test, y_train, y_test = train_model.preprocess_data(train_model.load_data())
+    model, metrics = train_model.train_and_evaluate(X_train, X_test, y_train, y_test, return_metrics=True)
+    train_model.save_model(model, train_model.build_metadata(model, X_train, metrics))
+
+    assert train_model.train_incremental(new_trees=10, max_trees=105) == (None, None)
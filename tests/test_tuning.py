@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip('sklearn')
+
+from backend.ai_model import tuning
+from backend.ai_model.model_utils import align_features
+
+
+def test_tune_ranks_candidates_by_walk_forward_rmse(synthetic_arrays):
+    X, y = synthetic_arrays()
+    leaderboard = tuning.tune(
+        X, y,
+        param_grid={"n_estimators": [5], "max_depth": [1, None]},
+        feature_sets={"all": ["timestamp", "volume_usd", "gas_price"], "market": ["volume_usd", "gas_price"]},
+        n_splits=3,
+        n_jobs=2,
+    )
+
+    assert len(leaderboard) == 4
+    assert [entry["rank"] for entry in leaderboard] == [1, 2, 3, 4]
+    rmses = [entry["mean_rmse"] for entry in leaderboard]
+    assert rmses == sorted(rmses)
+    assert all(len(entry["fold_rmse"]) == 3 for entry in leaderboard)
+    # Mean of the fold MSEs, not the square of the mean RMSE
+    assert all(entry["mean_mse"] >= entry["mean_rmse"] ** 2 for entry in leaderboard)
+
+
+def test_best_model_serves_its_own_feature_subset(synthetic_arrays):
+    X, y = synthetic_arrays()
+    entry = {"features": ["volume_usd"], "params": {"n_estimators": 5}}
+    model = tuning.fit_best(X, y, entry)
+
+    assert list(model.feature_names_in_) == ["volume_usd"]
+    assert model.predict(align_features(model, X[-1:])).shape == (1,)